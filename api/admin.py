@@ -9,7 +9,7 @@ class PhaseInline(admin.TabularInline):
 
 @admin.register(Cycle)
 class CycleAdmin(admin.ModelAdmin):
-    list_display = ['name', 'date', 'egg_photo', 'points']  # Kolom yang tampil di daftar Cycle
+    list_display = ['name', 'date', 'egg_photo', 'points', 'total_waste', 'total_harvest', 'total_egg_harvest']  # Kolom yang tampil di daftar Cycle
     search_fields = ['name']  # Fitur pencarian berdasarkan nama siklus
     list_filter = ['date']  # Fitur filter berdasarkan tanggal
     inlines = [PhaseInline]
@@ -21,7 +21,7 @@ class WasteInline(admin.TabularInline):
 
 @admin.register(Phase)
 class PhaseAdmin(admin.ModelAdmin):
-    list_display = ['phase_name', 'cycle', 'start_date']  # Kolom di daftar Phase
+    list_display = ['phase_name', 'cycle', 'start_date', 'end_date']  # Kolom di daftar Phase
     search_fields = ['cycle__name', 'phase_name']  # Pencarian berdasarkan nama siklus atau fase
     list_filter = ['phase_name', 'start_date']
     inlines = [WasteInline]
@@ -63,20 +63,20 @@ class LarvaHarvestAdmin(admin.ModelAdmin):
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author', 'date_published', 'phase']
+    list_display = ['title', 'author', 'date_published', 'phase_type', 'phase']
     search_fields = ['title', 'author']
-    list_filter = ['date_published', 'phase']
+    list_filter = ['date_published', 'phase_type', 'phase']
 
 
 @admin.register(Youtube)
 class YoutubeAdmin(admin.ModelAdmin):
-    list_display = ['title', 'channel_name', 'date_published', 'videoId', 'phase']
+    list_display = ['title', 'channel_name', 'date_published', 'videoId', 'phase_type', 'phase']
     search_fields = ['title', 'channel_name', 'videoId']
-    list_filter = ['date_published', 'phase']
+    list_filter = ['date_published', 'phase_type', 'phase']
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['user', 'message', 'is_read', 'created_at', 'cycle', 'phase']
+    list_display = ['user', 'message', 'kind', 'due_date', 'is_read', 'created_at', 'cycle', 'phase']
     search_fields = ['user', 'message']
-    list_filter = ['is_read', 'created_at']
\ No newline at end of file
+    list_filter = ['is_read', 'kind', 'created_at']
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Layanan pembaruan total (poin, panen, sampah) untuk Cycle, user, dan rekap
+harian (DailyRollup).
+
+Semua penambahan dijalankan sebagai ekspresi di database
+(`UPDATE ... SET points = points + 10`) sehingga worker yang berjalan
+bersamaan tidak saling menimpa, dan hanya kolom terkait yang ditulis.
+
+Catatan baru menambah total, catatan yang dihapus menguranginya, dan catatan
+yang diubah menerapkan selisih antara versi lama dan barunya (termasuk
+pindah fase/Cycle atau tanggal). Perubahan lewat queryset.update() atau
+SQL langsung tidak tercatat; gunakan `reconcile_totals` untuk itu.
+"""
+from collections import Counter, defaultdict
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Count, Subquery, OuterRef, Value, Q
+from django.db.models.functions import Coalesce
+from authentication import user_cache
+from authentication.models import LeaderboardEntry
+from .models import Cycle, DailyRollup, Phase, Waste, LarvaHarvest, EggHarvest
+
+User = get_user_model()
+
+HARVEST_POINTS = 10  # Poin untuk setiap panen (larva atau telur) yang tidak kosong
+
+
+def _increments(deltas):
+    return {field: F(field) + value for field, value in deltas.items() if value}
+
+
+def apply_to_cycle(cycle_id, **deltas):
+    """Menambahkan delta ke kolom-kolom Cycle dalam satu UPDATE."""
+    changes = _increments(deltas)
+    if cycle_id is None or not changes:
+        return 0
+    return Cycle.objects.filter(pk=cycle_id).update(**changes)
+
+
+def apply_to_user(user_id, **deltas):
+    """Menambahkan delta ke kolom-kolom user dan entri leaderboard-nya."""
+    changes = _increments(deltas)
+    if user_id is None or not changes:
+        return 0
+    updated = User.objects.filter(pk=user_id).update(**changes)
+    LeaderboardEntry.objects.filter(user_id=user_id).update(**changes)
+    user_cache.invalidate(user_id)
+    return updated
+
+
+def apply_to_rollup(cycle_id, user_id, day, **deltas):
+    """
+    Menambahkan delta ke DailyRollup (cycle, tanggal); barisnya dibuat jika belum
+    ada, dan dihapus jika setelah pengurangan tidak ada lagi catatan di hari itu.
+    """
+    changes = _increments(deltas)
+    if cycle_id is None or not changes:
+        return
+    rollup = DailyRollup.objects.filter(cycle_id=cycle_id, date=day)
+    if rollup.update(**changes):
+        if any(value < 0 for value in deltas.values()):
+            rollup.filter(waste_count=0, larva_harvest_count=0, egg_harvest_count=0).delete()
+        return
+    if any(value < 0 for value in deltas.values()):
+        # Pengurangan untuk rekap yang tidak ada (misalnya Cycle-nya sedang dihapus)
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(cycle_id=cycle_id, user_id=user_id, date=day, **deltas)
+    except IntegrityError:
+        # Baris baru saja dibuat oleh request lain
+        rollup.update(**changes)
+
+
+def waste_deltas(waste):
+    """Delta (cycle, user) yang ditimbulkan satu catatan sampah."""
+    return {'total_waste': waste.waste_amount}, {'total_waste': waste.waste_amount}
+
+
+def larva_harvest_deltas(harvest):
+    """Delta (cycle, user) yang ditimbulkan satu panen larva."""
+    points = HARVEST_POINTS if harvest.total_harvest > 0 else 0
+    cycle_deltas = {
+        'points': points,
+        'total_harvest': harvest.total_harvest,
+        'total_kasgot': harvest.total_kasgot,
+        'total_for_sale': harvest.total_for_sale,
+        'total_for_breeding': harvest.total_for_breeding,
+    }
+    return cycle_deltas, {'points': points, 'total_harvest': harvest.total_harvest}
+
+
+def egg_harvest_deltas(egg_harvest):
+    """Delta (cycle, user) yang ditimbulkan satu panen telur."""
+    points = HARVEST_POINTS if egg_harvest.total_egg_harvest > 0 else 0
+    return {'points': points, 'total_egg_harvest': egg_harvest.total_egg_harvest}, {'points': points}
+
+
+def waste_rollup(waste):
+    return {'waste_amount': waste.waste_amount, 'waste_count': 1}
+
+
+def larva_harvest_rollup(harvest):
+    return {
+        'larva_harvest': harvest.total_harvest,
+        'larva_harvest_count': 1,
+        'kasgot': harvest.total_kasgot,
+        'for_sale': harvest.total_for_sale,
+        'for_breeding': harvest.total_for_breeding,
+    }
+
+
+def egg_harvest_rollup(egg_harvest):
+    return {'egg_harvest': egg_harvest.total_egg_harvest, 'egg_harvest_count': 1}
+
+
+# Model -> (field tanggal, fungsi delta cycle/user, fungsi delta rekap harian)
+RECORDS = {
+    Waste: ('waste_date', waste_deltas, waste_rollup),
+    LarvaHarvest: ('harvest_date', larva_harvest_deltas, larva_harvest_rollup),
+    EggHarvest: ('harvest_date', egg_harvest_deltas, egg_harvest_rollup),
+}
+
+
+def record_date(instance):
+    """Tanggal catatan seperti yang tersimpan di database (default timezone.now berupa datetime)."""
+    date_field = RECORDS[type(instance)][0]
+    return instance._meta.get_field(date_field).to_python(getattr(instance, date_field))
+
+
+def owner(instance):
+    """(cycle_id, user_id) pemilik catatan; (None, None) jika Cycle-nya sudah tidak ada."""
+    if isinstance(instance, EggHarvest):
+        rows = Cycle.objects.filter(pk=instance.cycle_id).values_list('pk', 'user_id')
+    else:
+        rows = Phase.objects.filter(pk=instance.phase_id).values_list('cycle_id', 'cycle__user_id')
+    return rows.first() or (None, None)
+
+
+def apply_entries(entries):
+    """
+    Menerapkan delta banyak catatan sekaligus. `entries` berisi
+    (cycle_id, user_id, instance, sign): sign 1 menambahkan catatan, -1
+    mengurangkannya. Delta dijumlahkan dulu sehingga setiap Cycle, user, dan
+    rekap harian cukup satu UPDATE, dan delta yang saling meniadakan dilewati.
+    """
+    cycle_totals = defaultdict(Counter)
+    user_totals = defaultdict(Counter)
+    rollup_totals = defaultdict(Counter)
+    for cycle_id, user_id, instance, sign in entries:
+        _, deltas, rollup = RECORDS[type(instance)]
+        cycle_deltas, user_deltas = deltas(instance)
+        cycle_totals[cycle_id].update({field: value * sign for field, value in cycle_deltas.items()})
+        user_totals[user_id].update({field: value * sign for field, value in user_deltas.items()})
+        rollup_totals[(cycle_id, user_id, record_date(instance))].update(
+            {field: value * sign for field, value in rollup(instance).items()}
+        )
+    with transaction.atomic():
+        for cycle_id, deltas in cycle_totals.items():
+            apply_to_cycle(cycle_id, **deltas)
+        for user_id, deltas in user_totals.items():
+            apply_to_user(user_id, **deltas)
+        for (cycle_id, user_id, day), deltas in rollup_totals.items():
+            apply_to_rollup(cycle_id, user_id, day, **deltas)
+
+
+def previous_version(instance):
+    """Versi catatan yang tersimpan di DB (dikunci sampai transaksi selesai), atau None untuk catatan baru."""
+    if instance._state.adding or instance.pk is None:
+        return None
+    return type(instance).objects.select_for_update().filter(pk=instance.pk).first()
+
+
+def record_save(previous, instance):
+    """Dipanggil setelah catatan disimpan: tambahkan versi baru, kurangkan versi lama (jika ada)."""
+    entries = [(*owner(instance), instance, 1)]
+    if previous is not None:
+        entries.append((*owner(previous), previous, -1))
+    apply_entries(entries)
+
+
+def record_delete(instance):
+    """Dipanggil setelah catatan dihapus."""
+    apply_entries([(*owner(instance), instance, -1)])
+
+
+def record_batch(entries):
+    """
+    Menambahkan banyak catatan baru sekaligus (misalnya dari sinkronisasi
+    offline). `entries` berisi (cycle_id, user_id, instance).
+    """
+    apply_entries((cycle_id, user_id, instance, 1) for cycle_id, user_id, instance in entries)
+
+
+def _subquery_total(queryset, outer, aggregate):
+    """Subquery berkorelasi yang menghasilkan satu nilai agregat per baris luar."""
+    rows = (
+        queryset.filter(**{outer: OuterRef('pk')})
+        .order_by()
+        .values(outer)
+        .annotate(total=aggregate)
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def expected_cycle_totals():
+    """Ekspresi total Cycle yang dihitung ulang dari tabel panen dan sampah."""
+    larva_count = _subquery_total(LarvaHarvest.objects.filter(total_harvest__gt=0), 'phase__cycle', Count('pk'))
+    egg_count = _subquery_total(EggHarvest.objects.filter(total_egg_harvest__gt=0), 'cycle', Count('pk'))
+    def larva_sum(field):
+        return _subquery_total(LarvaHarvest.objects.all(), 'phase__cycle', Sum(field))
+
+    return {
+        'points': (larva_count + egg_count) * HARVEST_POINTS,
+        'total_waste': _subquery_total(Waste.objects.all(), 'phase__cycle', Sum('waste_amount')),
+        'total_harvest': larva_sum('total_harvest'),
+        'total_egg_harvest': _subquery_total(EggHarvest.objects.all(), 'cycle', Sum('total_egg_harvest')),
+        'total_kasgot': larva_sum('total_kasgot'),
+        'total_for_sale': larva_sum('total_for_sale'),
+        'total_for_breeding': larva_sum('total_for_breeding'),
+    }
+
+
+def expected_user_totals():
+    """Ekspresi total user yang dihitung ulang dari tabel panen dan sampah."""
+    larva_count = _subquery_total(LarvaHarvest.objects.filter(total_harvest__gt=0), 'phase__cycle__user', Count('pk'))
+    egg_count = _subquery_total(EggHarvest.objects.filter(total_egg_harvest__gt=0), 'cycle__user', Count('pk'))
+    return {
+        'points': (larva_count + egg_count) * HARVEST_POINTS,
+        'total_harvest': _subquery_total(LarvaHarvest.objects.all(), 'phase__cycle__user', Sum('total_harvest')),
+        'total_waste': _subquery_total(Waste.objects.all(), 'phase__cycle__user', Sum('waste_amount')),
+    }
+
+
+def _mismatched(queryset, expected):
+    annotations = {f'expected_{field}': expression for field, expression in expected.items()}
+    mismatch = Q()
+    for field in expected:
+        mismatch |= ~Q(**{field: F(f'expected_{field}')})
+    return queryset.annotate(**annotations).filter(mismatch)
+
+
+def reconcile(apply=True):
+    """
+    Membandingkan total tersimpan dengan hasil hitung ulang dari tabel
+    Waste/LarvaHarvest/EggHarvest, lalu (jika `apply`) memperbaikinya.
+    Mengembalikan jumlah Cycle dan user yang totalnya tidak cocok.
+    """
+    cycle_ids = list(_mismatched(Cycle.objects.all(), expected_cycle_totals()).values_list('pk', flat=True))
+    user_ids = list(_mismatched(User.objects.all(), expected_user_totals()).values_list('pk', flat=True))
+
+    if apply:
+        with transaction.atomic():
+            if cycle_ids:
+                Cycle.objects.filter(pk__in=cycle_ids).update(**expected_cycle_totals())
+            if user_ids:
+                User.objects.filter(pk__in=user_ids).update(**expected_user_totals())
+                user_cache.invalidate(*user_ids)
+    return cycle_ids, user_ids
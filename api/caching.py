@@ -0,0 +1,79 @@
+"""
+Cache respons untuk endpoint konten yang jarang berubah (Article, Youtube).
+
+Setiap model punya "versi" berupa timestamp perubahan terakhir, disimpan di
+tabel ContentVersion (bukan di cache) sehingga tidak hilang saat cache dibuang,
+sama untuk semua proses, dan ikut commit/rollback bersama perubahan kontennya.
+Versi itu dipakai sebagai ETag/Last-Modified dan bagian dari kunci cache
+respons; menyimpan atau menghapus baris cukup mengganti versinya, sehingga
+semua respons lama otomatis tidak terpakai lagi.
+"""
+import hashlib
+import math
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_TTL = 60 * 60  # Detik
+
+
+def get_versions(*models):
+    """Timestamp perubahan terakhir beberapa model dalam satu query; dibuat baru jika belum tercatat."""
+    from .models import ContentVersion
+    labels = [model._meta.label_lower for model in models]
+    versions = dict(ContentVersion.objects.filter(label__in=labels).values_list('label', 'changed_at'))
+    for label in labels:
+        if label not in versions:
+            versions[label] = ContentVersion.objects.get_or_create(label=label)[0].changed_at
+    return [versions[label].timestamp() for label in labels]
+
+
+def get_version(model):
+    return get_versions(model)[0]
+
+
+def bump_version(model):
+    from .models import ContentVersion
+    ContentVersion.objects.update_or_create(label=model._meta.label_lower, defaults={'changed_at': timezone.now()})
+
+
+class CachedContentMixin:
+    """
+    Menyimpan hasil list/retrieve di cache, menambahkan header ETag dan
+    Last-Modified, dan membalas 304 untuk If-None-Match yang masih valid.
+    """
+
+    def cached_response(self, request, build):
+        model = self.get_queryset().model
+        version = get_version(model)
+        fingerprint = f"{model._meta.label_lower}:{version}:{request.get_host()}{request.get_full_path()}"
+        etag = '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+        # Dibulatkan ke atas agar tidak lebih awal dari perubahan terakhir
+        last_modified = math.ceil(version)
+
+        # Hanya ETag (versi persis) yang dipakai untuk 304. If-Modified-Since
+        # hanya berpresisi detik, jadi perubahan di detik yang sama dengan
+        # respons sebelumnya akan keliru dianggap belum berubah.
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and etag in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f"content:response:{etag}"
+            data = cache.get(key)
+            if data is None:
+                data = build()
+                cache.set(key, data, RESPONSE_TTL)
+            response = Response(data)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'  # Klien boleh menyimpan, tetapi harus validasi ulang
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedContentMixin, self).list(request, *args, **kwargs).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedContentMixin, self).retrieve(request, *args, **kwargs).data)
@@ -0,0 +1,70 @@
+"""
+Feed konten edukasi (artikel + video) per jenis fase.
+
+Feed untuk satu jenis fase dibaca lewat index `phase_type`, lalu disimpan di
+cache dengan kunci yang memuat versi konten dari api.caching. Perubahan pada
+Article/Youtube mengganti versi itu, jadi feed lama tidak perlu dihapus manual.
+Setiap feed hanya berisi CONTENT_FEED_LIMIT artikel dan video terbaru; daftar
+lengkap tersedia di /api/articles/?phase_type= dan /api/youtube/?phase_type=.
+
+Konten lama yang hanya terhubung lewat relasi `phase` diberi phase_type dengan
+`python manage.py backfill_phase_type`.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from .caching import RESPONSE_TTL, get_versions
+from .models import Article, Youtube
+
+
+def feed_key(phase_type):
+    article_version, youtube_version = get_versions(Article, Youtube)
+    return f"content:feed:{phase_type}:{settings.CONTENT_FEED_LIMIT}:{article_version}:{youtube_version}"
+
+
+def build_feed(phase_type):
+    from .serializers import ArticleSerializer, YoutubeSerializer
+    limit = settings.CONTENT_FEED_LIMIT
+    articles = Article.objects.filter(phase_type=phase_type).order_by('-date_published', '-id')[:limit]
+    videos = Youtube.objects.filter(phase_type=phase_type).order_by('-date_published', '-id')[:limit]
+    return {
+        'phase_type': phase_type,
+        'articles': ArticleSerializer(articles, many=True).data,
+        'videos': YoutubeSerializer(videos, many=True).data,
+    }
+
+
+def phase_feed(phase_type):
+    """Feed untuk satu jenis fase; dihitung sekali lalu diambil dari cache."""
+    key = feed_key(phase_type)
+    feed = cache.get(key)
+    if feed is None:
+        feed = build_feed(phase_type)
+        cache.set(key, feed, RESPONSE_TTL)
+    return feed
+
+
+def linked_content(phases):
+    """
+    Artikel dan video untuk setiap fase: yang terhubung lewat relasi `phase`
+    ditambah yang `phase_type`-nya sama dengan jenis fase itu. Dua query untuk
+    semua fase. Mengembalikan {phase_id: (articles, videos)}.
+    """
+    phases = list(phases)
+    content = {phase.id: ([], []) for phase in phases}
+    phases_by_type = defaultdict(list)
+    for phase in phases:
+        phases_by_type[phase.phase_name].append(phase.id)
+
+    for index, model in enumerate((Article, Youtube)):
+        rows = model.objects.filter(
+            Q(phase__in=list(content)) | Q(phase_type__in=list(phases_by_type))
+        ).order_by('-date_published', '-id')
+        for row in rows:
+            targets = set(phases_by_type.get(row.phase_type, []))
+            if row.phase_id in content:
+                targets.add(row.phase_id)
+            for phase_id in targets:
+                content[phase_id][index].append(row)
+    return content
@@ -0,0 +1,233 @@
+"""
+Idempotency untuk request yang mengubah data (POST/PUT/PATCH/DELETE).
+
+Klien mengirim header `Idempotency-Key` (misalnya UUID per aksi). Request
+pertama diproses seperti biasa dan responsnya disimpan terkompresi di
+IdempotencyRecord; request ulang dengan kunci yang sama dalam TTL langsung
+dijawab dengan respons tersimpan, cukup satu lookup tanpa menulis data lagi.
+
+Kunci dibatasi per method, path, dan id user (dari token JWT atau sesi), sehingga
+kunci yang sama dari user lain tidak saling bertabrakan, sedangkan token yang
+di-refresh tetap dianggap user yang sama. Request tanpa user tidak diproses di
+sini. Selama request pertama masih berjalan, request ulang mendapat 409; kunci
+yang dipakai ulang dengan body berbeda mendapat 422. Hanya respons 2xx/3xx
+yang disimpan, sehingga request yang ditolak bisa diperbaiki dan dikirim ulang.
+"""
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.http.multipartparser import MultiPartParserError
+from django.utils import timezone
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MUTATING_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+MAX_KEY_LENGTH = 255
+
+DEFAULTS = {
+    'TTL': 24 * 60 * 60,  # Lama respons disimpan (detik)
+    # Lama kunci dianggap "sedang diproses" jika worker mati di tengah jalan. Harus lebih
+    # lama dari timeout worker (misalnya gunicorn --timeout), agar request yang masih
+    # berjalan tidak dianggap mati lalu diproses dua kali.
+    'LOCK_TIMEOUT': 300,
+    'PATH_PREFIXES': ['/api/'],
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'IDEMPOTENCY', {})}
+
+
+def request_user_id(request):
+    """
+    Id user dari token JWT di header Authorization, atau dari sesi; None jika anonim.
+    Hasil autentikasi JWT dipakai ulang oleh view (lihat RevocableJWTAuthentication).
+    """
+    from authentication.authentication import ClaimsJWTAuthentication
+    from rest_framework.exceptions import APIException
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except APIException:
+        return None
+    if result is not None:
+        return result[0].pk
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def request_key(request):
+    """Hash kunci untuk request ini, atau None jika request tidak perlu idempotency."""
+    key = request.headers.get(HEADER)
+    if not key or request.method not in MUTATING_METHODS:
+        return None
+    if not any(request.path.startswith(prefix) for prefix in get_config()['PATH_PREFIXES']):
+        return None
+    user_id = request_user_id(request)
+    if user_id is None:
+        return None
+    return hashlib.sha256(f"{key}\n{request.method}\n{request.path}\n{user_id}".encode()).hexdigest()
+
+
+def request_fingerprint(request):
+    """
+    Hash isi request untuk mendeteksi kunci yang dipakai ulang dengan data lain.
+
+    POST multipart di-hash dari field dan file hasil parsing (nama, ukuran, dan
+    hash isi file), karena boundary berubah setiap kali klien mengirim ulang.
+    Django hanya mem-parse form untuk POST; method lain tetap memakai body mentah.
+    Body lain yang lebih besar dari DATA_UPLOAD_MAX_MEMORY_SIZE tidak dibaca ke
+    memori; cukup content type dan panjangnya.
+    """
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    digest = hashlib.sha256(f"{request.META.get('QUERY_STRING', '')}\n{request.content_type}\n".encode())
+    max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    if request.method == 'POST' and request.content_type == 'multipart/form-data':
+        try:
+            multipart_fingerprint(request, digest)
+        except MultiPartParserError:
+            # Body rusak tetap ditolak view; cukup bedakan dari panjangnya
+            digest.update(str(content_length).encode())
+    elif max_size is None or content_length <= max_size:
+        digest.update(request.body)
+    else:
+        digest.update(str(content_length).encode())
+    return digest.hexdigest()
+
+
+def multipart_fingerprint(request, digest):
+    """
+    Menambahkan field dan file multipart ke `digest`. request.POST/FILES yang
+    sudah di-parse dipakai ulang oleh parser DRF.
+    """
+    for name, values in sorted(request.POST.lists()):
+        digest.update(json.dumps([name, values]).encode())
+    for name, files in sorted(request.FILES.lists()):
+        for upload in files:
+            content = hashlib.sha256()
+            for chunk in upload.chunks():
+                content.update(chunk)
+            upload.seek(0)
+            digest.update(json.dumps([name, upload.name, upload.size, content.hexdigest()]).encode())
+
+
+def replay(record):
+    response = HttpResponse(zlib.decompress(bytes(record.body)), status=record.status_code, content_type=record.content_type or None)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def begin(key_hash, request_hash):
+    """
+    Mengklaim kunci. Mengembalikan respons tersimpan (409 jika request pertama
+    masih berjalan, 422 jika isi request berbeda), atau None jika request ini
+    yang harus diproses.
+    """
+    now = timezone.now()
+    record = IdempotencyRecord.objects.filter(key_hash=key_hash, expires_at__gt=now).first()
+    if record is not None:
+        if record.request_hash != request_hash:
+            return JsonResponse({"error": f"{HEADER} ini sudah dipakai untuk request dengan isi berbeda."}, status=422)
+        if record.status_code == IdempotencyRecord.IN_PROGRESS:
+            return JsonResponse({"error": "Request dengan Idempotency-Key ini masih diproses."}, status=409)
+        return replay(record)
+
+    # Catatan lama yang sudah kedaluwarsa boleh ditimpa
+    IdempotencyRecord.objects.filter(key_hash=key_hash, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyRecord.objects.create(
+                key_hash=key_hash,
+                request_hash=request_hash,
+                expires_at=now + timedelta(seconds=get_config()['LOCK_TIMEOUT']),
+            )
+    except IntegrityError:
+        return JsonResponse({"error": "Request dengan Idempotency-Key ini masih diproses."}, status=409)
+    return None
+
+
+def finish(key_hash, response):
+    """Menyimpan respons sukses. Error (4xx/5xx) dan respons streaming tidak disimpan agar bisa diulang."""
+    if response.streaming or response.status_code >= 400:
+        abort(key_hash)
+        return
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    IdempotencyRecord.objects.filter(key_hash=key_hash).update(
+        status_code=response.status_code,
+        content_type=response.get('Content-Type', ''),
+        body=zlib.compress(response.content),
+        expires_at=timezone.now() + timedelta(seconds=get_config()['TTL']),
+    )
+
+
+def abort(key_hash):
+    IdempotencyRecord.objects.filter(key_hash=key_hash, status_code=IdempotencyRecord.IN_PROGRESS).delete()
+
+
+def purge_expired(batch_size=1000):
+    """Menghapus catatan kedaluwarsa per batch. Mengembalikan jumlah yang dihapus."""
+    removed = 0
+    while True:
+        ids = list(
+            IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += IdempotencyRecord.objects.filter(pk__in=ids).delete()[0]
+
+
+class IdempotencyMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key_hash = request_key(request)
+        if key_hash is None:
+            return self.get_response(request)
+        if len(request.headers[HEADER]) > MAX_KEY_LENGTH:
+            return JsonResponse({"error": f"{HEADER} maksimal {MAX_KEY_LENGTH} karakter."}, status=400)
+
+        stored = begin(key_hash, request_fingerprint(request))
+        if stored is not None:
+            return stored
+        try:
+            response = self.get_response(request)
+        except Exception:
+            abort(key_hash)
+            raise
+        finish(key_hash, response)
+        return response
+
+    async def __acall__(self, request):
+        # Validasi token bisa membaca daftar token yang dicabut dan status user dari DB
+        key_hash = await sync_to_async(request_key)(request)
+        if key_hash is None:
+            return await self.get_response(request)
+        if len(request.headers[HEADER]) > MAX_KEY_LENGTH:
+            return JsonResponse({"error": f"{HEADER} maksimal {MAX_KEY_LENGTH} karakter."}, status=400)
+
+        # Parsing multipart bisa menulis file sementara ke disk
+        request_hash = await sync_to_async(request_fingerprint)(request)
+        stored = await sync_to_async(begin)(key_hash, request_hash)
+        if stored is not None:
+            return stored
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            await sync_to_async(abort)(key_hash)
+            raise
+        await sync_to_async(finish)(key_hash, response)
+        return response
@@ -0,0 +1,151 @@
+"""
+Pipeline gambar: setiap foto yang diunggah dibuatkan varian yang lebih kecil
+(thumbnail dan versi terkompresi) tanpa EXIF, di luar jalur request.
+
+Nama file varian diturunkan dari nama file asli. Serializer hanya
+menampilkan URL varian yang filenya sudah ada. Hasil pengecekan storage
+diingat per proses: varian yang sudah ada selamanya, varian yang belum ada
+selama MISSING_TTL detik, sehingga endpoint list tidak mengecek storage
+untuk setiap baris di setiap request.
+"""
+import io
+import logging
+import os
+import time
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+from backend.tasks import submit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANTS = {
+    'thumb': {'size': 320, 'format': 'JPEG', 'quality': 75},
+    'medium': {'size': 1280, 'format': 'WEBP', 'quality': 80},
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+# Model -> daftar nama field gambar yang diproses
+registry = {}
+
+# Nama file varian yang sudah diketahui ada. Varian tidak pernah dihapus
+# (kecuali dibuat ulang dengan force), jadi hasil positif aman diingat.
+_ready = set()
+MAX_READY = 100000
+
+# Nama file varian yang belum ada -> waktu (monotonic) pengecekan berikutnya.
+# Varian yang dibuat proses lain terlihat paling lambat setelah MISSING_TTL.
+_missing = {}
+MISSING_TTL = 30  # Detik
+
+
+def get_variants():
+    return getattr(settings, 'IMAGE_VARIANTS', DEFAULT_VARIANTS)
+
+
+def variant_name(name, variant):
+    """'egg_photos/a.jpg' -> 'egg_photos/variants/a_thumb.jpg'."""
+    spec = get_variants()[variant]
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f"{stem}_{variant}.{EXTENSIONS[spec['format']]}")
+
+
+def variant_ready(name):
+    if name in _ready:
+        return True
+    now = time.monotonic()
+    if _missing.get(name, 0) > now:
+        return False
+    if not default_storage.exists(name):
+        if len(_missing) >= MAX_READY:
+            _missing.clear()
+        _missing[name] = now + MISSING_TTL
+        return False
+    _missing.pop(name, None)
+    if len(_ready) >= MAX_READY:
+        _ready.clear()
+    _ready.add(name)
+    return True
+
+
+def variant_urls(field_file):
+    """
+    URL varian yang sudah dibuat untuk sebuah file gambar, atau None jika
+    belum ada gambar. Varian yang masih diproses di background tidak disertakan.
+    """
+    if not field_file:
+        return None
+    names = {variant: variant_name(field_file.name, variant) for variant in get_variants()}
+    return {variant: default_storage.url(name) for variant, name in names.items() if variant_ready(name)}
+
+
+def render_variant(image, spec):
+    """Mengecilkan gambar sesuai spesifikasi dan mengembalikan bytes tanpa metadata EXIF."""
+    variant = image.copy()
+    variant.thumbnail((spec['size'], spec['size']))
+    buffer = io.BytesIO()
+    # Tidak mengirim argumen exif, sehingga EXIF (termasuk lokasi GPS) tidak ikut tersimpan
+    variant.save(buffer, format=spec['format'], quality=spec['quality'], optimize=True)
+    return buffer.getvalue()
+
+
+def process_image(name, force=False):
+    """Membuat semua varian untuk satu file di storage."""
+    variants = get_variants()
+    targets = {variant: variant_name(name, variant) for variant in variants}
+    if not force and all(default_storage.exists(target) for target in targets.values()):
+        return
+
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)  # Terapkan orientasi dari EXIF sebelum dibuang
+        image = image.convert('RGB')
+
+    for variant, target in targets.items():
+        content = render_variant(image, variants[variant])
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        default_storage.save(target, ContentFile(content))
+        _missing.pop(target, None)
+        _ready.add(target)
+    logger.info("Varian gambar dibuat untuk %s", name)
+
+
+def schedule(instance, force=False):
+    """Menjadwalkan pemrosesan semua field gambar milik instance."""
+    for field_name in registry.get(type(instance), []):
+        field_file = getattr(instance, field_name)
+        if field_file:
+            submit(process_image, field_file.name, force=force)
+
+
+def _mark_changed_images(sender, instance, update_fields=None, **kwargs):
+    """
+    Sebelum disimpan: catat field gambar yang berisi file baru. File baru
+    belum di-commit ke storage sampai field menyimpannya, jadi save yang tidak
+    mengganti foto tidak menjadwalkan apa pun.
+    """
+    changed = []
+    for field_name in registry.get(sender, []):
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        field_file = getattr(instance, field_name)
+        if field_file and (instance._state.adding or not field_file._committed):
+            changed.append(field_name)
+    instance._changed_images = changed
+
+
+def _schedule_on_save(sender, instance, **kwargs):
+    for field_name in instance.__dict__.pop('_changed_images', []):
+        submit(process_image, getattr(instance, field_name).name)
+
+
+def register(model, *field_names):
+    """Mendaftarkan field gambar sebuah model agar diproses setiap kali fotonya diganti."""
+    registry[model] = list(field_names)
+    dispatch_uid = f'image-variants-{model._meta.label}'
+    pre_save.connect(_mark_changed_images, sender=model, dispatch_uid=dispatch_uid)
+    post_save.connect(_schedule_on_save, sender=model, dispatch_uid=dispatch_uid)
@@ -0,0 +1,21 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DateField, ExpressionWrapper, F
+from api.models import Cycle, Phase
+
+
+class Command(BaseCommand):
+    help = "Mengisi Phase.end_date dan Cycle.current_phase untuk data yang dibuat sebelum kolom tersebut ada."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = 0
+            # Satu UPDATE per jenis fase: end_date = start_date + durasi
+            for phase_name, duration in Phase.PHASE_DURATIONS.items():
+                updated += Phase.objects.filter(phase_name=phase_name).update(
+                    end_date=ExpressionWrapper(F('start_date') + timedelta(days=duration), output_field=DateField())
+                )
+            Phase.objects.exclude(phase_name__in=Phase.PHASE_DURATIONS).update(end_date=None)
+            cycles = Cycle.objects.all().refresh_current_phase()
+        self.stdout.write(self.style.SUCCESS(f"{updated} fase dan {cycles} siklus diperbarui."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from api.caching import bump_version
+from api.models import Article, Phase, Youtube
+
+
+class Command(BaseCommand):
+    help = "Mengisi phase_type Article/Youtube dari fase yang terhubung, untuk konten yang dibuat sebelum kolom tersebut ada."
+
+    def handle(self, *args, **options):
+        phase_name = Subquery(Phase.objects.filter(pk=OuterRef('phase_id')).values('phase_name')[:1])
+        with transaction.atomic():
+            updated = {}
+            for model in (Article, Youtube):
+                updated[model] = model.objects.filter(phase_type='', phase__isnull=False).update(phase_type=phase_name)
+                if updated[model]:
+                    # UPDATE langsung tidak memicu signal, jadi feed dan respons lama dibuang di sini
+                    bump_version(model)
+        self.stdout.write(self.style.SUCCESS(f"{updated[Article]} artikel dan {updated[Youtube]} video diperbarui."))
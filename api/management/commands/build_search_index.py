@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Membuat index full-text artikel dan video, lalu mengisinya ulang (FTS5 di SQLite)."
+
+    def handle(self, *args, **options):
+        search.ensure_index()
+        for model in search.SEARCH_FIELDS:
+            count = search.rebuild(model)
+            self.stdout.write(f"{model._meta.verbose_name}: {count} baris diindex.")
+        self.stdout.write(self.style.SUCCESS("Index pencarian siap."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from api import images
+from api.images import process_image
+
+
+class Command(BaseCommand):
+    help = "Membuat varian gambar (thumbnail, terkompresi) untuk semua foto yang sudah ada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Buat ulang varian meskipun sudah ada.")
+
+    def handle(self, *args, **options):
+        processed = 0
+        for model, field_names in images.registry.items():
+            for field_name in field_names:
+                names = (
+                    model.objects.exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .values_list(field_name, flat=True)
+                    .iterator()
+                )
+                for name in names:
+                    try:
+                        process_image(name, force=options['force'])
+                        processed += 1
+                    except Exception as error:
+                        self.stderr.write(f"Gagal memproses {name}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Selesai memproses {processed} gambar."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Menghapus catatan Idempotency-Key yang sudah kedaluwarsa."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = purge_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{removed} catatan idempotency dihapus."))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import UploadSession
+from api import uploads
+
+
+class Command(BaseCommand):
+    help = "Menghapus sesi upload bertahap yang tidak pernah dipakai beserta file sementaranya."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+        removed = 0
+        for session in UploadSession.objects.filter(created_at__lt=cutoff).iterator():
+            uploads.discard(session)
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f"{removed} sesi upload dihapus."))
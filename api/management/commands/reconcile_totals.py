@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.aggregates import reconcile
+from authentication.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = "Menghitung ulang poin dan total Cycle serta user dari tabel Waste/LarvaHarvest/EggHarvest."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Hanya laporkan selisih tanpa memperbaiki.")
+
+    def handle(self, *args, **options):
+        apply = not options['dry_run']
+        cycle_ids, user_ids = reconcile(apply=apply)
+
+        self.stdout.write(f"Cycle tidak cocok: {len(cycle_ids)} {cycle_ids[:20]}")
+        self.stdout.write(f"User tidak cocok: {len(user_ids)} {user_ids[:20]}")
+
+        if apply:
+            rebuild()
+            self.stdout.write(self.style.SUCCESS("Total diperbaiki dan leaderboard dibangun ulang."))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api import reports
+
+
+class Command(BaseCommand):
+    help = "Membangun ulang rekap harian (DailyRollup) dari tabel Waste/LarvaHarvest/EggHarvest."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Hanya bangun ulang N hari terakhir.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'])
+        count = reports.refresh(since)
+        self.stdout.write(self.style.SUCCESS(f"{count} baris rekap dibangun ulang."))
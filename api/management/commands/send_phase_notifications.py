@@ -0,0 +1,14 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from api.notifications import schedule_phase_notifications
+
+
+class Command(BaseCommand):
+    help = "Membuat notifikasi untuk fase yang akan atau sudah berakhir. Jalankan berkala, misalnya lewat cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None, help="Tanggal acuan (YYYY-MM-DD), default hari ini.")
+
+    def handle(self, *args, **options):
+        created = schedule_phase_notifications(options['date'])
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} notifikasi dibuat."))
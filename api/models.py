@@ -1,18 +1,68 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from datetime import timedelta
-from django.db.models.signals import post_save
+import uuid
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
 from django.dispatch import receiver
+from . import images
 
 User = get_user_model()
 
+
+class CycleQuerySet(models.QuerySet):
+    def in_phase(self, phase_name):
+        """Siklus yang fase aktifnya `phase_name`, lewat pointer current_phase."""
+        return self.filter(current_phase__phase_name=phase_name)
+
+    def refresh_current_phase(self):
+        """Arahkan current_phase ke fase terakhir tiap siklus dalam satu UPDATE."""
+        latest = Phase.objects.filter(cycle=models.OuterRef('pk')).order_by('-start_date', '-id').values('pk')[:1]
+        return self.update(current_phase=models.Subquery(latest))
+
+
+class PhaseQuerySet(models.QuerySet):
+    def current(self):
+        """Fase yang sedang berjalan, yaitu fase yang ditunjuk Cycle.current_phase."""
+        return self.filter(cycle__current_phase=models.F('pk'))
+
+    def ending_within(self, days, today=None):
+        """Fase yang berakhir antara hari ini dan `days` hari ke depan."""
+        today = today or timezone.localdate()
+        return self.filter(end_date__range=(today, today + timedelta(days=days)))
+
+    def overdue(self, today=None):
+        """Fase yang tanggal akhirnya sudah lewat."""
+        return self.filter(end_date__lt=today or timezone.localdate())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Seperti Phase.save(): isi end_date dan perbarui fase aktif siklus yang terkena."""
+        objs = list(objs)
+        for phase in objs:
+            phase.end_date = phase.compute_end_date()
+        with transaction.atomic():
+            created = super().bulk_create(objs, *args, **kwargs)
+            Cycle.objects.filter(pk__in={phase.cycle_id for phase in objs}).refresh_current_phase()
+        return created
+
+
 class Cycle(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateField()  # Tanggal siklus
     name = models.CharField(max_length=100)  # Nama siklus
     egg_photo = models.ImageField(upload_to='egg_photos/')  # Foto telur maggot
     points = models.IntegerField(default=0)
+    # Total per siklus, diperbarui oleh api.aggregates setiap ada sampah/panen baru
+    total_waste = models.BigIntegerField(default=0)  # Total sampah diolah (gram)
+    total_harvest = models.BigIntegerField(default=0)  # Total panen larva (gram)
+    total_egg_harvest = models.BigIntegerField(default=0)  # Total panen telur (gram)
+    total_kasgot = models.BigIntegerField(default=0)  # Total kasgot (gram)
+    total_for_sale = models.BigIntegerField(default=0)  # Total larva siap jual (gram)
+    total_for_breeding = models.BigIntegerField(default=0)  # Total larva untuk bibit (gram)
+    # Fase terakhir siklus, diperbarui setiap kali fase disimpan atau dihapus
+    current_phase = models.ForeignKey('Phase', related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+
+    objects = CycleQuerySet.as_manager()
 
     def __str__(self):
         return f"Siklus untuk {self.user_id} dengan {self.name} pada {self.date}"
@@ -38,6 +88,9 @@ class Phase(models.Model):
     phase_name = models.CharField(max_length=50, choices=PHASE_CHOICES)  # Nama fase
     start_date = models.DateField()  # Tanggal mulai fase
     notes = models.TextField(null=True, blank=True)  # Catatan tambahan tentang fase
+    end_date = models.DateField(null=True, blank=True, db_index=True)  # Diisi otomatis dari start_date + durasi fase
+
+    objects = PhaseQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.phase_name} - {self.cycle.name}"
@@ -46,41 +99,24 @@ class Phase(models.Model):
         """Menghitung tanggal akhir fase berdasarkan durasi yang ditentukan."""
         return self.start_date + timedelta(days=self.PHASE_DURATIONS.get(self.phase_name, 0))
 
+    def compute_end_date(self):
+        # Fase tanpa durasi (panen) tidak punya tanggal akhir
+        return self.get_end_date() if self.phase_name in self.PHASE_DURATIONS else None
 
-def check_and_notify_users_for_phase(phase):
-    today = timezone.now().date()
-    end_date = phase.get_end_date()
-    days_remaining = (end_date - today).days
-
-    if phase.phase_name != 'harvest':
-        if days_remaining in [2, 1, 0]:
-            check_box_name = phase.cycle.name
-            user = phase.cycle.user
-
-            if days_remaining == 0:
-                message = f"Check {check_box_name} kamu karena seharusnya sudah memasuki fase baru. Pastikan kamu memeriksa perubahan pada siklusnya."
-            else:
-                message = f"Check {check_box_name} kamu karena hampir memasuki fase baru. Pastikan kamu memeriksa perubahan pada siklusnya."
-
-            if not Notification.objects.filter(user=user.id, message=message).exists():
-                Notification.objects.create(
-                    user=user,
-                    message=message,
-                    cycle=phase.cycle,  # Menyimpan referensi ke Cycle
-                    phase=phase  # Menyimpan referensi ke Phase
-                )
+    def save(self, *args, **kwargs):
+        """Simpan fase beserta tanggal akhirnya, lalu perbarui fase aktif siklusnya."""
+        self.end_date = self.compute_end_date()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Cycle.objects.filter(pk=self.cycle_id).refresh_current_phase()
 
-@receiver(post_save, sender=Phase)
-def create_phase_notification(sender, instance, created, **kwargs):
-    """Membuat notifikasi ketika fase baru dibuat atau diubah."""
-    if created or instance.phase_name in ['egg', 'larva', 'prepupa', 'pupa', 'bsf']:  # Semua fase kecuali 'harvest'
-        check_and_notify_users_for_phase(instance)
 
 class Waste(models.Model):
     phase = models.ForeignKey(Phase, related_name='wastes', on_delete=models.CASCADE, default=1)  # Hubungkan ke fase
     waste_date = models.DateField(default=timezone.now)  # Tanggal default adalah hari ini
     waste_amount = models.PositiveIntegerField()  # Jumlah sampah yang diolah (gram)
     waste_photo = models.ImageField(upload_to='waste_photos/')  # Foto sampah
+    client_id = models.UUIDField(null=True, blank=True, unique=True)  # Id dari aplikasi untuk sinkronisasi offline
 
     def __str__(self):
         return f"Waste {self.phase.phase_name} - {self.waste_amount} g"
@@ -90,6 +126,14 @@ class Waste(models.Model):
         Mengembalikan jumlah sampah dengan satuan.
         """
         return f"{self.waste_amount} g"
+
+    def save(self, *args, **kwargs):
+        """Simpan sampah, lalu sesuaikan total sampah (catatan baru atau selisih perubahan)."""
+        from .aggregates import previous_version, record_save
+        with transaction.atomic():
+            previous = previous_version(self)
+            super().save(*args, **kwargs)
+            record_save(previous, self)
     
 
 class LarvaHarvest(models.Model):
@@ -100,21 +144,18 @@ class LarvaHarvest(models.Model):
     total_for_breeding = models.PositiveIntegerField()  # Total untuk lanjut bibit (gram)
     total_kasgot = models.PositiveIntegerField()  # Total kasgot (gram)
     harvest_photo = models.ImageField(upload_to='harvest_photos/')  # Foto hasil panen
+    client_id = models.UUIDField(null=True, blank=True, unique=True)  # Id dari aplikasi untuk sinkronisasi offline
 
     def __str__(self):
         return f"Panen Larva pada {self.harvest_date} - {self.phase.phase_name}"
 
     def save(self, *args, **kwargs):
-        if self.total_harvest > 0:
-            cycle = self.phase.cycle
-            user = cycle.user
-            cycle.points += 10
-            cycle.save()
-            if user:
-                user.points += 10
-                user.save()
-
-        super().save(*args, **kwargs)
+        """Simpan panen, lalu sesuaikan poin dan total panen (catatan baru atau selisih perubahan)."""
+        from .aggregates import previous_version, record_save
+        with transaction.atomic():
+            previous = previous_version(self)
+            super().save(*args, **kwargs)
+            record_save(previous, self)
 
 
 class EggHarvest(models.Model):
@@ -122,6 +163,7 @@ class EggHarvest(models.Model):
     total_egg_harvest = models.PositiveIntegerField()  # Total panen telur (gram)
     egg_photo = models.ImageField(upload_to='egg_harvest_photos/')  # Foto telur
     harvest_date = models.DateField(default=timezone.now) # Tanggal default adalah hari ini
+    client_id = models.UUIDField(null=True, blank=True, unique=True)  # Id dari aplikasi untuk sinkronisasi offline
 
     def __str__(self):
         return f"Panen telur {self.cycle.name} - {self.total_egg_harvest} g"
@@ -133,19 +175,16 @@ class EggHarvest(models.Model):
         return f"{self.total_egg_harvest} g"
     
     def save(self, *args, **kwargs):
-        if self.total_egg_harvest > 0:  
-            cycle = self.cycle
-            user = cycle.user
-            cycle.points += 10
-            cycle.save()
-            if user:
-                user.points += 10
-                user.save()
-
-        super().save(*args, **kwargs)
+        """Simpan panen telur, lalu sesuaikan poin dan total telur (catatan baru atau selisih perubahan)."""
+        from .aggregates import previous_version, record_save
+        with transaction.atomic():
+            previous = previous_version(self)
+            super().save(*args, **kwargs)
+            record_save(previous, self)
 
 class Article(models.Model):
     phase = models.ForeignKey(Phase, related_name='articles', on_delete=models.SET_NULL, null=True, blank=True)  # Relasi ke Phase jadi opsional
+    phase_type = models.CharField(max_length=50, choices=Phase.PHASE_CHOICES, blank=True, default='', db_index=True)  # Jenis fase yang relevan
     imageUrl = models.URLField()  # URL untuk gambar artikel
     title = models.CharField(max_length=300)
     description = models.TextField()
@@ -158,6 +197,7 @@ class Article(models.Model):
 
 class Youtube(models.Model):
     phase = models.ForeignKey(Phase, related_name='videos', on_delete=models.SET_NULL, null=True, blank=True)  # Relasi ke Phase
+    phase_type = models.CharField(max_length=50, choices=Phase.PHASE_CHOICES, blank=True, default='', db_index=True)  # Jenis fase yang relevan
     title = models.CharField(max_length=300)
     description = models.TextField(default="Deskripsi video")
     videoId = models.CharField(max_length=100)  # ID video YouTube unik
@@ -168,13 +208,185 @@ class Youtube(models.Model):
     def __str__(self):
         return self.title
     
+@receiver(post_delete, sender=Waste)
+@receiver(post_delete, sender=LarvaHarvest)
+@receiver(post_delete, sender=EggHarvest)
+def revert_totals_on_delete(sender, instance, **kwargs):
+    """Total Cycle, user, dan rekap harian dikurangi saat catatan sampah/panen dihapus."""
+    from .aggregates import record_delete
+    record_delete(instance)
+
+@receiver(post_delete, sender=Phase)
+def refresh_current_phase_on_delete(sender, instance, **kwargs):
+    Cycle.objects.filter(pk=instance.cycle_id).refresh_current_phase()
+
+@receiver(post_save, sender=Phase)
+def fill_phase_on_raw_save(sender, instance, raw, **kwargs):
+    """loaddata tidak memanggil Phase.save(), jadi end_date dan fase aktif diisi di sini."""
+    if raw:
+        end_date = instance.compute_end_date()
+        if end_date != instance.end_date:
+            instance.end_date = end_date
+            Phase.objects.filter(pk=instance.pk).update(end_date=end_date)
+        Cycle.objects.filter(pk=instance.cycle_id).refresh_current_phase()
+
+@receiver(pre_save, sender=Article)
+@receiver(pre_save, sender=Youtube)
+def fill_phase_type(sender, instance, **kwargs):
+    """Konten lama yang hanya punya relasi phase ikut mendapat phase_type dari fase tersebut."""
+    if not instance.phase_type and instance.phase_id:
+        instance.phase_type = Phase.objects.filter(pk=instance.phase_id).values_list('phase_name', flat=True).first() or ''
+
+@receiver([post_save, post_delete], sender=Article)
+@receiver([post_save, post_delete], sender=Youtube)
+def invalidate_content_cache(sender, **kwargs):
+    """Respons Article/Youtube yang di-cache tidak berlaku lagi setelah ada perubahan."""
+    from .caching import bump_version
+    bump_version(sender)
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Youtube)
+def update_search_index(sender, instance, **kwargs):
+    from .search import index_instance
+    index_instance(instance)
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Youtube)
+def remove_from_search_index(sender, instance, **kwargs):
+    from .search import remove_instance
+    remove_instance(instance)
+
+@receiver(post_migrate)
+def create_search_index(sender, **kwargs):
+    """Index full-text dibuat di luar migrasi karena bentuknya berbeda per database."""
+    if sender.name == 'api':
+        from .search import ensure_index
+        ensure_index()
+
 class Notification(models.Model):
+    KIND_PHASE_ENDING = 'phase_ending'
+    KIND_PHASE_ENDED = 'phase_ended'
+    KIND_CHOICES = [
+        (KIND_PHASE_ENDING, 'Fase hampir selesai'),
+        (KIND_PHASE_ENDED, 'Fase sudah selesai'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications", null=True, blank=True)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     cycle = models.ForeignKey(Cycle, on_delete=models.SET_NULL, null=True, blank=True)
     phase = models.ForeignKey(Phase, on_delete=models.SET_NULL, null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, blank=True, default='')  # Kosong untuk notifikasi manual
+    due_date = models.DateField(null=True, blank=True)  # Tanggal akhir fase yang diingatkan
+
+    class Meta:
+        constraints = [
+            # Satu pengingat per fase, jenis, dan tanggal akhir
+            models.UniqueConstraint(fields=['phase', 'kind', 'due_date'], name='unique_phase_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox_idx'),
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.id if self.user else 'Unknown'}: {self.message}"
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    """Notifikasi baru dikirim ke koneksi SSE milik user."""
+    if created:
+        from .push import publish_notifications
+        publish_notifications([instance])
+
+
+class UploadSession(models.Model):
+    """
+    Upload foto bertahap (chunked). Klien mengirim file dalam potongan kecil
+    sehingga koneksi yang lambat tidak menahan satu worker terlalu lama, dan
+    upload yang terputus bisa dilanjutkan dari `received_size`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()  # Ukuran file lengkap (byte)
+    received_size = models.PositiveBigIntegerField(default=0)  # Byte yang sudah diterima
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Upload {self.filename} ({self.received_size}/{self.total_size} byte)"
+
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+
+
+
+class DailyRollup(models.Model):
+    """
+    Total harian per Cycle untuk laporan (lihat api/reports.py). Diperbarui
+    bersamaan dengan total Cycle di api.aggregates, dan bisa dibangun ulang
+    dengan `python manage.py refresh_rollups`.
+    """
+    cycle = models.ForeignKey(Cycle, related_name='rollups', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='rollups', on_delete=models.CASCADE, null=True, blank=True)  # Pemilik Cycle
+    date = models.DateField()
+    waste_amount = models.BigIntegerField(default=0)  # Sampah diolah (gram)
+    waste_count = models.PositiveIntegerField(default=0)
+    larva_harvest = models.BigIntegerField(default=0)  # Panen larva (gram)
+    larva_harvest_count = models.PositiveIntegerField(default=0)
+    kasgot = models.BigIntegerField(default=0)  # Kasgot (gram)
+    for_sale = models.BigIntegerField(default=0)  # Larva siap jual (gram)
+    for_breeding = models.BigIntegerField(default=0)  # Larva untuk bibit (gram)
+    egg_harvest = models.BigIntegerField(default=0)  # Panen telur (gram)
+    egg_harvest_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cycle', 'date'], name='unique_cycle_rollup_date'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='rollup_user_date_idx'),
+            models.Index(fields=['date'], name='rollup_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rekap {self.cycle_id} pada {self.date}"
+
+class ContentVersion(models.Model):
+    """
+    Waktu perubahan terakhir per model konten (lihat api/caching.py). Disimpan di
+    database agar ikut transaksi perubahan kontennya dan sama untuk semua proses.
+    """
+    label = models.CharField(max_length=100, unique=True)  # Misalnya 'api.article'
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.label} @ {self.changed_at}"
+
+class IdempotencyRecord(models.Model):
+    """
+    Respons pertama untuk sebuah `Idempotency-Key` (lihat api/idempotency.py).
+    Request ulang dengan kunci yang sama dijawab dari sini tanpa menjalankan view.
+    """
+    IN_PROGRESS = 0  # status_code selama request pertama masih diproses
+
+    key_hash = models.CharField(max_length=64, unique=True)  # sha256(kunci, method, path, id user)
+    request_hash = models.CharField(max_length=64, blank=True, default='')  # sha256 isi request pertama
+    status_code = models.PositiveSmallIntegerField(default=IN_PROGRESS)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    body = models.BinaryField(blank=True, default=b'')  # Dikompres dengan zlib
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency {self.key_hash[:12]} ({self.status_code})"
+
+# Foto yang diunggah dibuatkan thumbnail dan versi terkompresi di background
+images.register(Cycle, 'egg_photo')
+images.register(Waste, 'waste_photo')
+images.register(LarvaHarvest, 'harvest_photo')
+images.register(EggHarvest, 'egg_photo')
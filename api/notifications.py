@@ -0,0 +1,104 @@
+"""
+Penjadwal notifikasi fase.
+
+Dijalankan berkala (`manage.py send_phase_notifications`, misalnya lewat cron
+setiap jam). Fase aktif yang akan berakhir dalam REMINDER_DAYS hari, ditambah
+fase aktif yang sudah lewat (sampai OVERDUE_LOOKBACK_DAYS) tetapi belum pernah
+mendapat notifikasi "sudah selesai" (misalnya karena penjadwal sempat mati), dicari
+dengan satu query, lalu notifikasinya dibuat sekaligus dengan bulk_create. Duplikat
+dicegah oleh unique constraint (phase, kind, due_date) pada Notification.
+
+Jumlah notifikasi belum dibaca dihitung langsung lewat index
+(user, is_read, created_at) tanpa cache, jadi selalu konsisten.
+"""
+from datetime import timedelta
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from .models import Notification, Phase
+from .push import publish_notifications, publish_unread_count
+
+REMINDER_DAYS = 2  # Pengingat mulai dikirim 2 hari sebelum fase berakhir
+OVERDUE_LOOKBACK_DAYS = 30  # Fase yang lewat lebih lama dari ini tidak lagi diingatkan
+
+MESSAGES = {
+    Notification.KIND_PHASE_ENDING: "Check {name} kamu karena hampir memasuki fase baru. Pastikan kamu memeriksa perubahan pada siklusnya.",
+    Notification.KIND_PHASE_ENDED: "Check {name} kamu karena seharusnya sudah memasuki fase baru. Pastikan kamu memeriksa perubahan pada siklusnya.",
+}
+
+
+def due_phases(today):
+    """
+    Fase aktif setiap siklus yang tanggal akhirnya jatuh antara hari ini dan
+    REMINDER_DAYS hari ke depan, atau sudah lewat (maksimal OVERDUE_LOOKBACK_DAYS)
+    tanpa notifikasi PHASE_ENDED. Memakai index end_date dan Cycle.current_phase.
+    """
+    ended_sent = Notification.objects.filter(
+        phase=OuterRef('pk'), kind=Notification.KIND_PHASE_ENDED, due_date=OuterRef('end_date')
+    )
+    return (
+        Phase.objects.current()
+        .filter(end_date__range=(today - timedelta(days=OVERDUE_LOOKBACK_DAYS), today + timedelta(days=REMINDER_DAYS)))
+        .filter(Q(end_date__gte=today) | ~Exists(ended_sent))
+        .filter(cycle__user__isnull=False)
+        .select_related('cycle')
+    )
+
+
+def build_notification(phase, today):
+    due_date = phase.end_date
+    kind = Notification.KIND_PHASE_ENDED if due_date <= today else Notification.KIND_PHASE_ENDING
+    return Notification(
+        user_id=phase.cycle.user_id,
+        message=MESSAGES[kind].format(name=phase.cycle.name),
+        cycle=phase.cycle,  # Menyimpan referensi ke Cycle
+        phase=phase,  # Menyimpan referensi ke Phase
+        kind=kind,
+        due_date=due_date,
+    )
+
+
+def schedule_phase_notifications(today=None):
+    """Membuat notifikasi untuk semua fase yang jatuh tempo. Mengembalikan notifikasi baru."""
+    today = today or timezone.localdate()
+    candidates = [build_notification(phase, today) for phase in due_phases(today)]
+    if not candidates:
+        return []
+
+    existing = set(
+        Notification.objects.filter(phase_id__in=[notification.phase_id for notification in candidates])
+        .exclude(kind='')
+        .values_list('phase_id', 'kind', 'due_date')
+    )
+    new = [
+        notification for notification in candidates
+        if (notification.phase_id, notification.kind, notification.due_date) not in existing
+    ]
+    # ignore_conflicts menangani penjadwal lain yang berjalan bersamaan
+    Notification.objects.bulk_create(new, ignore_conflicts=True)
+
+    # bulk_create dengan ignore_conflicts tidak mengisi id, jadi baris baru diambil ulang untuk push
+    keys = {(notification.phase_id, notification.kind, notification.due_date) for notification in new}
+    created = [
+        notification for notification in Notification.objects.filter(
+            phase_id__in={key[0] for key in keys}, kind__in={key[1] for key in keys}
+        )
+        if (notification.phase_id, notification.kind, notification.due_date) in keys
+    ]
+    publish_notifications(created)
+    return created
+
+
+def unread_count(user_id):
+    """Jumlah notifikasi belum dibaca, dihitung dari index notification_unread_idx."""
+    return Notification.objects.filter(user=user_id, is_read=False).count()
+
+
+def mark_read(user_id, ids=None):
+    """Menandai notifikasi user sebagai dibaca dalam satu UPDATE. Tanpa `ids` berarti semuanya."""
+    queryset = Notification.objects.filter(user=user_id, is_read=False)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    updated = queryset.update(is_read=True)
+    if updated:
+        publish_unread_count(user_id)
+    return updated
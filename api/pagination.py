@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Pagination berbasis cursor (keyset) dengan urutan id terbaru lebih dulu.
+    Setiap halaman cukup membaca `page_size` baris lewat index primary key,
+    berapa pun besar tabelnya.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+
+class NotificationCursorPagination(IdCursorPagination):
+    """Notifikasi terbaru lebih dulu, memakai index (user, created_at)."""
+    ordering = ('-created_at', '-id')
+
+
+class SearchPagination(LimitOffsetPagination):
+    """Hasil pencarian diurutkan berdasarkan relevansi, jadi memakai limit/offset."""
+    default_limit = 20
+    max_limit = 100
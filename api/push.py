@@ -0,0 +1,225 @@
+"""
+Pengiriman notifikasi real-time (Server-Sent Events).
+
+Setiap koneksi SSE yang terbuka punya antrean sendiri di proses yang
+melayaninya. `InProcessBroker` hanya meneruskan event yang di-publish di
+proses yang sama, jadi hanya cocok untuk satu proses. Broker bawaan,
+`DatabasePollingBroker`, memeriksa tabel Notification secara berkala sehingga
+notifikasi dari proses lain (worker lain, penjadwal cron) tetap sampai.
+Broker lain (misalnya Redis pub/sub, atau stand-in saat testing) dapat
+dipasang lewat setting NOTIFICATION_BROKER atau `set_broker`.
+
+Stream hanya dilayani lewat ASGI; di bawah WSGI satu koneksi SSE akan menahan
+satu worker sampai timeout, jadi endpoint-nya membalas 503.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroker:
+    queue_size = 100  # Event yang tertahan per koneksi sebelum event baru dibuang
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Mendaftarkan koneksi baru; harus dipanggil dari dalam event loop."""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            self._subscribers[user_id].discard(subscription)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def has_subscribers(self, user_id):
+        return bool(self._subscribers.get(user_id))
+
+    def publish(self, user_id, event):
+        """Mengirim event ke semua koneksi user; aman dipanggil dari thread mana pun."""
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscriptions:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Antrean SSE penuh, event dibuang")
+
+
+class DatabasePollingBroker(InProcessBroker):
+    """
+    Broker untuk banyak proses tanpa layanan tambahan. Selama ada koneksi,
+    setiap proses menjalankan satu task yang setiap NOTIFICATION_POLL_INTERVAL
+    detik mengambil notifikasi baru dan jumlah belum dibaca untuk user yang
+    terhubung ke proses itu. `publish` tidak melakukan apa-apa agar event tidak
+    terkirim dua kali.
+
+    Notifikasi dicari berdasarkan created_at, mundur NOTIFICATION_POLL_OVERLAP
+    detik dari pemeriksaan sebelumnya, lalu disaring dengan id yang sudah
+    dikirim. Id yang lebih kecil bisa ter-commit setelah id yang lebih besar
+    (transaksi paralel), jadi id terbesar tidak bisa dipakai sebagai penanda.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._task = None
+        self._started_at = None
+        self._since = None
+        self._sent = {}  # id notifikasi -> created_at, selama masih dalam jendela overlap
+        self._counts = {}
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        if self._task is None or self._task.done():
+            self._started_at = timezone.now()
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return subscription
+
+    def has_subscribers(self, user_id):
+        return False
+
+    def publish(self, user_id, event):
+        pass
+
+    async def _poll(self):
+        while True:
+            with self._lock:
+                user_ids = set(self._subscribers)
+            if not user_ids:
+                # Mulai dari awal lagi saat ada koneksi baru
+                self._since = None
+                self._sent = {}
+                self._counts = {}
+                return
+            try:
+                events = await asyncio.to_thread(self._poll_in_thread, user_ids)
+            except Exception:
+                logger.exception("Gagal memeriksa notifikasi baru")
+            else:
+                for user_id, event in events:
+                    self.deliver(user_id, event)
+            await asyncio.sleep(settings.NOTIFICATION_POLL_INTERVAL)
+
+    def _poll_in_thread(self, user_ids):
+        close_old_connections()
+        try:
+            return self.poll_once(user_ids)
+        finally:
+            close_old_connections()
+
+    def poll_once(self, user_ids):
+        """
+        Mengembalikan daftar (user_id, event) sejak pemeriksaan sebelumnya.
+        Pemeriksaan pertama mulai dari notifikasi yang dibuat setelah task
+        berjalan. User yang baru terlihat selalu dikirimi jumlah belum dibaca,
+        agar perubahan di antara subscribe dan pemeriksaan ini tidak hilang.
+        """
+        from .models import Notification
+        events = []
+        now = timezone.now()
+        if self._started_at is None:
+            self._started_at = now
+        if self._since is None:
+            lower = self._started_at
+        else:
+            lower = max(self._since - timedelta(seconds=settings.NOTIFICATION_POLL_OVERLAP), self._started_at)
+        self._since = now
+
+        new = Notification.objects.filter(user__in=user_ids, created_at__gte=lower).order_by('created_at', 'pk')
+        for notification in new:
+            if notification.pk not in self._sent:
+                self._sent[notification.pk] = notification.created_at
+                events.append((notification.user_id, notification_event(notification)))
+        # Id di luar jendela pemeriksaan berikutnya tidak perlu diingat lagi
+        horizon = now - timedelta(seconds=settings.NOTIFICATION_POLL_OVERLAP)
+        self._sent = {pk: created_at for pk, created_at in self._sent.items() if created_at >= horizon}
+
+        counts = dict(
+            Notification.objects.filter(user__in=user_ids, is_read=False)
+            .order_by().values_list('user').annotate(count=Count('pk'))
+        )
+        for user_id in user_ids:
+            count = counts.get(user_id, 0)
+            if self._counts.get(user_id) != count:
+                events.append((user_id, {'type': 'unread_count', 'data': {'unread_count': count}}))
+        self._counts = {user_id: counts.get(user_id, 0) for user_id in user_ids}
+        return events
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.NOTIFICATION_BROKER)()
+    return _broker
+
+
+def set_broker(broker):
+    """Mengganti broker aktif (misalnya dengan stand-in saat testing)."""
+    global _broker
+    _broker = broker
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+def notification_event(notification):
+    from .serializers import NotificationSerializer
+    return {'type': 'notification', 'data': NotificationSerializer(notification).data}
+
+
+def unread_count_event(user_id):
+    from .notifications import unread_count
+    return {'type': 'unread_count', 'data': {'unread_count': unread_count(user_id)}}
+
+
+def publish_notifications(notifications):
+    """Mengirim notifikasi baru dan jumlah belum dibaca terbaru setelah transaksi commit."""
+    notifications = [notification for notification in notifications if notification.user_id is not None]
+
+    def send():
+        broker = get_broker()
+        user_ids = set()
+        for notification in notifications:
+            if broker.has_subscribers(notification.user_id):
+                broker.publish(notification.user_id, notification_event(notification))
+                user_ids.add(notification.user_id)
+        for user_id in user_ids:
+            broker.publish(user_id, unread_count_event(user_id))
+
+    if notifications:
+        transaction.on_commit(send)
+
+
+def publish_unread_count(user_id):
+    def send():
+        broker = get_broker()
+        if broker.has_subscribers(user_id):
+            broker.publish(user_id, unread_count_event(user_id))
+
+    transaction.on_commit(send)
@@ -0,0 +1,98 @@
+"""
+Laporan sampah dan panen per hari/minggu/bulan.
+
+Laporan dibaca dari DailyRollup (satu baris per Cycle per hari), bukan dari
+tabel Waste/LarvaHarvest/EggHarvest, jadi rentang tanggal panjang tetap
+ringan. Pengelompokan dan rasio konversi dihitung di SQL.
+"""
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, NullIf, TruncDay, TruncMonth, TruncWeek
+from .models import DailyRollup, EggHarvest, LarvaHarvest, Waste
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,  # Minggu dimulai hari Senin
+    'month': TruncMonth,
+}
+
+SUM_FIELDS = [
+    'waste_amount', 'waste_count', 'larva_harvest', 'larva_harvest_count',
+    'kasgot', 'for_sale', 'for_breeding', 'egg_harvest', 'egg_harvest_count',
+]
+
+
+def _ratio(numerator, denominator):
+    return Cast(F(numerator), FloatField()) / NullIf(Cast(F(denominator), FloatField()), 0.0)
+
+
+def report(queryset, bucket='day'):
+    """Total per periode dari queryset DailyRollup, urut dari periode terlama."""
+    rows = (
+        queryset.annotate(period=BUCKETS[bucket]('date'))
+        .values('period')
+        .annotate(**{field: Sum(field) for field in SUM_FIELDS})
+        .annotate(
+            # Berapa gram larva dan kasgot yang dihasilkan dari setiap gram sampah
+            larva_per_waste=_ratio('larva_harvest', 'waste_amount'),
+            kasgot_per_waste=_ratio('kasgot', 'waste_amount'),
+        )
+        .order_by('period')
+    )
+    return list(rows)
+
+
+# Sumber rekap: model -> (lookup cycle, field tanggal, {kolom rekap: agregat})
+SOURCES = {
+    Waste: ('phase__cycle', 'waste_date', {
+        'waste_amount': Sum('waste_amount'),
+        'waste_count': Count('pk'),
+    }),
+    LarvaHarvest: ('phase__cycle', 'harvest_date', {
+        'larva_harvest': Sum('total_harvest'),
+        'larva_harvest_count': Count('pk'),
+        'kasgot': Sum('total_kasgot'),
+        'for_sale': Sum('total_for_sale'),
+        'for_breeding': Sum('total_for_breeding'),
+    }),
+    EggHarvest: ('cycle', 'harvest_date', {
+        'egg_harvest': Sum('total_egg_harvest'),
+        'egg_harvest_count': Count('pk'),
+    }),
+}
+
+
+def refresh(since=None):
+    """
+    Membangun ulang DailyRollup dari tabel sumber, untuk semua tanggal atau
+    mulai `since`. Satu query GROUP BY per tabel sumber, lalu bulk_create.
+    Mengembalikan jumlah baris rekap.
+    """
+    totals = defaultdict(Counter)
+    for model, (cycle_lookup, date_field, aggregates) in SOURCES.items():
+        queryset = model.objects.all()
+        if since is not None:
+            queryset = queryset.filter(**{f'{date_field}__gte': since})
+        rows = (
+            queryset.order_by()
+            .values(cycle_lookup, f'{cycle_lookup}__user', date_field)
+            .annotate(**aggregates)
+        )
+        for row in rows:
+            key = (row[cycle_lookup], row[f'{cycle_lookup}__user'], row[date_field])
+            totals[key].update({field: row[field] or 0 for field in aggregates})
+
+    with transaction.atomic():
+        existing = DailyRollup.objects.all()
+        if since is not None:
+            existing = existing.filter(date__gte=since)
+        existing.delete()
+        DailyRollup.objects.bulk_create(
+            [
+                DailyRollup(cycle_id=cycle_id, user_id=user_id, date=day, **values)
+                for (cycle_id, user_id, day), values in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
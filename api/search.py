@@ -0,0 +1,162 @@
+"""
+Pencarian full-text untuk artikel dan video.
+
+- PostgreSQL: index GIN atas ekspresi `to_tsvector('indonesian', ...)`; query
+  memakai ekspresi yang sama persis sehingga planner bisa memakai index itu.
+- SQLite (development): tabel virtual FTS5 `api_search_fts` berisi teks yang
+  sudah di-stem oleh `stem()`, diperbarui lewat signal setiap kali konten
+  disimpan atau dihapus.
+
+Index/tabel dibuat setelah `migrate` dan bisa dibangun ulang dengan
+`python manage.py build_search_index`.
+"""
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from .models import Article, Youtube
+
+# Model -> (nama jenis di index, kolom yang dicari)
+SEARCH_FIELDS = {
+    Article: ('article', ['title', 'description', 'author']),
+    Youtube: ('video', ['title', 'description', 'channel_name']),
+}
+
+PG_CONFIG = 'indonesian'
+FTS_TABLE = 'api_search_fts'
+
+PARTICLES = ('kah', 'pun')  # -lah/-tah sengaja tidak dibuang: olah, sekolah, masalah
+POSSESSIVES = ('nya', 'ku', 'mu')
+SUFFIXES = ('kan', 'an', 'i')
+PREFIXES = ('meny', 'peny', 'meng', 'peng', 'mem', 'pem', 'men', 'pen', 'ber', 'ter', 'per', 'me', 'pe', 'be', 'di', 'ke', 'se')
+MIN_STEM = 4
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _strip_suffix(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def stem(word):
+    """
+    Stemmer imbuhan bahasa Indonesia yang sederhana: partikel, kata ganti
+    milik, akhiran lalu awalan, masing-masing paling banyak satu.
+    'pengolahannya' -> 'olah', 'diolah' -> 'olah', 'menyaring' -> 'saring'.
+    """
+    word = word.lower()
+    for group in (PARTICLES, POSSESSIVES, SUFFIXES):
+        word = _strip_suffix(word, group)
+    for prefix in PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= MIN_STEM:
+            rest = word[len(prefix):]
+            # meny-/peny- meluluhkan huruf s: menyaring -> saring
+            return 's' + rest if prefix in ('meny', 'peny') else rest
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(text or '')]
+
+
+def document_text(instance):
+    _, fields = SEARCH_FIELDS[type(instance)]
+    return ' '.join(tokenize(' '.join(getattr(instance, field) or '' for field in fields)))
+
+
+def _pg_vector(model):
+    _, fields = SEARCH_FIELDS[model]
+    columns = " || ' ' || ".join(f"coalesce({connection.ops.quote_name(field)}, '')" for field in fields)
+    return f"to_tsvector('{PG_CONFIG}', {columns})"
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def ensure_index():
+    """Buat index GIN (PostgreSQL) atau tabel FTS5 (SQLite) jika belum ada."""
+    with connection.cursor() as cursor:
+        if is_postgres():
+            for model in SEARCH_FIELDS:
+                table = model._meta.db_table
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN ({_pg_vector(model)})"
+                )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "kind UNINDEXED, object_id UNINDEXED, body, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+
+def index_instance(instance):
+    """Perbarui baris FTS5 untuk satu konten. PostgreSQL tidak perlu apa-apa."""
+    if connection.vendor != 'sqlite':
+        return
+    kind, _ = SEARCH_FIELDS[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE kind = %s AND object_id = %s", [kind, instance.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (kind, object_id, body) VALUES (%s, %s, %s)",
+            [kind, instance.pk, document_text(instance)],
+        )
+
+
+def remove_instance(instance):
+    if connection.vendor != 'sqlite':
+        return
+    kind, _ = SEARCH_FIELDS[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE kind = %s AND object_id = %s", [kind, instance.pk])
+
+
+def rebuild(model):
+    """Isi ulang index FTS5 untuk satu model. Mengembalikan jumlah baris."""
+    if connection.vendor != 'sqlite':
+        return model.objects.count()
+    kind, fields = SEARCH_FIELDS[model]
+    rows = [
+        (kind, instance.pk, document_text(instance))
+        for instance in model.objects.only('pk', *fields).iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE kind = %s", [kind])
+        cursor.executemany(f"INSERT INTO {FTS_TABLE} (kind, object_id, body) VALUES (%s, %s, %s)", rows)
+    return len(rows)
+
+
+def search(queryset, query):
+    """
+    Saring `queryset` (Article atau Youtube) dengan kata kunci `query` dan
+    urutkan berdasarkan relevansi, paling relevan lebih dulu.
+    """
+    model = queryset.model
+    table = model._meta.db_table
+    if is_postgres():
+        vector = _pg_vector(model)
+        tsquery = f"websearch_to_tsquery('{PG_CONFIG}', %s)"
+        return queryset.filter(
+            RawSQL(f"{vector} @@ {tsquery}", [query], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f"ts_rank({vector}, {tsquery})", [query], output_field=FloatField())
+        ).order_by('-rank', '-id')
+
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    # Setiap kata wajib ada; prefix match supaya kata yang belum selesai diketik tetap ketemu
+    match = ' '.join('"%s"*' % term.replace('"', '') for term in terms)
+    kind, _ = SEARCH_FIELDS[model]
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT object_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND kind = %s", [match, kind])
+    ).annotate(
+        rank=RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND kind = %s AND object_id = {table}.id",
+            [match, kind],
+            output_field=FloatField(),
+        )
+    ).order_by('-rank', '-id')
@@ -1,27 +1,210 @@
+from functools import partial
 from rest_framework import serializers
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Prefetch
 from .models import *
+from .images import variant_urls
+from . import feeds, uploads
 
-class CycleSerializer(serializers.ModelSerializer):
+
+class EagerLoadingMixin:
+    """
+    Serializer mendeklarasikan relasi yang dibacanya, dan viewset memuat relasi
+    tersebut sekaligus sehingga jumlah query list tidak bertambah per baris.
+    """
+    select_related_fields = []
+    prefetch_related_fields = []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
+class FieldSelectionMixin:
+    """
+    Memangkas field yang dikirim sesuai `selected_fields`, misalnya dari
+    `?fields=name,phases.phase_name,phases.wastes`. Titik memilih field dari
+    serializer bersarang; relasi tanpa sub-field dikirim utuh.
+    """
+
+    def __init__(self, *args, selected_fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selected_fields = selected_fields
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.selected_fields:
+            return fields
+
+        tree = {}
+        for path in self.selected_fields:
+            name, _, rest = path.partition('.')
+            tree.setdefault(name, set())
+            if rest:
+                tree[name].add(rest)
+
+        selected = {}
+        for name, field in fields.items():
+            if name not in tree:
+                continue
+            nested = getattr(field, 'child', field)
+            if tree[name] and isinstance(nested, FieldSelectionMixin):
+                nested.selected_fields = tree[name]
+            selected[name] = field
+        return selected
+
+
+class OwnedRelationsMixin:
+    """
+    Membatasi pilihan relasi yang bisa ditulis (misalnya `phase`, `cycle`) ke
+    data milik user yang sedang login, sehingga catatan tidak bisa dibuat di
+    Cycle user lain. `owned_relations` memetakan nama field ke lookup pemilik.
+    Staff boleh memilih data siapa pun.
+    """
+    owned_relations = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        for name, owner_field in self.owned_relations.items():
+            field = fields.get(name)
+            if field is None or field.read_only:
+                continue
+            if user is None or not user.is_authenticated:
+                field.queryset = field.queryset.none()
+            elif not user.is_staff:
+                field.queryset = field.queryset.filter(**{owner_field: user.pk})
+        return fields
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URL varian gambar (thumbnail, versi terkompresi) dari field gambar pada `source`."""
+
+    def to_representation(self, value):
+        urls = variant_urls(value)
+        request = self.context.get('request')
+        if urls and request is not None:
+            urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+        return urls
+
+
+class ChunkedUploadMixin:
+    """
+    Mengizinkan field gambar diisi dari UploadSession yang sudah lengkap.
+    `upload_fields` memetakan nama field id upload ke field gambar, misalnya
+    {'waste_photo_upload': 'waste_photo'}. Klien mengirim salah satunya.
+    File upload divalidasi sebagai gambar saat validasi, tetapi baru dibuka
+    untuk disimpan di save(), sehingga tidak ada file yang tertinggal terbuka
+    jika save() tidak pernah dipanggil.
+    """
+    upload_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for upload_field, image_field in self.upload_fields.items():
+            fields[upload_field] = serializers.UUIDField(write_only=True, required=False)
+            fields[image_field].required = False
+        return fields
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        self._uploads = []
+        request = self.context.get('request')
+        for upload_field, image_field in self.upload_fields.items():
+            upload_id = attrs.pop(upload_field, None)
+            if upload_id is not None:
+                session = UploadSession.objects.filter(
+                    pk=upload_id, user_id=getattr(request.user, 'pk', None) if request else None
+                ).first()
+                if session is None or not session.is_complete:
+                    raise serializers.ValidationError({upload_field: "Upload tidak ditemukan atau belum selesai."})
+                try:
+                    uploads.validate_image(session)
+                except DjangoValidationError as error:
+                    raise serializers.ValidationError({upload_field: error.messages})
+                self._uploads.append((session, image_field))
+            elif self.instance is None and not attrs.get(image_field):
+                raise serializers.ValidationError({image_field: "This field is required."})
+        return attrs
+
+    def save(self, **kwargs):
+        pending = getattr(self, '_uploads', [])
+        opened = []
+        try:
+            for session, image_field in pending:
+                kwargs[image_field] = uploads.open_completed(session)
+                opened.append(kwargs[image_field])
+            instance = super().save(**kwargs)
+        finally:
+            # File sudah disalin ke storage oleh field gambar (atau save gagal)
+            for upload in opened:
+                upload.close()
+        for session, _ in pending:
+            # File sementara dihapus setelah commit; jika transaksi batal, upload masih bisa dipakai
+            transaction.on_commit(partial(uploads.discard, session))
+        return instance
+
+
+class CycleSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     phases = serializers.PrimaryKeyRelatedField(many=True, read_only=True)  # Menambahkan relasi reverse
+    egg_photo_variants = ImageVariantsField(source='egg_photo')
+
+    prefetch_related_fields = [
+        Prefetch('phases', queryset=Phase.objects.only('id', 'cycle_id')),
+    ]
 
     class Meta:
         model = Cycle
-        fields = ['id', 'date', 'name', 'egg_photo', 'phases', 'user', 'points'] 
-        read_only_fields = ['user'] 
+        fields = [
+            'id', 'date', 'name', 'egg_photo', 'egg_photo_variants', 'phases', 'current_phase', 'user', 'points',
+            'total_waste', 'total_harvest', 'total_egg_harvest',
+            'total_kasgot', 'total_for_sale', 'total_for_breeding',
+        ]
+        read_only_fields = [
+            'user', 'current_phase', 'points', 'total_waste', 'total_harvest', 'total_egg_harvest',
+            'total_kasgot', 'total_for_sale', 'total_for_breeding',
+        ]
+
+    def update(self, instance, validated_data):
+        """
+        Hanya kolom yang dikirim yang ditulis. Total dan current_phase diperbarui
+        lewat UPDATE terpisah, jadi nilai lama di instance tidak boleh ikut disimpan.
+        """
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
     
 
-class PhaseSerializer(serializers.ModelSerializer):
+class PhaseSerializer(OwnedRelationsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    owned_relations = {'cycle': 'user'}
+    prefetch_related_fields = [
+        Prefetch('articles', queryset=Article.objects.only('id', 'phase_id')),
+        Prefetch('videos', queryset=Youtube.objects.only('id', 'phase_id')),
+    ]
+
     class Meta:
         model = Phase
-        fields = ['id', 'cycle', 'phase_name', 'start_date', 'notes', 'articles', 'videos']
+        fields = ['id', 'cycle', 'phase_name', 'start_date', 'end_date', 'notes', 'articles', 'videos']
+        read_only_fields = ['end_date']
 
 
-class WasteSerializer(serializers.ModelSerializer):
+class WasteSerializer(FieldSelectionMixin, OwnedRelationsMixin, ChunkedUploadMixin, serializers.ModelSerializer):
     waste_amount_with_unit = serializers.SerializerMethodField()  # Field tambahan
+    waste_photo_variants = ImageVariantsField(source='waste_photo')
+    upload_fields = {'waste_photo_upload': 'waste_photo'}
+    owned_relations = {'phase': 'cycle__user'}
 
     class Meta:
         model = Waste
-        fields = ['id', 'phase', 'waste_date', 'waste_amount', 'waste_amount_with_unit', 'waste_photo']
+        fields = ['id', 'client_id', 'phase', 'waste_date', 'waste_amount', 'waste_amount_with_unit', 'waste_photo', 'waste_photo_variants']
 
     def get_waste_amount_with_unit(self, obj):
         """
@@ -30,22 +213,29 @@ class WasteSerializer(serializers.ModelSerializer):
         return f"{obj.waste_amount} g"
 
 
-class LarvaHarvestSerializer(serializers.ModelSerializer):
+class LarvaHarvestSerializer(FieldSelectionMixin, OwnedRelationsMixin, ChunkedUploadMixin, serializers.ModelSerializer):
+    harvest_photo_variants = ImageVariantsField(source='harvest_photo')
+    upload_fields = {'harvest_photo_upload': 'harvest_photo'}
+    owned_relations = {'phase': 'cycle__user'}
+
     class Meta:
         model = LarvaHarvest
         fields = [
-            'id', 'phase', 'harvest_date', 'total_harvest',
-            'total_for_sale', 'total_for_breeding', 'total_kasgot', 'harvest_photo'
+            'id', 'client_id', 'phase', 'harvest_date', 'total_harvest',
+            'total_for_sale', 'total_for_breeding', 'total_kasgot', 'harvest_photo', 'harvest_photo_variants'
         ]
 
 
-class EggHarvestSerializer(serializers.ModelSerializer):
+class EggHarvestSerializer(FieldSelectionMixin, OwnedRelationsMixin, ChunkedUploadMixin, serializers.ModelSerializer):
     total_egg_harvest_with_unit = serializers.SerializerMethodField()  # Field tambahan
+    egg_photo_variants = ImageVariantsField(source='egg_photo')
+    upload_fields = {'egg_photo_upload': 'egg_photo'}
+    owned_relations = {'cycle': 'user'}
     # harvest_date_formatted = serializers.DateField(format="%Y-%m-%d")
 
     class Meta:
         model = EggHarvest
-        fields = ['cycle', 'total_egg_harvest', 'total_egg_harvest_with_unit', 'egg_photo', 'harvest_date']
+        fields = ['client_id', 'cycle', 'total_egg_harvest', 'total_egg_harvest_with_unit', 'egg_photo', 'egg_photo_variants', 'harvest_date']
 
     def get_total_egg_harvest_with_unit(self, obj):
         """
@@ -54,24 +244,144 @@ class EggHarvestSerializer(serializers.ModelSerializer):
         return f"{obj.total_egg_harvest} g"
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Article
-        fields = ['id', 'phase', 'imageUrl', 'title', 'description', 'author', 'date_published']
+        fields = ['id', 'phase', 'phase_type', 'imageUrl', 'title', 'description', 'author', 'date_published']
 
 
-class YoutubeSerializer(serializers.ModelSerializer):
+class YoutubeSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     youtube_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Youtube
-        fields = ['id', 'phase', 'title', 'description' , 'videoId', 'youtube_url', 'channel_name', 'date_published']
+        fields = ['id', 'phase', 'phase_type', 'title', 'description' , 'videoId', 'youtube_url', 'channel_name', 'date_published']
 
     def get_youtube_url(self, obj):
         return f"https://www.youtube.com/watch?v={obj.videoId}"
     
 
-class NotificationSerializer(serializers.ModelSerializer):
+class SyncItemSerializer(serializers.ModelSerializer):
+    """
+    Satu catatan dari sinkronisasi offline. Hanya nilai field yang divalidasi
+    di sini; relasi, upload foto, dan duplikat dicek sekaligus oleh api.sync.
+    """
+    client_id = serializers.UUIDField()
+    photo_upload = serializers.UUIDField()
+
+
+class WasteSyncSerializer(SyncItemSerializer):
+    phase = serializers.IntegerField()
+
+    class Meta:
+        model = Waste
+        fields = ['client_id', 'phase', 'waste_date', 'waste_amount', 'photo_upload']
+
+
+class LarvaHarvestSyncSerializer(SyncItemSerializer):
+    phase = serializers.IntegerField()
+
+    class Meta:
+        model = LarvaHarvest
+        fields = [
+            'client_id', 'phase', 'harvest_date', 'total_harvest',
+            'total_for_sale', 'total_for_breeding', 'total_kasgot', 'photo_upload'
+        ]
+
+
+class EggHarvestSyncSerializer(SyncItemSerializer):
+    cycle = serializers.IntegerField()
+
+    class Meta:
+        model = EggHarvest
+        fields = ['client_id', 'cycle', 'total_egg_harvest', 'harvest_date', 'photo_upload']
+
+
+class TimelinePhaseSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """
+    Konten edukasi fase diambil dari feeds.linked_content: relasi `phase` dan
+    `phase_type`, dimuat sekali untuk semua fase dalam `timeline_phases`.
+    """
+    wastes = WasteSerializer(many=True, read_only=True)
+    larva_harvests = LarvaHarvestSerializer(many=True, read_only=True)
+    articles = serializers.SerializerMethodField()
+    videos = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Phase
+        fields = ['id', 'phase_name', 'start_date', 'end_date', 'notes', 'wastes', 'larva_harvests', 'articles', 'videos']
+
+    def linked_content(self, phase):
+        if 'timeline_phases' not in self.context:
+            return feeds.linked_content([phase])[phase.id]
+        if 'linked_content' not in self.context:
+            self.context['linked_content'] = feeds.linked_content(self.context['timeline_phases'])
+        return self.context['linked_content'][phase.id]
+
+    def get_articles(self, phase):
+        return ArticleSerializer(self.linked_content(phase)[0], many=True, context=self.context).data
+
+    def get_videos(self, phase):
+        return YoutubeSerializer(self.linked_content(phase)[1], many=True, context=self.context).data
+
+
+class CycleTimelineSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    """Seluruh isi satu Cycle untuk tampilan timeline, dimuat dengan jumlah query tetap."""
+    phases = TimelinePhaseSerializer(many=True, read_only=True)
+    egg_harvests = EggHarvestSerializer(many=True, read_only=True)
+    egg_photo_variants = ImageVariantsField(source='egg_photo')
+
+    prefetch_related_fields = [
+        Prefetch('phases', queryset=Phase.objects.order_by('start_date', 'id')),
+        'phases__wastes',
+        'phases__larva_harvests',
+        'egg_harvests',
+    ]
+
+    class Meta:
+        model = Cycle
+        fields = [
+            'id', 'date', 'name', 'egg_photo', 'egg_photo_variants', 'user', 'points', 'current_phase',
+            'total_waste', 'total_harvest', 'total_egg_harvest',
+            'total_kasgot', 'total_for_sale', 'total_for_breeding',
+            'phases', 'egg_harvests',
+        ]
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        # Konten edukasi semua fase dimuat sekaligus oleh TimelinePhaseSerializer
+        self.context['timeline_phases'] = instance.phases.all()
+        return super().to_representation(instance)
+
+
+class ReportQuerySerializer(serializers.Serializer):
+    """Parameter query untuk endpoint laporan."""
+    bucket = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    cycle = serializers.IntegerField(required=False)
+    scope = serializers.ChoiceField(choices=['user', 'platform'], default='user')  # platform hanya untuk staff
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'end': "Tanggal akhir harus setelah tanggal mulai."})
+        return attrs
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'received_size', 'created_at', 'completed_at']
+        read_only_fields = ['received_size', 'created_at', 'completed_at']
+
+    def validate_total_size(self, value):
+        if value <= 0 or value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Ukuran file harus antara 1 dan {settings.CHUNKED_UPLOAD_MAX_SIZE} byte.")
+        return value
+
+
+class NotificationSerializer(OwnedRelationsMixin, serializers.ModelSerializer):
+    owned_relations = {'cycle': 'user', 'phase': 'cycle__user'}
 
     class Meta:
         model = Notification
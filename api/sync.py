@@ -0,0 +1,218 @@
+"""
+Sinkronisasi data lapangan yang dicatat offline (sampah, panen larva, panen telur).
+
+Satu request berisi banyak catatan. Semua catatan divalidasi dulu, lalu
+relasi, upload foto, dan client_id yang sudah pernah diterima dicek dengan
+satu query per jenis. Catatan yang lolos disimpan dengan bulk_create dan
+totalnya diterapkan sekali per Cycle/user lewat api.aggregates.record_batch.
+
+bulk_create tidak memanggil save() maupun signal post_save, sehingga
+pembaruan total dan pemrosesan gambar dijalankan manual di sini. Jika batch
+gagal disimpan, foto yang sudah tersalin ke storage dihapus lagi.
+"""
+from collections import namedtuple
+from functools import partial
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from . import aggregates, images, uploads
+from .models import Cycle, EggHarvest, LarvaHarvest, Phase, UploadSession, Waste
+from .serializers import EggHarvestSyncSerializer, LarvaHarvestSyncSerializer, WasteSyncSerializer
+
+MAX_ITEMS = 500  # Jumlah catatan maksimal dalam satu request
+
+STATUS_CREATED = 'created'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_INVALID = 'invalid'
+
+# phase_name: fase yang wajib untuk jenis ini (None berarti fase apa pun)
+SyncKind = namedtuple('SyncKind', ['model', 'serializer', 'relation', 'photo_field', 'phase_name'])
+
+KINDS = {
+    'wastes': SyncKind(Waste, WasteSyncSerializer, 'phase', 'waste_photo', None),
+    'larva_harvests': SyncKind(LarvaHarvest, LarvaHarvestSyncSerializer, 'phase', 'harvest_photo', 'larva'),
+    'egg_harvests': SyncKind(EggHarvest, EggHarvestSyncSerializer, 'cycle', 'egg_photo', None),
+}
+
+
+class SyncError(Exception):
+    pass
+
+
+class Item:
+    """Satu catatan beserta hasilnya yang dikembalikan ke klien."""
+
+    def __init__(self, kind, index, data):
+        self.kind = kind
+        self.spec = KINDS[kind]
+        self.data = data
+        self.result = {'kind': kind, 'index': index, 'client_id': data.get('client_id') if isinstance(data, dict) else None}
+        self.instance = None
+        self.cycle_id = self.user_id = None
+        self.session = self.upload = None
+
+    @property
+    def pending(self):
+        return 'status' not in self.result
+
+    def reject(self, errors):
+        self.result.update(status=STATUS_INVALID, errors=errors)
+
+
+def _owned_phases(user, ids):
+    queryset = Phase.objects.filter(pk__in=ids)
+    if not user.is_staff:
+        queryset = queryset.filter(cycle__user=user.pk)
+    return {
+        pk: (cycle_id, user_id, phase_name)
+        for pk, cycle_id, user_id, phase_name in queryset.values_list('pk', 'cycle_id', 'cycle__user_id', 'phase_name')
+    }
+
+
+def _owned_cycles(user, ids):
+    queryset = Cycle.objects.filter(pk__in=ids)
+    if not user.is_staff:
+        queryset = queryset.filter(user=user.pk)
+    return {pk: (pk, user_id, None) for pk, user_id in queryset.values_list('pk', 'user_id')}
+
+
+def parse(payload):
+    """Validasi field setiap catatan. Mengembalikan daftar Item sesuai urutan request."""
+    if not isinstance(payload, dict):
+        raise SyncError("Body harus berupa object.")
+    items = []
+    for kind in KINDS:
+        rows = payload.get(kind) or []
+        if not isinstance(rows, list):
+            raise SyncError(f"{kind} harus berupa list.")
+        items.extend(Item(kind, index, row) for index, row in enumerate(rows))
+    if len(items) > MAX_ITEMS:
+        raise SyncError(f"Maksimal {MAX_ITEMS} catatan per sinkronisasi.")
+
+    for item in items:
+        serializer = item.spec.serializer(data=item.data)
+        if serializer.is_valid():
+            item.data = serializer.validated_data
+            item.result['client_id'] = str(item.data['client_id'])
+        else:
+            item.reject(serializer.errors)
+    return items
+
+
+def check_duplicates(items):
+    """Catatan yang client_id-nya sudah tersimpan ditandai duplicate beserta id-nya."""
+    for kind, spec in KINDS.items():
+        seen = set()
+        pending = [item for item in items if item.kind == kind and item.pending]
+        existing = dict(
+            spec.model.objects.filter(client_id__in=[item.data['client_id'] for item in pending])
+            .values_list('client_id', 'pk')
+        )
+        for item in pending:
+            client_id = item.data['client_id']
+            if client_id in existing:
+                item.result.update(status=STATUS_DUPLICATE, id=existing[client_id])
+            elif client_id in seen:
+                item.reject({'client_id': ["client_id muncul lebih dari sekali dalam batch."]})
+            else:
+                seen.add(client_id)
+
+
+def check_relations(user, items):
+    """
+    Fase/Cycle harus ada dan milik user; satu query untuk setiap jenis relasi.
+    Panen larva hanya boleh pada fase larva, sama seperti add_larva_harvest.
+    """
+    phase_ids = {item.data['phase'] for item in items if item.pending and item.spec.relation == 'phase'}
+    cycle_ids = {item.data['cycle'] for item in items if item.pending and item.spec.relation == 'cycle'}
+    owners = {
+        'phase': _owned_phases(user, phase_ids) if phase_ids else {},
+        'cycle': _owned_cycles(user, cycle_ids) if cycle_ids else {},
+    }
+    for item in items:
+        if not item.pending:
+            continue
+        relation = item.spec.relation
+        owner = owners[relation].get(item.data[relation])
+        if owner is None:
+            item.reject({relation: ["Tidak ditemukan."]})
+        elif item.spec.phase_name and owner[2] != item.spec.phase_name:
+            item.reject({relation: [f"Hanya bisa dicatat pada fase {item.spec.phase_name}."]})
+        else:
+            item.cycle_id, item.user_id, _ = owner
+
+
+def check_uploads(user, items):
+    """
+    Setiap foto harus berupa UploadSession milik user yang sudah lengkap, belum
+    dipakai, dan berisi gambar yang valid.
+    """
+    upload_ids = {item.data['photo_upload'] for item in items if item.pending}
+    sessions = {session.pk: session for session in UploadSession.objects.filter(pk__in=upload_ids, user=user.pk)}
+    used = set()
+    for item in items:
+        if not item.pending:
+            continue
+        session = sessions.get(item.data['photo_upload'])
+        if session is None or not session.is_complete or session.pk in used:
+            item.reject({'photo_upload': ["Upload tidak ditemukan atau belum selesai."]})
+            continue
+        try:
+            uploads.validate_image(session)
+        except DjangoValidationError as error:
+            item.reject({'photo_upload': error.messages})
+        else:
+            used.add(session.pk)
+            item.session = session
+
+
+def build_instance(item):
+    data = dict(item.data)
+    data.pop('photo_upload')
+    relation = item.spec.relation
+    data[f'{relation}_id'] = data.pop(relation)
+    item.upload = uploads.open_completed(item.session)
+    data[item.spec.photo_field] = item.upload
+    return item.spec.model(**data)
+
+
+def delete_stored_photos(items):
+    """Menghapus foto yang sudah tersalin ke storage oleh batch yang gagal disimpan."""
+    for item in items:
+        if item.instance is None:
+            continue
+        field_file = getattr(item.instance, item.spec.photo_field)
+        if field_file and field_file._committed:
+            field_file.storage.delete(field_file.name)
+
+
+def sync_records(user, payload):
+    """Memproses satu batch sinkronisasi. Mengembalikan hasil per catatan."""
+    items = parse(payload)
+    check_duplicates(items)
+    check_relations(user, items)
+    check_uploads(user, items)
+
+    accepted = [item for item in items if item.pending]
+    try:
+        with transaction.atomic():
+            try:
+                for item in accepted:
+                    item.instance = build_instance(item)
+                for kind, spec in KINDS.items():
+                    spec.model.objects.bulk_create([item.instance for item in accepted if item.kind == kind])
+            finally:
+                # File sudah disalin ke storage oleh bulk_create, file sementara bisa ditutup
+                for item in accepted:
+                    if item.upload is not None:
+                        item.upload.close()
+
+            aggregates.record_batch((item.cycle_id, item.user_id, item.instance) for item in accepted)
+            for item in accepted:
+                # Upload dibuang setelah commit; jika batal, klien bisa mengirim ulang dengan upload yang sama
+                transaction.on_commit(partial(uploads.discard, item.session))
+                images.schedule(item.instance)
+                item.result.update(status=STATUS_CREATED, id=item.instance.pk)
+    except Exception:
+        delete_stored_photos(accepted)
+        raise
+    return [item.result for item in items]
@@ -1,3 +1,863 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import uuid
+from datetime import date, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.client import encode_multipart
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from authentication.models import CustomUser
+from . import aggregates, images, notifications, push, search, sync, uploads
+from .aggregates import apply_to_cycle
+from .models import Article, Cycle, DailyRollup, EggHarvest, IdempotencyRecord, LarvaHarvest, Notification, Phase, UploadSession, Waste, Youtube
+from .serializers import CycleSerializer, WasteSerializer
 
-# Create your tests here.
+
+def image_bytes(format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'green').save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def image_file(name='foto.png'):
+    return SimpleUploadedFile(name, image_bytes(), content_type='image/png')
+
+
+def chunked_upload(client, filename, content):
+    """Mengunggah `content` dalam satu potongan dan mengembalikan id UploadSession."""
+    response = client.post('/api/uploads/', {'filename': filename, 'total_size': len(content)})
+    assert response.status_code == 201, response.data
+    upload_id = response.data['id']
+    response = client.put(f'/api/uploads/{upload_id}/chunk/?offset=0', content, content_type='application/octet-stream')
+    assert response.status_code == 200, response.data
+    return upload_id
+
+
+class TemporaryMediaMixin:
+    """File yang diunggah selama test disimpan di direktori sementara."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, CHUNKED_UPLOAD_DIR=f'{media_root}/uploads')
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class ListQueryCountTests(APITestCase):
+    """Jumlah query endpoint list harus tetap, tidak bertambah mengikuti jumlah baris."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='petani', email='petani@example.com', password='Rahasia!123')
+        self.client.force_authenticate(self.user)
+
+    def create_cycles(self, count):
+        cycles = Cycle.objects.bulk_create(
+            Cycle(user=self.user, date=date(2025, 1, 1), name=f'Box {index}', egg_photo='egg_photos/test.jpg')
+            for index in range(count)
+        )
+        phases = Phase.objects.bulk_create(
+            Phase(cycle=cycle, phase_name=phase_name, start_date=date(2025, 1, 1))
+            for cycle in cycles
+            for phase_name in ('egg', 'larva')
+        )
+        Article.objects.bulk_create(
+            Article(phase=phase, imageUrl='https://example.com/a.jpg', title='Artikel', description='Isi')
+            for phase in phases
+        )
+        Youtube.objects.bulk_create(
+            Youtube(phase=phase, title='Video', videoId='abc123')
+            for phase in phases
+        )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, expected):
+        self.create_cycles(1)
+        single = self.count_queries(url)
+        self.create_cycles(999)
+        many = self.count_queries(url)
+        self.assertEqual(single, expected)
+        self.assertEqual(many, expected)
+
+    def test_cycle_list_query_count(self):
+        # cycle + prefetch phases
+        self.assertConstantQueries('/api/cycles/', 2)
+
+    def test_phase_list_query_count(self):
+        # phase + prefetch articles + prefetch videos
+        self.assertConstantQueries('/api/phases/', 3)
+
+
+class CycleTimelineTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='petani', email='petani@example.com', password='Rahasia!123')
+        self.client.force_authenticate(self.user)
+        self.cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Box', egg_photo='egg_photos/test.jpg')
+
+    def create_phases(self, count):
+        phases = [
+            Phase.objects.create(cycle=self.cycle, phase_name='larva', start_date=date(2025, 1, 1))
+            for _ in range(count)
+        ]
+        Waste.objects.bulk_create(
+            Waste(phase=phase, waste_amount=100, waste_photo='waste_photos/test.jpg') for phase in phases
+        )
+        Article.objects.bulk_create(
+            Article(phase=phase, imageUrl='https://example.com/a.jpg', title='Artikel', description='Isi')
+            for phase in phases
+        )
+
+    def test_timeline_query_count(self):
+        # cycle + phases + wastes + larva harvests + egg harvests + articles + videos (relasi dan phase_type)
+        url = f'/api/cycles/{self.cycle.id}/timeline/'
+        self.create_phases(1)
+        with self.assertNumQueries(7):
+            self.client.get(url)
+        self.create_phases(20)
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['phases']), 21)
+        self.assertEqual(len(response.data['phases'][0]['wastes']), 1)
+
+    def test_timeline_includes_phase_type_content(self):
+        self.create_phases(1)
+        Article.objects.create(phase_type='larva', imageUrl='https://example.com/b.jpg', title='Umum', description='Isi')
+        Article.objects.create(phase_type='egg', imageUrl='https://example.com/c.jpg', title='Telur', description='Isi')
+        Youtube.objects.create(phase_type='larva', title='Video', videoId='abc123')
+
+        response = self.client.get(f'/api/cycles/{self.cycle.id}/timeline/')
+
+        phase = response.data['phases'][0]
+        self.assertEqual(sorted(article['title'] for article in phase['articles']), ['Artikel', 'Umum'])
+        self.assertEqual([video['title'] for video in phase['videos']], ['Video'])
+
+    def test_timeline_field_selection(self):
+        self.create_phases(1)
+        response = self.client.get(f'/api/cycles/{self.cycle.id}/timeline/?fields=name,phases.phase_name,phases.wastes.waste_amount')
+        self.assertEqual(response.data, {
+            'name': 'Box',
+            'phases': [{'phase_name': 'larva', 'wastes': [{'waste_amount': 100}]}],
+        })
+
+
+class OwnerScopingTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = CustomUser.objects.create_user(username='pemilik', email='pemilik@example.com', password='Rahasia!123')
+        self.other = CustomUser.objects.create_user(username='lain', email='lain@example.com', password='Rahasia!123')
+        self.mine = Cycle.objects.create(user=self.owner, date=date(2025, 1, 1), name='Milik', egg_photo='egg_photos/test.jpg')
+        self.theirs = Cycle.objects.create(user=self.other, date=date(2025, 1, 1), name='Lain', egg_photo='egg_photos/test.jpg')
+        self.their_phase = Phase.objects.create(cycle=self.theirs, phase_name='larva', start_date=date(2025, 1, 1))
+        self.client.force_authenticate(self.owner)
+
+    def test_list_only_returns_own_cycles(self):
+        response = self.client.get('/api/cycles/')
+
+        self.assertEqual([row['id'] for row in response.data['results']], [self.mine.id])
+
+    def test_cannot_write_into_another_users_cycle(self):
+        response = self.client.post('/api/wastes/', {
+            'phase': self.their_phase.id, 'waste_amount': 100, 'waste_photo': image_file(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phase', response.data)
+
+        response = self.client.post('/api/egg_harvests/', {
+            'cycle': self.theirs.id, 'total_egg_harvest': 5, 'egg_photo': image_file(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cycle', response.data)
+
+        response = self.client.post('/api/phases/', {
+            'cycle': self.theirs.id, 'phase_name': 'egg', 'start_date': '2025-01-01',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cycle', response.data)
+
+        self.theirs.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.theirs.total_waste, self.theirs.points, self.other.points), (0, 0, 0))
+        self.assertEqual(self.theirs.phases.count(), 1)
+
+    def test_can_write_into_own_cycle(self):
+        phase = Phase.objects.create(cycle=self.mine, phase_name='larva', start_date=date(2025, 1, 1))
+        response = self.client.post('/api/wastes/', {
+            'phase': phase.id, 'waste_date': '2025-01-02', 'waste_amount': 100, 'waste_photo': image_file(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.mine.refresh_from_db()
+        self.assertEqual(self.mine.total_waste, 100)
+
+
+class ChunkedUploadTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        submit = mock.patch.object(images, 'submit')
+        submit.start()
+        self.addCleanup(submit.stop)
+        self.user = CustomUser.objects.create_user(username='pengunggah', email='unggah@example.com', password='Rahasia!123')
+        cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Unggah', egg_photo='egg_photos/test.jpg')
+        self.phase = Phase.objects.create(cycle=cycle, phase_name='larva', start_date=date(2025, 1, 1))
+        self.client.force_authenticate(self.user)
+
+    def upload(self, filename, content):
+        return chunked_upload(self.client, filename, content)
+
+    def add_waste(self, upload_id):
+        return self.client.post('/api/wastes/', {
+            'phase': self.phase.id, 'waste_date': '2025-01-02', 'waste_amount': 100, 'waste_photo_upload': upload_id,
+        })
+
+    def test_valid_upload_is_saved_and_discarded(self):
+        upload_id = self.upload('foto.png', image_bytes())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.add_waste(upload_id)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(Waste.objects.get(pk=response.data['id']).waste_photo.name.endswith('.png'))
+        self.assertFalse(UploadSession.objects.filter(pk=upload_id).exists())
+
+    def test_non_image_upload_is_rejected(self):
+        upload_id = self.upload('foto.png', b'bukan gambar')
+
+        response = self.add_waste(upload_id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('waste_photo_upload', response.data)
+        self.assertFalse(Waste.objects.exists())
+
+    def test_validation_does_not_leave_files_open(self):
+        upload_id = self.upload('foto.png', image_bytes())
+        opened = []
+        real_open = uploads.open_completed
+
+        def tracking_open(session):
+            opened.append(real_open(session))
+            return opened[-1]
+
+        request = APIRequestFactory().post('/api/wastes/')
+        request.user = self.user
+        serializer = WasteSerializer(data={
+            'phase': self.phase.id, 'waste_date': '2025-01-02', 'waste_amount': 100, 'waste_photo_upload': upload_id,
+        }, context={'request': request})
+        with mock.patch.object(uploads, 'open_completed', tracking_open):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        self.assertTrue(opened)
+        self.assertTrue(all(upload.closed for upload in opened))
+
+    @override_settings(CHUNKED_UPLOAD_MAX_CHUNK=10)
+    def test_chunk_limit_counts_bytes_read(self):
+        with self.assertRaises(uploads.ChunkTooLarge):
+            uploads.ChunkParser().parse(io.BytesIO(b'x' * 11))
+        self.assertEqual(uploads.ChunkParser().parse(io.BytesIO(b'x' * 10)), b'x' * 10)
+
+        response = self.client.post('/api/uploads/', {'filename': 'foto.png', 'total_size': 20})
+        response = self.client.put(f"/api/uploads/{response.data['id']}/chunk/?offset=0", b'x' * 11, content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 413)
+
+
+class TotalsTests(APITestCase):
+    """Total Cycle dan user mengikuti catatan yang dibuat, diubah, dan dihapus."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='petani', email='petani@example.com', password='Rahasia!123')
+        self.cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Box', egg_photo='egg_photos/test.jpg')
+        self.phase = Phase.objects.create(cycle=self.cycle, phase_name='larva', start_date=date(2025, 1, 1))
+
+    def assertTotals(self, cycle=None, **expected):
+        cycle = cycle or self.cycle
+        cycle.refresh_from_db()
+        self.user.refresh_from_db()
+        for field, value in expected.items():
+            target = self.user if field.startswith('user_') else cycle
+            self.assertEqual(getattr(target, field.removeprefix('user_')), value, field)
+
+    def test_waste_update_and_delete(self):
+        waste = Waste.objects.create(phase=self.phase, waste_amount=100, waste_photo='waste_photos/test.jpg')
+        self.assertTotals(total_waste=100, user_total_waste=100)
+
+        waste.waste_amount = 150
+        waste.save()
+        self.assertTotals(total_waste=150, user_total_waste=150)
+
+        waste.delete()
+        self.assertTotals(total_waste=0, user_total_waste=0)
+
+    def test_move_to_another_cycle(self):
+        other_cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Box 2', egg_photo='egg_photos/test.jpg')
+        other_phase = Phase.objects.create(cycle=other_cycle, phase_name='larva', start_date=date(2025, 1, 1))
+        waste = Waste.objects.create(phase=self.phase, waste_amount=100, waste_photo='waste_photos/test.jpg')
+
+        waste.phase = other_phase
+        waste.save()
+
+        self.assertTotals(total_waste=0, user_total_waste=100)
+        self.assertTotals(cycle=other_cycle, total_waste=100)
+
+    def test_harvest_points_follow_edits(self):
+        harvest = LarvaHarvest.objects.create(
+            phase=self.phase, total_harvest=50, total_for_sale=30, total_for_breeding=20,
+            total_kasgot=10, harvest_photo='harvest_photos/test.jpg',
+        )
+        egg = EggHarvest.objects.create(cycle=self.cycle, total_egg_harvest=5, egg_photo='egg_harvest_photos/test.jpg')
+        self.assertTotals(points=20, total_harvest=50, total_egg_harvest=5, user_points=20, user_total_harvest=50)
+
+        harvest.total_harvest = 0
+        harvest.save()
+        self.assertTotals(points=10, total_harvest=0, total_kasgot=10, user_points=10, user_total_harvest=0)
+
+        egg.delete()
+        harvest.delete()
+        self.assertTotals(points=0, total_egg_harvest=0, total_kasgot=0, user_points=0)
+
+    def test_deleting_cycle_reverts_user_totals(self):
+        Waste.objects.create(phase=self.phase, waste_amount=100, waste_photo='waste_photos/test.jpg')
+        self.cycle.delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_waste, 0)
+
+    def test_cycle_update_keeps_concurrent_increments(self):
+        stale = Cycle.objects.get(pk=self.cycle.pk)
+        apply_to_cycle(self.cycle.pk, total_waste=40, points=10)  # Request lain di antara load dan save
+
+        request = APIRequestFactory().patch('/')
+        request.user = self.user
+        serializer = CycleSerializer(stale, data={'name': 'Box Baru'}, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertTotals(total_waste=40, points=10)
+        self.assertEqual(self.cycle.name, 'Box Baru')
+        self.assertEqual(self.cycle.current_phase_id, self.phase.pk)
+
+
+class ImageVariantTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        images._ready.clear()
+        images._missing.clear()
+        self.user = CustomUser.objects.create_user(username='petani', email='petani@example.com', password='Rahasia!123')
+
+    def test_only_new_photos_are_scheduled(self):
+        with mock.patch.object(images, 'submit') as submit:
+            cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Box', egg_photo='egg_photos/a.png')
+            self.assertEqual(submit.call_count, 1)
+
+            cycle.name = 'Box Baru'
+            cycle.save()
+            self.user.points = 10
+            self.user.save()
+            self.assertEqual(submit.call_count, 1)
+
+            cycle.egg_photo = image_file('b.png')
+            cycle.save()
+            self.assertEqual(submit.call_count, 2)
+            self.assertEqual(submit.call_args.args, (images.process_image, cycle.egg_photo.name))
+
+    def test_profile_pictures_registered_by_authentication_app(self):
+        self.assertEqual(images.registry[CustomUser], ['profile_pics'])
+
+    def test_variant_urls_only_after_processing(self):
+        name = default_storage.save('egg_photos/a.png', ContentFile(image_bytes()))
+        cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Box', egg_photo=name)
+
+        self.assertEqual(images.variant_urls(cycle.egg_photo), {})
+        images.process_image(name)
+        self.assertEqual(set(images.variant_urls(cycle.egg_photo)), {'thumb', 'medium'})
+
+    def test_missing_variants_are_not_checked_on_every_render(self):
+        cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Box', egg_photo='egg_photos/belum.png')
+        now = 1000.0
+
+        with mock.patch.object(images.time, 'monotonic', lambda: now):
+            with mock.patch.object(images.default_storage, 'exists', return_value=False) as exists:
+                for _ in range(3):
+                    self.assertEqual(images.variant_urls(cycle.egg_photo), {})
+            self.assertEqual(exists.call_count, len(images.get_variants()))
+
+            # Varian dari proses lain terlihat setelah MISSING_TTL
+            now += images.MISSING_TTL
+            with mock.patch.object(images.default_storage, 'exists', return_value=True):
+                self.assertEqual(set(images.variant_urls(cycle.egg_photo)), {'thumb', 'medium'})
+
+
+class PhaseNotificationTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='pengingat', email='ingat@example.com', password='Rahasia!123')
+        self.cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Siklus', egg_photo='egg_photos/test.jpg')
+        # Fase telur berakhir 2025-01-04
+        self.phase = Phase.objects.create(cycle=self.cycle, phase_name='egg', start_date=date(2025, 1, 1))
+
+    def schedule(self, today):
+        with mock.patch.object(notifications, 'publish_notifications'):
+            return notifications.schedule_phase_notifications(today)
+
+    def test_missed_run_still_sends_ended_notification(self):
+        created = self.schedule(date(2025, 1, 10))
+
+        self.assertEqual([(n.phase_id, n.kind) for n in created], [(self.phase.id, Notification.KIND_PHASE_ENDED)])
+        self.assertEqual(self.schedule(date(2025, 1, 11)), [])
+
+    def test_overdue_phase_outside_lookback_is_ignored(self):
+        self.assertEqual(self.schedule(date(2025, 1, 4) + timedelta(days=notifications.OVERDUE_LOOKBACK_DAYS + 1)), [])
+
+    def test_ending_then_ended(self):
+        self.assertEqual([n.kind for n in self.schedule(date(2025, 1, 3))], [Notification.KIND_PHASE_ENDING])
+        self.assertEqual([n.kind for n in self.schedule(date(2025, 1, 5))], [Notification.KIND_PHASE_ENDED])
+        self.assertEqual(self.schedule(date(2025, 1, 6)), [])
+
+    def test_unread_count_follows_bulk_updates(self):
+        self.client.force_authenticate(self.user)
+        self.schedule(date(2025, 1, 3))
+        self.assertEqual(self.client.get('/api/notifikasi/unread_count/').data, {'unread_count': 1})
+
+        # Update massal (misalnya dari admin) tidak memicu sinyal apa pun
+        Notification.objects.filter(user=self.user).update(is_read=True)
+
+        self.assertEqual(self.client.get('/api/notifikasi/unread_count/').data, {'unread_count': 0})
+
+
+class DatabasePollingBrokerTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='pendengar', email='dengar@example.com', password='Rahasia!123')
+        self.other = CustomUser.objects.create_user(username='lainnya', email='lainnya@example.com', password='Rahasia!123')
+        self.broker = push.DatabasePollingBroker()
+
+    def test_polls_notifications_from_any_process(self):
+        # Pemeriksaan pertama selalu mengirim jumlah belum dibaca untuk user baru
+        self.assertEqual(self.broker.poll_once({self.user.pk}), [
+            (self.user.pk, {'type': 'unread_count', 'data': {'unread_count': 0}}),
+        ])
+
+        # Dibuat "proses lain": publish milik broker ini tidak ikut berperan
+        mine = Notification.objects.create(user=self.user, message="Halo")
+        Notification.objects.create(user=self.other, message="Bukan untukmu")
+        events = self.broker.poll_once({self.user.pk})
+
+        self.assertEqual([(user_id, event['type']) for user_id, event in events], [
+            (self.user.pk, 'notification'), (self.user.pk, 'unread_count'),
+        ])
+        self.assertEqual(events[0][1]['data']['id'], mine.pk)
+        self.assertEqual(events[1][1]['data'], {'unread_count': 1})
+        self.assertEqual(self.broker.poll_once({self.user.pk}), [])
+
+    def polled_ids(self):
+        return [event['data']['id'] for _, event in self.broker.poll_once({self.user.pk}) if event['type'] == 'notification']
+
+    def test_late_commit_with_lower_id_is_delivered_once(self):
+        self.broker.poll_once({self.user.pk})
+        # Id lebih kecil, tetapi transaksinya baru terlihat setelah id yang lebih besar
+        late = Notification.objects.create(user=None, message="Terlambat")
+        early = Notification.objects.create(user=self.user, message="Cepat")
+        self.assertEqual(self.polled_ids(), [early.pk])
+
+        Notification.objects.filter(pk=late.pk).update(user=self.user)
+
+        self.assertEqual(self.polled_ids(), [late.pk])
+        self.assertEqual(self.broker.poll_once({self.user.pk}), [])
+
+    def test_stream_requires_asgi(self):
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get('/api/notifikasi/stream/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 503)
+
+    def test_unread_count_changes_are_pushed(self):
+        Notification.objects.create(user=self.user, message="Halo")
+        self.broker.poll_once({self.user.pk})
+
+        Notification.objects.filter(user=self.user).update(is_read=True)
+
+        self.assertEqual(self.broker.poll_once({self.user.pk}), [
+            (self.user.pk, {'type': 'unread_count', 'data': {'unread_count': 0}}),
+        ])
+
+    def test_publish_is_left_to_polling(self):
+        self.assertFalse(self.broker.has_subscribers(self.user.pk))
+        self.assertIsNone(self.broker.publish(self.user.pk, {'type': 'unread_count', 'data': {}}))
+
+
+class ContentCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        Article.objects.create(imageUrl='https://example.com/a.jpg', title='Artikel', description='Isi')
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get('/api/articles/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_same_second_change_is_not_hidden_by_if_modified_since(self):
+        last_modified = self.client.get('/api/articles/')['Last-Modified']
+
+        Article.objects.create(imageUrl='https://example.com/b.jpg', title='Artikel baru', description='Isi')
+
+        response = self.client.get('/api/articles/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_change_invalidates_responses(self):
+        etag = self.client.get('/api/articles/')['ETag']
+
+        Article.objects.create(imageUrl='https://example.com/b.jpg', title='Artikel baru', description='Isi')
+
+        response = self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_version_survives_cache_flush(self):
+        etag = self.client.get('/api/articles/')['ETag']
+
+        cache.clear()
+
+        self.assertEqual(self.client.get('/api/articles/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class PhaseFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='pembaca', email='baca@example.com', password='Rahasia!123')
+        self.client.force_authenticate(self.user)
+        self.cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Feed', egg_photo='egg_photos/test.jpg')
+        self.phase = Phase.objects.create(cycle=self.cycle, phase_name='larva', start_date=date(2025, 1, 1))
+
+    def add_article(self, title, published, phase_type='larva'):
+        return Article.objects.create(
+            phase_type=phase_type, imageUrl='https://example.com/a.jpg', title=title, description='Isi', date_published=published,
+        )
+
+    def feed(self):
+        response = self.client.get(f'/api/cycles/{self.cycle.id}/feed/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_lists_current_phase_content_newest_first(self):
+        self.add_article('Lama', date(2025, 1, 1))
+        self.add_article('Baru', date(2025, 3, 1))
+        self.add_article('Telur', date(2025, 2, 1), phase_type='egg')
+        Youtube.objects.create(phase_type='larva', title='Video', videoId='abc123')
+
+        data = self.feed()
+
+        self.assertEqual((data['cycle'], data['phase'], data['phase_type']), (self.cycle.id, self.phase.id, 'larva'))
+        self.assertEqual([article['title'] for article in data['articles']], ['Baru', 'Lama'])
+        self.assertEqual([video['title'] for video in data['videos']], ['Video'])
+
+    @override_settings(CONTENT_FEED_LIMIT=2)
+    def test_feed_is_capped(self):
+        for day in range(1, 4):
+            self.add_article(f'Artikel {day}', date(2025, 1, day))
+
+        self.assertEqual([article['title'] for article in self.feed()['articles']], ['Artikel 3', 'Artikel 2'])
+
+    def test_content_change_invalidates_feed(self):
+        self.add_article('Pertama', date(2025, 1, 1))
+        self.assertEqual(len(self.feed()['articles']), 1)
+
+        self.add_article('Kedua', date(2025, 1, 2))
+
+        self.assertEqual([article['title'] for article in self.feed()['articles']], ['Kedua', 'Pertama'])
+
+    def test_cycle_without_phase(self):
+        self.phase.delete()
+        self.assertEqual(self.client.get(f'/api/cycles/{self.cycle.id}/feed/').status_code, 404)
+
+    def test_backfill_phase_type(self):
+        article = Article.objects.create(phase=self.phase, imageUrl='https://example.com/a.jpg', title='Lama', description='Isi')
+        video = Youtube.objects.create(phase=self.phase, title='Video lama', videoId='abc123')
+        # Baris dari sebelum kolom phase_type ada
+        Article.objects.filter(pk=article.pk).update(phase_type='')
+        Youtube.objects.filter(pk=video.pk).update(phase_type='')
+        self.assertEqual(self.feed()['articles'], [])
+
+        call_command('backfill_phase_type', stdout=io.StringIO())
+
+        self.assertEqual(Article.objects.get(pk=article.pk).phase_type, 'larva')
+        self.assertEqual(Youtube.objects.get(pk=video.pk).phase_type, 'larva')
+        self.assertEqual([article['title'] for article in self.feed()['articles']], ['Lama'])
+
+
+class StemTests(SimpleTestCase):
+    def test_affixes(self):
+        self.assertEqual(search.stem('pengolahannya'), 'olah')
+        self.assertEqual(search.stem('diolah'), 'olah')
+        self.assertEqual(search.stem('menyaring'), 'saring')
+        self.assertEqual(search.stem('Masalah'), 'masalah')
+
+    def test_short_words_are_kept(self):
+        self.assertEqual(search.stem('diam'), 'diam')
+        self.assertEqual(search.tokenize('Maggot-nya'), ['maggot', 'nya'])
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.compost = Article.objects.create(
+            imageUrl='https://example.com/a.jpg', title='Pengolahan sampah organik', description='Sampah diolah maggot menjadi kompos.'
+        )
+        self.feed = Article.objects.create(
+            imageUrl='https://example.com/b.jpg', title='Pakan ternak', description='Maggot untuk pakan ikan, bukan untuk mengolah sampah.'
+        )
+
+    def results(self, query):
+        response = self.client.get('/api/articles/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_matches_stemmed_words_ranked_by_relevance(self):
+        self.assertEqual(self.results('olah sampah'), [self.compost.id, self.feed.id])
+        self.assertEqual(self.results('pakan'), [self.feed.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.feed.title = 'Budidaya lalat'
+        self.feed.description = 'Perkawinan lalat BSF.'
+        self.feed.save()
+        self.assertEqual(self.results('pakan'), [])
+        self.assertEqual(self.results('lalat'), [self.feed.id])
+
+        self.compost.delete()
+        self.assertEqual(self.results('olah'), [])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/articles/search/').status_code, 400)
+
+
+class PhaseBookkeepingTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.cycle = Cycle.objects.create(date=date(2025, 1, 1), name='Massal', egg_photo='egg_photos/test.jpg')
+
+    def test_bulk_create_fills_end_date_and_current_phase(self):
+        egg, larva = Phase.objects.bulk_create([
+            Phase(cycle=self.cycle, phase_name='egg', start_date=date(2025, 1, 1)),
+            Phase(cycle=self.cycle, phase_name='larva', start_date=date(2025, 1, 4)),
+        ])
+
+        self.assertEqual(Phase.objects.get(pk=egg.pk).end_date, date(2025, 1, 4))
+        self.assertEqual(Phase.objects.get(pk=larva.pk).end_date, date(2025, 1, 7))
+        self.cycle.refresh_from_db()
+        self.assertEqual(self.cycle.current_phase_id, larva.pk)
+
+    def test_loaddata_fills_end_date_and_current_phase(self):
+        fixture = f'{tempfile.mkdtemp()}/phases.json'
+        self.addCleanup(shutil.rmtree, fixture.rsplit('/', 1)[0], ignore_errors=True)
+        with open(fixture, 'w') as output:
+            json.dump([{
+                'model': 'api.phase', 'pk': 500,
+                'fields': {'cycle': self.cycle.pk, 'phase_name': 'pupa', 'start_date': '2025-02-01', 'end_date': None},
+            }], output)
+
+        call_command('loaddata', fixture, verbosity=0)
+
+        self.assertEqual(Phase.objects.get(pk=500).end_date, date(2025, 2, 6))
+        self.cycle.refresh_from_db()
+        self.assertEqual(self.cycle.current_phase_id, 500)
+
+
+class SyncTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        submit = mock.patch.object(images, 'submit')
+        submit.start()
+        self.addCleanup(submit.stop)
+        self.user = CustomUser.objects.create_user(username='lapangan', email='lapangan@example.com', password='Rahasia!123')
+        self.cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Lapangan', egg_photo='egg_photos/test.jpg')
+        self.egg_phase = Phase.objects.create(cycle=self.cycle, phase_name='egg', start_date=date(2025, 1, 1))
+        self.larva_phase = Phase.objects.create(cycle=self.cycle, phase_name='larva', start_date=date(2025, 1, 4))
+        self.client.force_authenticate(self.user)
+
+    def waste(self, content=None, **fields):
+        return {
+            'client_id': str(uuid.uuid4()), 'phase': self.larva_phase.id, 'waste_date': '2025-01-05', 'waste_amount': 100,
+            'photo_upload': chunked_upload(self.client, 'foto.png', content or image_bytes()), **fields,
+        }
+
+    def test_larva_harvest_requires_larva_phase(self):
+        response = self.client.post('/api/sync/', {'larva_harvests': [{
+            'client_id': str(uuid.uuid4()), 'phase': self.egg_phase.id, 'harvest_date': '2025-01-05',
+            'total_harvest': 500, 'total_for_sale': 1, 'total_for_breeding': 2, 'total_kasgot': 3,
+            'photo_upload': chunked_upload(self.client, 'foto.png', image_bytes()),
+        }]}, format='json')
+
+        self.assertEqual(response.data['results'][0]['status'], sync.STATUS_INVALID)
+        self.assertIn('phase', response.data['results'][0]['errors'])
+        self.assertFalse(LarvaHarvest.objects.exists())
+
+    def test_non_image_upload_is_rejected(self):
+        response = self.client.post('/api/sync/', {'wastes': [self.waste(b'bukan gambar'), self.waste()]}, format='json')
+
+        self.assertEqual([row['status'] for row in response.data['results']], [sync.STATUS_INVALID, sync.STATUS_CREATED])
+        self.assertIn('photo_upload', response.data['results'][0]['errors'])
+
+    def test_uploads_discarded_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/sync/', {'wastes': [self.waste()]}, format='json')
+
+        self.assertEqual(response.data['created'], 1)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_failed_batch_removes_stored_photos(self):
+        payload = {'wastes': [self.waste(), self.waste()]}
+
+        with mock.patch.object(aggregates, 'apply_entries', side_effect=RuntimeError("gagal")):
+            with self.assertRaises(RuntimeError):
+                sync.sync_records(self.user, payload)
+
+        self.assertFalse(Waste.objects.exists())
+        self.assertEqual(default_storage.listdir('waste_photos')[1], [])
+        self.assertEqual(UploadSession.objects.count(), 2)
+
+
+class IdempotencyTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(username='idem', email='idem@example.com', password='Rahasia!123')
+        self.other = CustomUser.objects.create_user(username='idem2', email='idem2@example.com', password='Rahasia!123')
+
+    def post_notification(self, user, message='Halo', key='kunci-1'):
+        # Token baru setiap request, seperti klien yang baru saja refresh token
+        token = RefreshToken.for_user(user).access_token
+        return self.client.post(
+            '/api/notifikasi/', {'message': message}, format='json',
+            HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_survives_token_refresh(self):
+        first = self.post_notification(self.user)
+        second = self.post_notification(self.user)
+
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.post_notification(self.user)
+
+        self.assertEqual(self.post_notification(self.user, message='Lain').status_code, 422)
+
+    def test_client_errors_are_not_stored(self):
+        self.assertEqual(self.post_notification(self.user, message='').status_code, 400)
+
+        self.assertEqual(self.post_notification(self.user).status_code, 201)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post_notification(self.user)
+        response = self.post_notification(self.other)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(IdempotencyRecord.objects.count(), 2)
+
+    def test_token_is_validated_once(self):
+        with mock.patch('authentication.tokens.is_revoked', return_value=False) as is_revoked:
+            self.assertEqual(self.post_notification(self.user).status_code, 201)
+        is_revoked.assert_called_once()
+
+    def test_multipart_retry_with_new_boundary_is_replayed(self):
+        cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Ulang', egg_photo='egg_photos/test.jpg')
+        phase = Phase.objects.create(cycle=cycle, phase_name='larva', start_date=date(2025, 1, 1))
+        token = RefreshToken.for_user(self.user).access_token
+        photo = image_bytes()
+
+        def add_waste(boundary, amount=100):
+            data = {'waste_date': '2025-01-02', 'waste_amount': amount, 'waste_photo': SimpleUploadedFile('foto.png', photo, content_type='image/png')}
+            return self.client.post(
+                f'/api/phases/{phase.id}/add_waste/', encode_multipart(boundary, data),
+                content_type=f'multipart/form-data; boundary={boundary}',
+                HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IDEMPOTENCY_KEY='unggah-1',
+            )
+
+        with mock.patch.object(images, 'submit'):
+            responses = [add_waste('BatasPertama'), add_waste('BatasKedua'), add_waste('BatasKetiga', amount=5)]
+
+        self.assertEqual([response.status_code for response in responses], [201, 201, 422])
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(Waste.objects.filter(phase=phase).count(), 1)
+
+    def test_anonymous_requests_are_not_recorded(self):
+        self.client.post('/api/notifikasi/', {'message': 'Halo'}, format='json', HTTP_IDEMPOTENCY_KEY='kunci-1')
+
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+class ReportTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='pelapor', email='lapor@example.com', password='Rahasia!123')
+        self.cycle = Cycle.objects.create(user=self.user, date=date(2025, 1, 1), name='Laporan', egg_photo='egg_photos/test.jpg')
+        self.phase = Phase.objects.create(cycle=self.cycle, phase_name='larva', start_date=date(2025, 1, 1))
+        self.client.force_authenticate(self.user)
+
+    def add_waste(self, day, amount):
+        return Waste.objects.create(phase=self.phase, waste_date=day, waste_amount=amount, waste_photo='waste_photos/test.jpg')
+
+    def rollups(self):
+        return list(DailyRollup.objects.order_by('date').values_list('date', 'waste_amount', 'waste_count'))
+
+    def test_rollup_follows_edits_and_deletes(self):
+        waste = self.add_waste(date(2025, 1, 2), 100)
+        self.add_waste(date(2025, 1, 3), 50)
+
+        waste.waste_date = date(2025, 1, 3)
+        waste.save()
+        self.assertEqual(self.rollups(), [(date(2025, 1, 3), 150, 2)])
+
+        waste.delete()
+        self.assertEqual(self.rollups(), [(date(2025, 1, 3), 50, 1)])
+
+        Waste.objects.get().delete()
+        self.assertEqual(self.rollups(), [])
+
+    def test_report_buckets(self):
+        self.add_waste(date(2025, 1, 6), 100)
+        self.add_waste(date(2025, 1, 7), 50)
+        self.add_waste(date(2025, 2, 1), 30)
+        LarvaHarvest.objects.create(
+            phase=self.phase, harvest_date=date(2025, 1, 7), total_harvest=75,
+            total_for_sale=0, total_for_breeding=0, total_kasgot=15, harvest_photo='harvest_photos/test.jpg',
+        )
+
+        response = self.client.get('/api/reports/', {'bucket': 'month'})
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results']
+        self.assertEqual([(row['waste_amount'], row['waste_count'], row['larva_harvest']) for row in rows], [(150, 2, 75), (30, 1, 0)])
+        self.assertAlmostEqual(rows[0]['larva_per_waste'], 0.5)
+
+        response = self.client.get('/api/reports/', {'bucket': 'day', 'start': '2025-01-07', 'end': '2025-01-31'})
+        self.assertEqual([row['waste_amount'] for row in response.data['results']], [50])
+
+    def test_report_scope(self):
+        self.add_waste(date(2025, 1, 6), 100)
+        other = CustomUser.objects.create_user(username='pelapor2', email='lapor2@example.com', password='Rahasia!123')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get('/api/reports/').data['results'], [])
+        self.assertEqual(self.client.get('/api/reports/', {'scope': 'platform'}).status_code, 403)
+        self.assertEqual(self.client.get('/api/reports/', {'start': '2025-02-01', 'end': '2025-01-01'}).status_code, 400)
+
+        other.is_staff = True
+        other.save()
+        response = self.client.get('/api/reports/', {'scope': 'platform'})
+        self.assertEqual([row['waste_amount'] for row in response.data['results']], [100])
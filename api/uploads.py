@@ -0,0 +1,113 @@
+"""
+Penyimpanan sementara untuk upload bertahap (lihat UploadSession).
+
+Setiap potongan ditambahkan ke file `.part` di CHUNKED_UPLOAD_DIR. Setelah
+lengkap, file tersebut dipakai sebagai isi field gambar lewat serializer
+(`<field>_upload`) lalu dihapus.
+"""
+import os
+from django import forms
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import BaseParser
+from .models import UploadSession
+
+
+class ChunkTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'chunk_too_large'
+
+
+class ChunkParser(BaseParser):
+    """
+    Membaca body request apa adanya sebagai bytes. Batas CHUNKED_UPLOAD_MAX_CHUNK
+    diterapkan pada byte yang benar-benar dibaca, bukan pada header
+    Content-Length (yang bisa tidak ada, misalnya pada chunked encoding).
+    """
+    media_type = 'application/octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return b''
+        limit = settings.CHUNKED_UPLOAD_MAX_CHUNK
+        blocks = []
+        size = 0
+        while size <= limit:
+            block = stream.read(limit + 1 - size)
+            if not block:
+                break
+            blocks.append(block)
+            size += len(block)
+        if size > limit:
+            raise ChunkTooLarge(f"Potongan maksimal {limit} byte.")
+        return b''.join(blocks)
+
+
+class UploadError(Exception):
+    pass
+
+
+def get_upload_dir():
+    upload_dir = settings.CHUNKED_UPLOAD_DIR
+    os.makedirs(upload_dir, exist_ok=True)
+    return upload_dir
+
+
+def chunk_path(session_id):
+    return os.path.join(get_upload_dir(), f"{session_id}.part")
+
+
+def append_chunk(session_id, offset, data):
+    """
+    Menambahkan satu potongan ke upload. `offset` harus sama dengan jumlah byte
+    yang sudah diterima, sehingga potongan yang dikirim ulang tidak tertulis dua kali.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id)
+        if session.is_complete:
+            raise UploadError("Upload sudah selesai.")
+        if offset != session.received_size:
+            raise UploadError(f"Offset tidak sesuai, lanjutkan dari byte {session.received_size}.")
+        if session.received_size + len(data) > session.total_size:
+            raise UploadError("Potongan melebihi ukuran file.")
+
+        path = chunk_path(session.pk)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+            part.seek(offset)
+            part.write(data)
+            part.truncate()  # Buang sisa tulisan dari percobaan sebelumnya yang gagal
+
+        session.received_size += len(data)
+        update_fields = ['received_size']
+        if session.received_size == session.total_size:
+            session.completed_at = timezone.now()
+            update_fields.append('completed_at')
+        session.save(update_fields=update_fields)
+    return session
+
+
+def open_completed(session):
+    """Membuka file hasil upload yang sudah lengkap sebagai django File."""
+    return File(open(chunk_path(session.pk), 'rb'), name=session.filename)
+
+
+def validate_image(session):
+    """
+    Memeriksa file hasil upload seperti ImageField biasa: ekstensi gambar dan
+    isi yang bisa dibaca Pillow. Melempar django ValidationError jika bukan gambar.
+    """
+    with open_completed(session) as upload:
+        forms.ImageField().clean(upload)
+
+
+def discard(session):
+    """Menghapus file sementara dan sesi upload."""
+    try:
+        os.remove(chunk_path(session.pk))
+    except FileNotFoundError:
+        pass
+    session.delete()
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ArticleViewSet, CycleViewSet, LarvaHarvestViewSet, WasteViewSet, EggHarvestViewSet, PhaseViewSet, YoutubeViewSet, NotificationViewSet
+from .views import ArticleViewSet, CycleViewSet, LarvaHarvestViewSet, WasteViewSet, EggHarvestViewSet, PhaseViewSet, YoutubeViewSet, NotificationViewSet, UploadSessionViewSet, SyncViewSet, ReportViewSet, notification_stream
 
 router = DefaultRouter()
 router.register(r'cycles', CycleViewSet)
@@ -11,8 +11,12 @@ router.register(r'egg_harvests', EggHarvestViewSet)
 router.register(r'articles', ArticleViewSet)
 router.register(r'youtube', YoutubeViewSet)
 router.register(r'notifikasi', NotificationViewSet)
+router.register(r'uploads', UploadSessionViewSet)
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'reports', ReportViewSet, basename='report')
 
 
 urlpatterns = [
+    path('notifikasi/stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
 ]
@@ -1,17 +1,83 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, mixins, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from .models import Article, Cycle, LarvaHarvest, Waste, EggHarvest, Phase, Youtube, Notification    
-from .serializers import CycleSerializer, LarvaHarvestSerializer, WasteSerializer, EggHarvestSerializer,PhaseSerializer, ArticleSerializer, YoutubeSerializer, NotificationSerializer
+import asyncio
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+from django.http import JsonResponse, StreamingHttpResponse
+from authentication import user_cache
+from authentication.authentication import RevocableJWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .models import Article, Cycle, DailyRollup, LarvaHarvest, Waste, EggHarvest, Phase, Youtube, Notification, UploadSession
+from .serializers import CycleSerializer, CycleTimelineSerializer, ReportQuerySerializer, LarvaHarvestSerializer, WasteSerializer, EggHarvestSerializer,PhaseSerializer, ArticleSerializer, YoutubeSerializer, NotificationSerializer, UploadSessionSerializer
+from . import uploads, notifications, push, feeds, search, sync, reports
+from .pagination import NotificationCursorPagination, SearchPagination
+from .caching import CachedContentMixin
 
 User = get_user_model()
 
-class CycleViewSet(viewsets.ModelViewSet):
+
+class EagerLoadingViewMixin:
+    """Menerapkan select_related/prefetch_related yang dideklarasikan serializer ke queryset."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
+
+class OwnerScopedViewMixin:
+    """
+    Membatasi queryset ke data milik user yang sedang login.
+    `owner_field` adalah lookup dari model ke user pemilik Cycle.
+    """
+    owner_field = 'user'
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        if user.is_staff:
+            return queryset
+        return queryset.filter(**{self.owner_field: user.pk})
+
+
+class SearchViewMixin:
+    """Action `search/?q=` memakai index full-text dari api.search."""
+
+    @action(detail=False, methods=['get'], pagination_class=SearchPagination)
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Parameter q wajib diisi."}, status=400)
+        queryset = search.search(self.filter_queryset(self.get_queryset()), query)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class PhaseTypeFilterMixin:
+    """Filter konten edukasi berdasarkan `?phase_type=` (egg, larva, ...)."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        phase_type = self.request.query_params.get('phase_type')
+        if phase_type:
+            queryset = queryset.filter(phase_type=phase_type)
+        return queryset
+
+
+class CycleViewSet(OwnerScopedViewMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Cycle.objects.all()
     serializer_class = CycleSerializer
-    # permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
         """Pastikan user dari request otomatis terhubung ke Cycle yang dibuat."""
@@ -21,38 +87,52 @@ class CycleViewSet(viewsets.ModelViewSet):
     def add_egg_harvest(self, request, pk=None):
         """Tambahkan Egg Harvest ke Cycle tertentu."""
         cycle = self.get_object()
-        serializer = EggHarvestSerializer(data=request.data)
+        serializer = EggHarvestSerializer(data=request.data, context=self.get_serializer_context())
         if serializer.is_valid():
-            egg_harvest = serializer.save(cycle=cycle)
-            if egg_harvest.total_egg_harvest > 0:
-                user = request.user
-                """Nambah point untuk user dan box kalau ada yang dipanen"""
-                user.save()
-                cycle.save()
+            # Poin untuk user dan box ditambahkan oleh EggHarvest.save dalam transaksi yang sama
+            serializer.save(cycle=cycle)
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
-class PhaseViewSet(viewsets.ModelViewSet):
+    def get_serializer_class(self):
+        if self.action == 'timeline':
+            return CycleTimelineSerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Cycle beserta fase, sampah, panen, dan konten terkait dalam satu respons.
+        `?fields=name,phases.phase_name,phases.wastes` memangkas isi respons.
+        """
+        cycle = self.get_object()
+        fields = request.query_params.get('fields')
+        selected = {field.strip() for field in fields.split(',') if field.strip()} if fields else None
+        serializer = CycleTimelineSerializer(cycle, selected_fields=selected, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def feed(self, request, pk=None):
+        """Artikel dan video untuk fase yang sedang berjalan pada Cycle ini."""
+        cycle = self.get_object()
+        phase = Phase.objects.filter(pk=cycle.current_phase_id).values('id', 'phase_name').first()
+        if phase is None:
+            return Response({"message": "Cycle belum memiliki fase."}, status=404)
+        return Response({'cycle': cycle.id, 'phase': phase['id'], **feeds.phase_feed(phase['phase_name'])})
+
+class PhaseViewSet(OwnerScopedViewMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Phase.objects.all()
     serializer_class = PhaseSerializer
+    owner_field = 'cycle__user'
 
     @action(detail=True, methods=['post'])
     def add_waste(self, request, pk=None):
         """Tambahkan Waste ke Cycle tertentu."""
         phase = self.get_object()
-        serializer = WasteSerializer(data=request.data)
+        serializer = WasteSerializer(data=request.data, context=self.get_serializer_context())
         if serializer.is_valid():
-            waste_instance = serializer.save(phase=phase)
-
-            cycle = phase.cycle  # Ambil cycle dari phase
-            print(f"[DEBUG] Sebelum Update - Cycle ID: {cycle.id}, Total Waste: {cycle.total_waste}")
-
-            # Update total waste hanya di cycle
-            cycle.total_waste += waste_instance.waste_amount
-            cycle.save()
-
-            print(f"[DEBUG] Setelah Update - Cycle ID: {cycle.id}, Total Waste: {cycle.total_waste}")
-
+            # Total sampah diperbarui oleh Waste.save dalam transaksi yang sama
+            serializer.save(phase=phase)
             return Response(serializer.data, status=201)
         
         return Response(serializer.errors, status=400)
@@ -65,81 +145,55 @@ class PhaseViewSet(viewsets.ModelViewSet):
         if phase.phase_name != 'larva':
             return Response({"error": "Panen larva hanya bisa dilakukan pada fase larva."}, status=400)
 
-        serializer = LarvaHarvestSerializer(data=request.data)
+        serializer = LarvaHarvestSerializer(data=request.data, context=self.get_serializer_context())
 
         if serializer.is_valid():
-            larva_harvest = serializer.save(phase=phase)
-            if larva_harvest.total_harvest > 0:
-                cycle = phase.cycle  # Ambil cycle dari phase
-
-                print(f"[DEBUG] Sebelum Update - Cycle ID: {cycle.id}, Total Harvest: {cycle.total_harvest}, Points: {cycle.points}")
-
-                # Update total harvest hanya di cycle
-                cycle.total_harvest += larva_harvest.total_harvest
-                cycle.save()
+            serializer.save(phase=phase)
 
-                print(f"[DEBUG] Setelah Update - Cycle ID: {cycle.id}, Total Harvest: {cycle.total_harvest}, Points: {cycle.points}")
-
-                return Response({
-                    "message": "Larva Harvest added successfully",
-                    "total_harvest": cycle.total_harvest,
-                    "points": cycle.points
-                }, status=201)
-        print(f"[DEBUG] Serializer Errors: {serializer.errors}")
+            cycle = phase.cycle  # Ambil cycle dari phase
+            cycle.refresh_from_db(fields=['total_harvest', 'points'])
+            return Response({
+                "message": "Larva Harvest added successfully",
+                "total_harvest": cycle.total_harvest,
+                "points": cycle.points
+            }, status=201)
         return Response(serializer.errors, status=400)
 
-class WasteViewSet(viewsets.ModelViewSet):
+class WasteViewSet(OwnerScopedViewMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Waste.objects.all()
     serializer_class = WasteSerializer
+    owner_field = 'phase__cycle__user'
 
     def create(self, request, *args, **kwargs):
-        """Tambahkan waste dan update total waste di user serta phase."""
+        """Tambahkan waste; total waste user diperbarui oleh Waste.save."""
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            waste = serializer.save()  # Simpan waste
-
-            # Dapatkan phase dari waste
-            phase = waste.phase
-            user = phase.cycle.user  # User diambil dari cycle yang memiliki phase
-
-            print(f"[DEBUG] Sebelum Update - User: {user.email}, Total Waste: {user.total_waste}")
-
-            # Update total waste user
-            user.total_waste += waste.waste_amount
-            user.save()
-
-            print(f"[DEBUG] Setelah Update - User: {user.email}, Total Waste: {user.total_waste}")
-
+            serializer.save()
             return Response(serializer.data, status=201)
         
         return Response(serializer.errors, status=400)
 
-class EggHarvestViewSet(viewsets.ModelViewSet):
+class EggHarvestViewSet(OwnerScopedViewMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = EggHarvest.objects.all()
     serializer_class = EggHarvestSerializer
+    owner_field = 'cycle__user'
 
-class LarvaHarvestViewSet(viewsets.ModelViewSet):
+class LarvaHarvestViewSet(OwnerScopedViewMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = LarvaHarvest.objects.all()
     serializer_class = LarvaHarvestSerializer
+    owner_field = 'phase__cycle__user'
 
     def create(self, request, *args, **kwargs):
-        """Tambahkan larva harvest dan update total harvest di user."""
+        """Tambahkan larva harvest; total harvest dan poin diperbarui oleh LarvaHarvest.save."""
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             larva_harvest = serializer.save()  # Simpan data harvest
 
-            # Dapatkan phase dari larva_harvest
-            phase = larva_harvest.phase
-            user = phase.cycle.user  # User diambil dari cycle yang memiliki phase
-
-            print(f"[DEBUG] Sebelum Update - User: {user.email}, Total Harvest: {user.total_harvest}, Points: {user.points}")
-
-            # Update total harvest
-            user.total_harvest += larva_harvest.total_harvest
-            user.save()
-
-            print(f"[DEBUG] Setelah Update - User: {user.email}, Total Harvest: {user.total_harvest}, Points: {user.points}")
+            user = larva_harvest.phase.cycle.user  # User diambil dari cycle yang memiliki phase
+            if user is None:
+                return Response({"message": "Larva Harvest added successfully"}, status=201)
 
+            user.refresh_from_db(fields=['total_harvest', 'points'])
             return Response({
                 "message": "Larva Harvest added successfully",
                 "total_harvest": user.total_harvest,
@@ -149,11 +203,99 @@ class LarvaHarvestViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=400)
 
 
-class ArticleViewSet(viewsets.ModelViewSet):
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Upload foto bertahap:
+    1. POST /uploads/ {filename, total_size} untuk membuka sesi.
+    2. PUT /uploads/<id>/chunk/?offset=<n> dengan body berisi potongan file.
+       Jika koneksi putus, GET /uploads/<id>/ untuk melihat `received_size`.
+    3. Kirim id sesi sebagai `<field>_upload` (misal `waste_photo_upload`) ke add_waste dsb.
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user.pk)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=True, methods=['put'], parser_classes=[uploads.ChunkParser])
+    def chunk(self, request, pk=None):
+        """Menerima satu potongan file pada posisi `offset` (maksimal CHUNKED_UPLOAD_MAX_CHUNK byte)."""
+        session = self.get_object()
+        try:
+            offset = int(request.query_params.get('offset', session.received_size))
+            session = uploads.append_chunk(session.pk, offset, request.data)
+        except ValueError:
+            return Response({"error": "Offset tidak valid."}, status=status.HTTP_400_BAD_REQUEST)
+        except uploads.UploadError as error:
+            return Response({"error": str(error), "received_size": session.received_size}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(session).data)
+
+
+class ReportViewSet(viewsets.ViewSet):
+    """
+    Laporan sampah dan panen per periode:
+    GET /reports/?bucket=day|week|month&start=YYYY-MM-DD&end=YYYY-MM-DD
+    Tambahkan `cycle=<id>` untuk satu Cycle, atau `scope=platform` (staff) untuk semua user.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        params = ReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        queryset = DailyRollup.objects.all()
+        if params['scope'] == 'platform':
+            if not request.user.is_staff:
+                return Response({"error": "Laporan platform hanya untuk staff."}, status=status.HTTP_403_FORBIDDEN)
+        else:
+            queryset = queryset.filter(user=request.user.pk)
+        if 'cycle' in params:
+            queryset = queryset.filter(cycle=params['cycle'])
+        if 'start' in params:
+            queryset = queryset.filter(date__gte=params['start'])
+        if 'end' in params:
+            queryset = queryset.filter(date__lte=params['end'])
+
+        return Response({
+            'bucket': params['bucket'],
+            'results': reports.report(queryset, params['bucket']),
+        })
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Sinkronisasi catatan yang dibuat offline dalam satu request:
+    POST /sync/ {"wastes": [...], "larva_harvests": [...], "egg_harvests": [...]}
+    Setiap catatan wajib punya `client_id` (UUID dari aplikasi) dan `photo_upload`
+    (id UploadSession yang sudah lengkap). Catatan dengan client_id yang sudah
+    pernah diterima tidak disimpan ulang, sehingga request aman diulang.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request):
+        try:
+            results = sync.sync_records(request.user, request.data)
+        except sync.SyncError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Batch yang sama sedang diproses oleh request lain; ulangi untuk mendapat status duplicate
+            return Response({"error": "Sinkronisasi bentrok dengan request lain, silakan ulangi."}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            "created": sum(1 for result in results if result['status'] == sync.STATUS_CREATED),
+            "results": results,
+        })
+
+
+class ArticleViewSet(CachedContentMixin, PhaseTypeFilterMixin, SearchViewMixin, viewsets.ModelViewSet):
     queryset = Article.objects.all()
     serializer_class = ArticleSerializer
 
-class YoutubeViewSet(viewsets.ModelViewSet):
+class YoutubeViewSet(CachedContentMixin, PhaseTypeFilterMixin, SearchViewMixin, viewsets.ModelViewSet):
     queryset = Youtube.objects.all()
     serializer_class = YoutubeSerializer
 
@@ -161,30 +303,43 @@ class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     queryset = Notification.objects.all()
     permission_classes = [IsAuthenticated]  
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
         """Mengembalikan notifikasi hanya untuk pengguna yang sedang login."""
         user = self.request.user
-        if user.is_authenticated:
-            return Notification.objects.filter(user=user).order_by('-created_at')
-        return Notification.objects.none()
-
+        if not user.is_authenticated:
+            return Notification.objects.none()
+        queryset = Notification.objects.filter(user=user.pk)
+        is_read = self.request.query_params.get('is_read')
+        if is_read in ('true', 'false'):
+            queryset = queryset.filter(is_read=is_read == 'true')
+        return queryset
 
     @action(detail=True, methods=['patch'])
     def mark_as_read(self, request, pk=None):
-        print(f'Menerima PATCH untuk ID: {pk}')
-        print(f'Data request: {request.data}')
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        notifications.mark_read(request.user.pk, ids=[notification.pk])
         return Response({'status': 'Notification marked as read'})
-    
-    def list(self, request, *args, **kwargs):
-        """Menampilkan daftar notifikasi untuk semua pengguna."""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        print(serializer.data)
-        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Menandai beberapa notifikasi sekaligus sebagai dibaca: {"ids": [1, 2, 3]}."""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({"error": "ids harus berupa daftar id notifikasi."}, status=400)
+        updated = notifications.mark_read(request.user.pk, ids=ids)
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """Menandai semua notifikasi user sebagai dibaca dalam satu UPDATE."""
+        updated = notifications.mark_read(request.user.pk)
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': notifications.unread_count(request.user.pk)})
 
     def create(self, request, *args, **kwargs):
         """Membuat notifikasi baru jika user terautentikasi."""
@@ -194,11 +349,66 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 status=401
             )
 
-        data = request.data.copy()
-        data['user'] = request.user.id  # Set user ke ID pengguna yang sedang login
-
-        serializer = self.get_serializer(data=data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(user_id=request.user.pk)  # Set user ke ID pengguna yang sedang login
             return Response(serializer.data, status=201)
-        return Response(serializer.errors, status=400)
\ No newline at end of file
+        return Response(serializer.errors, status=400)
+
+
+def stream_user_id(request):
+    """Id user aktif dari token JWT di header Authorization atau parameter `?token=`, tanpa memuat user dari DB."""
+    authenticator = RevocableJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        token = authenticator.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+    user_id = token.get(jwt_settings.USER_ID_CLAIM)
+    state = user_cache.auth_state(user_id)
+    return user_id if state is not None and state[0] else None
+
+
+async def notification_stream(request):
+    """
+    Stream Server-Sent Events berisi notifikasi baru (`notification`) dan
+    perubahan jumlah belum dibaca (`unread_count`). EventSource tidak bisa
+    mengirim header, jadi token juga diterima lewat `?token=`.
+    Endpoint ini perlu dilayani lewat ASGI (backend/asgi.py); di bawah WSGI
+    stream tanpa akhir akan menahan satu worker, jadi dibalas 503.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Stream notifikasi hanya tersedia lewat server ASGI."}, status=503)
+
+    # Pengecekan token yang dicabut bisa membaca DB saat cache masih kosong
+    user_id = await asyncio.to_thread(stream_user_id, request)
+    if user_id is None:
+        return JsonResponse({"detail": "Token tidak valid."}, status=401)
+
+    broker = push.get_broker()
+
+    async def events():
+        # Subscribe dulu agar perubahan selama jumlah awal dihitung tidak terlewat
+        subscription = broker.subscribe(user_id)
+        queue = subscription[1]
+        try:
+            initial = await asyncio.to_thread(push.unread_count_event, user_id)
+            yield push.format_event(initial)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # Menjaga koneksi tetap hidup melewati proxy
+                    continue
+                yield push.format_event(event)
+        finally:
+            broker.unsubscribe(user_id, subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Nonaktifkan buffering nginx
+    return response
+
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import CustomUser, LeaderboardEntry, QueuedEmail
 from django.contrib.auth.admin import UserAdmin
 
 class CustomUserAdmin(UserAdmin):
@@ -13,3 +13,16 @@ class CustomUserAdmin(UserAdmin):
     list_display = ('email', 'points', 'profile_pics', 'total_harvest', 'total_waste')
 
 admin.site.register(CustomUser, CustomUserAdmin)
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('username', 'points', 'total_harvest', 'total_waste', 'updated_at')
+    search_fields = ('username',)
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'created_at', 'sent_at', 'delivery_latency_ms')
+    list_filter = ('status',)
+    search_fields = ('recipients', 'subject')
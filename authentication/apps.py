@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        from api import images
+        from . import checks  # noqa: F401  Mendaftarkan pemeriksaan --deploy
+        from .models import CustomUser
+        # Foto profil dibuatkan varian seperti foto lain (lihat api/images.py)
+        images.register(CustomUser, 'profile_pics')
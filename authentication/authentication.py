@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from . import tokens, user_cache
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication yang menolak token yang sudah dicabut (logout), dicek lewat cache.
+
+    Hasil autentikasi yang berhasil disimpan di HttpRequest, sehingga token yang
+    sudah divalidasi di middleware (api.idempotency) tidak divalidasi lagi oleh view.
+    """
+
+    def authenticate(self, request):
+        http_request = getattr(request, '_request', request)
+        results = http_request.__dict__.setdefault('_jwt_authentication', {})
+        if type(self) not in results:
+            results[type(self)] = super().authenticate(request)
+        return results[type(self)]
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if tokens.is_revoked(token.get(jwt_settings.JTI_CLAIM)):
+            raise InvalidToken("Token sudah dicabut.")
+        return token
+
+
+class LazyClaimsUser(SimpleLazyObject):
+    """
+    `request.user` yang dibangun dari klaim token. pk/id dan username dibaca
+    dari klaim, is_staff/is_superuser dari user_cache.auth_state; atribut lain
+    memuat user (lewat user_cache) saat pertama kali diakses. Setelah user
+    dimuat, nilai dari user yang dipakai.
+    """
+
+    def __init__(self, claims, loader):
+        super().__init__(loader)
+        self.__dict__['_claims'] = claims
+
+    def _claim(self, name):
+        if self._wrapped is empty and name in self._claims:
+            return self._claims[name]
+        if self._wrapped is empty:
+            self._setup()
+        return getattr(self._wrapped, name)
+
+    pk = property(lambda self: self._claim('pk'))
+    id = property(lambda self: self._claim('id'))
+    username = property(lambda self: self._claim('username'))
+    is_staff = property(lambda self: self._claim('is_staff'))
+    is_superuser = property(lambda self: self._claim('is_superuser'))
+    is_authenticated = True
+    is_anonymous = False
+
+    # LazyObject meneruskan operasi berikut ke user asli (dan memuatnya); DRF
+    # memanggil bool(request.user) di setiap pengecekan izin.
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        if type(other) is LazyClaimsUser or isinstance(other, get_user_model()):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class ClaimsJWTAuthentication(RevocableJWTAuthentication):
+    """
+    Autentikasi JWT tanpa memuat user per request: request.user berupa
+    LazyClaimsUser yang hanya memuat user jika atribut di luar klaim dipakai.
+    Status aktif dan hak staff selalu dicek lewat user_cache.auth_state, jadi
+    user yang dinonaktifkan atau dicabut hak staff-nya tertolak paling lambat
+    setelah AUTH_STATE_TTL, bukan setelah token kedaluwarsa.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token tidak berisi identitas user.")
+
+        state = user_cache.auth_state(user_id)
+        if state is None or not state[0]:
+            raise AuthenticationFailed("User tidak ditemukan atau tidak aktif.", code='user_not_found')
+
+        claims = {'pk': user_id, 'id': user_id, 'is_staff': state[1], 'is_superuser': state[2]}
+        claims.update({name: validated_token[name] for name in tokens.USER_CLAIMS if name in validated_token})
+
+        def load():
+            user = user_cache.get_user(user_id)
+            if user is None or not user.is_active:
+                raise AuthenticationFailed("User tidak ditemukan atau tidak aktif.", code='user_not_found')
+            return user
+
+        return LazyClaimsUser(claims, load)
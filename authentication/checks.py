@@ -0,0 +1,24 @@
+"""
+Pemeriksaan konfigurasi untuk `manage.py check --deploy`.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.security, Tags.caches, deploy=True)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """Counter rate limit di cache lokal per proses membuat limit efektif berlipat sesuai jumlah worker."""
+    alias = getattr(settings, 'RATE_LIMIT_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Warning(
+            f"RATE_LIMIT_CACHE ('{alias}') memakai {backend.rsplit('.', 1)[-1]}, yang tidak dibagi antar proses.",
+            hint="Arahkan CACHE_URL (atau RATE_LIMIT_CACHE) ke Redis/Memcached agar rate limit login/OTP berlaku untuk semua worker.",
+            id='authentication.W001',
+        )]
+    return []
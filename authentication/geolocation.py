@@ -0,0 +1,152 @@
+"""
+Resolver lokasi berdasarkan IP.
+
+Urutan pencarian: cache (per IP, lalu per prefix /24), database offline
+GeoIP2 jika dikonfigurasi, lalu ip-api.com dengan timeout yang dibatasi.
+Hasil disimpan di cache LRU dengan masa berlaku (TTL) di memori proses;
+kegagalan hanya di-cache selama FAILURE_TTL.
+"""
+import ipaddress
+import logging
+import threading
+import time
+from collections import OrderedDict
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_LOCATION = "Unknown Location"
+
+try:
+    import geoip2.database
+    import geoip2.errors
+except ImportError:  # Dependensi opsional
+    geoip2 = None
+
+
+class TTLCache:
+    """Cache LRU sederhana dengan masa berlaku per entri, aman dipakai antar thread."""
+
+    def __init__(self, max_entries=10000, ttl=86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """`ttl` opsional menggantikan masa berlaku bawaan untuk entri ini saja."""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def network_prefix(ip):
+    """Prefix /24 untuk IPv4 (/48 untuk IPv6), dipakai sebagai kunci cache kedua."""
+    address = ipaddress.ip_address(ip)
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+class GeoResolver:
+    def __init__(self, timeout=2, cache_ttl=86400, cache_size=10000, database_path=None, failure_ttl=60):
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self.cache = TTLCache(max_entries=cache_size, ttl=cache_ttl)
+        self.reader = None
+        if database_path:
+            if geoip2 is None:
+                logger.warning("GEOIP_DATABASE diatur tetapi paket geoip2 tidak terpasang")
+            else:
+                self.reader = geoip2.database.Reader(database_path)
+
+    def resolve(self, ip):
+        """Mengembalikan 'kota, provinsi, negara' untuk IP, atau UNKNOWN_LOCATION."""
+        if ip == "127.0.0.1":
+            ip = "8.8.8.8"
+        try:
+            prefix = network_prefix(ip)
+        except ValueError:
+            return UNKNOWN_LOCATION
+
+        location = self.cache.get(ip) or self.cache.get(prefix)
+        if location is not None:
+            return location
+
+        location = self.lookup_offline(ip) or self.lookup_remote(ip)
+        if location is None:
+            # Kegagalan di-cache sebentar saja (per IP) agar upstream yang bermasalah tidak terus
+            # dipanggil, tetapi IP tersebut tidak terjebak di UNKNOWN_LOCATION selama CACHE_TTL
+            self.cache.set(ip, UNKNOWN_LOCATION, ttl=self.failure_ttl)
+            return UNKNOWN_LOCATION
+
+        self.cache.set(ip, location)
+        self.cache.set(prefix, location)
+        return location
+
+    def lookup_offline(self, ip):
+        if self.reader is None:
+            return None
+        try:
+            response = self.reader.city(ip)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            return None
+        return f"{response.city.name or ''}, {response.subdivisions.most_specific.name or ''}, {response.country.name or ''}"
+
+    def lookup_remote(self, ip):
+        try:
+            response = requests.get(f"http://ip-api.com/json/{ip}", timeout=self.timeout)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Gagal mengambil lokasi untuk %s: %s", ip, e)
+            return None
+        if response.status_code == 200 and data.get("status") == "success":
+            return f"{data.get('city', '')}, {data.get('regionName', '')}, {data.get('country', '')}"
+        return None
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                config = settings.GEOLOCATION
+                _resolver = GeoResolver(
+                    timeout=config['TIMEOUT'],
+                    cache_ttl=config['CACHE_TTL'],
+                    cache_size=config['CACHE_SIZE'],
+                    database_path=config.get('DATABASE_PATH'),
+                    failure_ttl=config['FAILURE_TTL'],
+                )
+    return _resolver
+
+
+def fill_user_location(user_id, ip):
+    """Mengisi CustomUser.location setelah akun dibuat (dijalankan di background)."""
+    from .models import CustomUser
+    from .user_cache import invalidate
+    location = get_resolver().resolve(ip)
+    CustomUser.objects.filter(pk=user_id).update(location=location)
+    invalidate(user_id)
@@ -0,0 +1,37 @@
+"""
+Hasher password dengan parameter yang bisa diatur dari settings/env.
+
+Parameter dibaca dari `PASSWORD_HASHING` di settings. Jika parameter diubah,
+`must_update` milik hasher Django mendeteksi hash lama dengan parameter
+berbeda, dan `CustomUser.check_password` otomatis menyimpan ulang hash dengan
+parameter baru saat login berhasil. Hash dengan algoritma lain (misalnya
+PBKDF2 saat Argon2 dipilih) juga di-upgrade dengan cara yang sama.
+
+Ukur biaya setiap konfigurasi dengan `python manage.py benchmark_login`.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+DEFAULTS = {
+    'ARGON2_TIME_COST': Argon2PasswordHasher.time_cost,
+    'ARGON2_MEMORY_COST': Argon2PasswordHasher.memory_cost,  # KiB
+    'ARGON2_PARALLELISM': Argon2PasswordHasher.parallelism,
+    'PBKDF2_ITERATIONS': PBKDF2PasswordHasher.iterations,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    def __init__(self, time_cost=None, memory_cost=None, parallelism=None):
+        config = get_config()
+        self.time_cost = time_cost or config['ARGON2_TIME_COST']
+        self.memory_cost = memory_cost or config['ARGON2_MEMORY_COST']
+        self.parallelism = parallelism or config['ARGON2_PARALLELISM']
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    def __init__(self, iterations=None):
+        self.iterations = iterations or get_config()['PBKDF2_ITERATIONS']
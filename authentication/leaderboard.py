@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import Q
+from .models import CustomUser, LeaderboardEntry
+
+SORT_FIELDS = LeaderboardEntry.SORT_FIELDS
+RANK_LIMIT = 10000  # Peringkat dihitung persis hanya sampai batas ini
+
+
+def is_ranked(user):
+    """Hanya user biasa (bukan staff/superuser) yang masuk leaderboard."""
+    return not (user.is_staff or user.is_superuser)
+
+
+def sync_user(user):
+    """
+    Menyalin skor user ke tabel leaderboard, atau menghapus entrinya
+    jika user tidak lagi memenuhi syarat (misalnya dijadikan staff).
+    """
+    if not is_ranked(user):
+        LeaderboardEntry.objects.filter(user_id=user.pk).delete()
+        return
+    LeaderboardEntry.objects.update_or_create(
+        user_id=user.pk,
+        defaults={
+            'username': user.username,
+            'points': user.points,
+            'total_harvest': user.total_harvest,
+            'total_waste': user.total_waste,
+        },
+    )
+
+
+def ordered(sort_by):
+    """Queryset entri leaderboard yang urutannya sesuai index metrik terkait."""
+    return LeaderboardEntry.objects.order_by(f'-{sort_by}', 'username')
+
+
+def top(sort_by, offset=0, limit=20):
+    """Mengambil satu halaman leaderboard, setiap entri diberi atribut `rank`."""
+    entries = list(ordered(sort_by).select_related('user')[offset:offset + limit])
+    for index, entry in enumerate(entries):
+        entry.rank = offset + index + 1
+    return entries
+
+
+def rank_for(user_id, sort_by):
+    """
+    Mengambil entri user dengan atribut `rank`. Peringkat = jumlah entri di atasnya
+    pada index (skor lebih tinggi, atau skor sama dengan username lebih kecil) + 1.
+    Hitungan dibatasi RANK_LIMIT baris agar biayanya tidak ikut membesar untuk
+    user di peringkat bawah; di luar batas itu `rank` bernilai None.
+    """
+    entry = LeaderboardEntry.objects.select_related('user').filter(user_id=user_id).first()
+    if entry is None:
+        return None
+    score = getattr(entry, sort_by)
+    ahead = LeaderboardEntry.objects.filter(
+        Q(**{f'{sort_by}__gt': score}) | Q(**{sort_by: score, 'username__lt': entry.username})
+    ).order_by()[:RANK_LIMIT].count()
+    entry.rank = ahead + 1 if ahead < RANK_LIMIT else None
+    return entry
+
+
+def rebuild(batch_size=1000):
+    """Membangun ulang seluruh tabel leaderboard dari data CustomUser."""
+    users = (
+        CustomUser.objects.filter(is_staff=False, is_superuser=False)
+        .values_list('pk', 'username', 'points', 'total_harvest', 'total_waste')
+        .iterator(chunk_size=batch_size)
+    )
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        batch = []
+        created = 0
+        for pk, username, points, total_harvest, total_waste in users:
+            batch.append(LeaderboardEntry(
+                user_id=pk,
+                username=username,
+                points=points,
+                total_harvest=total_harvest,
+                total_waste=total_waste,
+            ))
+            if len(batch) >= batch_size:
+                LeaderboardEntry.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            LeaderboardEntry.objects.bulk_create(batch)
+            created += len(batch)
+    return created
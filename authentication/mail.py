@@ -0,0 +1,142 @@
+"""
+Antrean email keluar (outbox).
+
+`queue_email` dipanggil dari request dan hanya menulis satu baris.
+`deliver_batch` dipanggil worker: mengambil email yang jatuh tempo, mengirim
+semuanya lewat satu koneksi SMTP, lalu mencatat hasil dan latensinya.
+Email yang gagal dicoba lagi dengan jeda yang terus berlipat (backoff).
+
+Email berisi rahasia diantre dengan `ttl`: tidak dikirim setelah kedaluwarsa
+dan isinya dikosongkan begitu terkirim atau menyerah. `purge_outbox`
+(`manage.py purge_outbox`) menghapus riwayat yang sudah lewat masa simpan.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, recipients, from_email=None, ttl=None):
+    """
+    Menaruh email di outbox dan langsung kembali tanpa menghubungi SMTP.
+    `ttl` (detik) untuk email berisi rahasia yang tidak berguna lagi setelah lewat.
+    """
+    return QueuedEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=','.join(recipients),
+        expires_at=timezone.now() + timedelta(seconds=ttl) if ttl is not None else None,
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Mengambil email yang jatuh tempo dan menundanya selama masa lease, sehingga
+    worker lain yang berjalan bersamaan tidak mengirim email yang sama.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX['LEASE_SECONDS'])
+    with transaction.atomic():
+        emails = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=lease_until)
+    return emails
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.EMAIL_OUTBOX['RETRY_BASE_SECONDS'] * (2 ** (attempts - 1)))
+
+
+def secret_cleanup(email):
+    """Kolom yang dikosongkan setelah email berisi rahasia selesai diproses."""
+    return {'body': ''} if email.expires_at is not None else {}
+
+
+def mark_sent(email):
+    sent_at = timezone.now()
+    latency_ms = int((sent_at - email.created_at).total_seconds() * 1000)
+    QueuedEmail.objects.filter(pk=email.pk).update(
+        status=QueuedEmail.STATUS_SENT,
+        attempts=F('attempts') + 1,
+        sent_at=sent_at,
+        delivery_latency_ms=latency_ms,
+        last_error='',
+        **secret_cleanup(email),
+    )
+
+
+def mark_failed(email, error):
+    attempts = email.attempts + 1
+    give_up = attempts >= settings.EMAIL_OUTBOX['MAX_ATTEMPTS']
+    QueuedEmail.objects.filter(pk=email.pk).update(
+        status=QueuedEmail.STATUS_FAILED if give_up else QueuedEmail.STATUS_PENDING,
+        attempts=attempts,
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        last_error=str(error)[:2000],
+        **(secret_cleanup(email) if give_up else {}),
+    )
+
+
+def purge_outbox(batch_size=1000):
+    """
+    Menghapus per batch email terkirim/gagal yang lebih tua dari RETENTION_DAYS
+    dan email rahasia yang sudah kedaluwarsa. Mengembalikan jumlah yang dihapus.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(days=settings.EMAIL_OUTBOX['RETENTION_DAYS'])
+    condition = (
+        Q(status__in=[QueuedEmail.STATUS_SENT, QueuedEmail.STATUS_FAILED], created_at__lt=cutoff)
+        | Q(expires_at__lte=now)
+    )
+    removed = 0
+    while True:
+        ids = list(QueuedEmail.objects.filter(condition).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return removed
+        removed += QueuedEmail.objects.filter(pk__in=ids).delete()[0]
+
+
+def deliver_batch(batch_size=None):
+    """Mengirim satu batch email lewat satu koneksi SMTP. Mengembalikan (terkirim, gagal)."""
+    emails = claim_batch(batch_size or settings.EMAIL_OUTBOX['BATCH_SIZE'])
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        logger.warning("Tidak bisa membuka koneksi SMTP: %s", error)
+        for email in emails:
+            mark_failed(email, error)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.recipient_list(), connection=connection
+            )
+            try:
+                message.send()
+            except Exception as error:
+                logger.warning("Gagal mengirim email %s: %s", email.pk, error)
+                mark_failed(email, error)
+                failed += 1
+            else:
+                mark_sent(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,56 @@
+import itertools
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from authentication.hashers import TunedArgon2PasswordHasher, TunedPBKDF2PasswordHasher, get_config
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mengukur biaya verifikasi password (bagian terberat login) untuk beberapa "
+        "konfigurasi hasher, dan perkiraan login per detik per worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', choices=['argon2', 'pbkdf2'], default=settings.PASSWORD_HASHER,
+            help="Default: PASSWORD_HASHER di settings.",
+        )
+        parser.add_argument('--rounds', type=int, default=20, help="Jumlah verifikasi per konfigurasi.")
+        parser.add_argument('--time-cost', type=int_list, default=None, help="Argon2, misalnya 1,2,3")
+        parser.add_argument('--memory-cost', type=int_list, default=None, help="Argon2 dalam KiB, misalnya 19456,65536")
+        parser.add_argument('--parallelism', type=int_list, default=None, help="Argon2, misalnya 1,2")
+        parser.add_argument('--iterations', type=int_list, default=None, help="PBKDF2, misalnya 260000,600000")
+
+    def handle(self, *args, **options):
+        config = get_config()
+        if options['hasher'] == 'argon2':
+            grid = itertools.product(
+                options['time_cost'] or [config['ARGON2_TIME_COST']],
+                options['memory_cost'] or [config['ARGON2_MEMORY_COST']],
+                options['parallelism'] or [config['ARGON2_PARALLELISM']],
+            )
+            hashers = [
+                (f"argon2 t={t} m={m} p={p}", TunedArgon2PasswordHasher(time_cost=t, memory_cost=m, parallelism=p))
+                for t, m, p in grid
+            ]
+        else:
+            hashers = [
+                (f"pbkdf2 iterations={iterations}", TunedPBKDF2PasswordHasher(iterations=iterations))
+                for iterations in options['iterations'] or [config['PBKDF2_ITERATIONS']]
+            ]
+
+        for label, hasher in hashers:
+            try:
+                encoded = hasher.encode('benchmark-password', hasher.salt())
+            except ValueError as error:
+                raise CommandError(f"{label}: {error}")
+            start = time.perf_counter()
+            for _ in range(options['rounds']):
+                hasher.verify('benchmark-password', encoded)
+            per_login = (time.perf_counter() - start) / options['rounds']
+            self.stdout.write(f"{label}: {per_login * 1000:.1f} ms/login, {1 / per_login:.1f} login/detik per worker")
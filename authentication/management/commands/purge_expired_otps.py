@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from authentication.otp import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Menghapus OTP reset password yang sudah kedaluwarsa, per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = purge_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{removed} OTP kedaluwarsa dihapus."))
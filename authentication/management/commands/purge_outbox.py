@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from authentication.mail import purge_outbox
+
+
+class Command(BaseCommand):
+    help = "Menghapus riwayat outbox yang lewat masa simpan dan email rahasia yang kedaluwarsa, per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = purge_outbox(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{removed} email outbox dihapus."))
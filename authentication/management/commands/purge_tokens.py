@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from authentication.tokens import purge_expired, purge_revoked
+
+
+class Command(BaseCommand):
+    help = "Menghapus token (outstanding, blacklist, dan yang dicabut) yang sudah kedaluwarsa, per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = purge_expired(options['batch_size']) + purge_revoked(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{removed} token kedaluwarsa dihapus."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from authentication.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = "Membangun ulang tabel leaderboard dari data user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard dibangun ulang: {created} entri."))
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Avg
+from authentication.mail import deliver_batch
+from authentication.models import QueuedEmail
+
+
+class Command(BaseCommand):
+    help = "Mengirim email dari outbox. Pakai --loop untuk berjalan terus sebagai worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help="Terus berjalan dan memeriksa outbox secara berkala.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Jeda (detik) saat outbox kosong.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_batch(options['batch_size'])
+            if sent or failed:
+                average = QueuedEmail.objects.filter(status=QueuedEmail.STATUS_SENT).aggregate(
+                    latency=Avg('delivery_latency_ms')
+                )['latency']
+                self.stdout.write(f"Terkirim {sent}, gagal {failed}, rata-rata latensi {average or 0:.0f} ms")
+            if not options['loop']:
+                break
+            if not sent and not failed:
+                time.sleep(options['interval'])
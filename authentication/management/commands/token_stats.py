@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from authentication.tokens import stats
+
+
+class Command(BaseCommand):
+    help = "Menampilkan ukuran dan pertumbuhan tabel token JWT."
+
+    def handle(self, *args, **options):
+        for name, value in stats().items():
+            self.stdout.write(f"{name}: {value}")
@@ -1,10 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-import random
-import string
-from datetime import timedelta
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 class CustomUser(AbstractUser):
     location = models.CharField(max_length=255, blank=True, null=True) 
@@ -15,24 +14,126 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.email
-    
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Salinan ringkas skor user non-staff untuk leaderboard.
+    Setiap metrik punya index (skor desc, username) sehingga top-N dan
+    peringkat user cukup dibaca dari index, tanpa scan tabel user.
+    """
+    SORT_FIELDS = ['points', 'total_harvest', 'total_waste']
+
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    username = models.CharField(max_length=150)  # Disalin dari user untuk tie-break urutan
+    points = models.IntegerField(default=0)
+    total_harvest = models.BigIntegerField(default=0)
+    total_waste = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-points', 'username'], name='leaderboard_points_idx'),
+            models.Index(fields=['-total_harvest', 'username'], name='leaderboard_harvest_idx'),
+            models.Index(fields=['-total_waste', 'username'], name='leaderboard_waste_idx'),
+        ]
+
+    def __str__(self):
+        return f"Leaderboard {self.username}: {self.points} poin"
+
+
+# Kolom user yang memengaruhi isi leaderboard
+LEADERBOARD_FIELDS = {'username', 'points', 'total_harvest', 'total_waste', 'is_staff', 'is_superuser'}
+
+
+@receiver(post_save, sender=CustomUser)
+def sync_leaderboard_entry(sender, instance, update_fields=None, **kwargs):
+    """
+    Menjaga entri leaderboard tetap sama dengan data user. Save dengan
+    update_fields yang tidak menyentuh kolom leaderboard (misalnya hanya
+    password) dilewati.
+    """
+    if update_fields is not None and not LEADERBOARD_FIELDS.intersection(update_fields):
+        return
+    from .leaderboard import sync_user
+    sync_user(instance)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    from .user_cache import invalidate
+    invalidate(instance.pk)
+
 
 class PasswordResetOTP(models.Model):
-    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
-    otp = models.CharField(max_length=5)
+    """
+    OTP reset password yang sedang aktif; paling banyak satu per user.
+    Kode disimpan sebagai HMAC (lihat authentication/otp.py), bukan teks biasa.
+    """
+    user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='password_reset_otp')
+    otp_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(null=True, blank=True)
-
-    def generate_otp(self):
-        """Generate a random OTP of 6 digits."""
-        self.otp = ''.join(random.choices(string.digits, k=5))
-        self.expires_at = self.created_at + timedelta(minutes=10)  # OTP valid for 10 minutes
+    expires_at = models.DateTimeField(db_index=True)  # Dipakai `purge_expired_otps`
 
     def is_valid(self):
         """Check if OTP is valid and not expired."""
-        if self.expires_at is None:
-            return False  # Jika expires_at tidak diatur, anggap OTP tidak valid
         return self.expires_at > timezone.now()
 
     def __str__(self):
-        return f"OTP for {self.user.email}"
\ No newline at end of file
+        return f"OTP for {self.user.email}"
+
+
+class RevokedToken(models.Model):
+    """
+    jti token (termasuk access token) yang dicabut saat logout, sampai token itu
+    kedaluwarsa. Sumber kebenaran untuk cache pencabutan di authentication/tokens.py.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)  # Dipakai `purge_tokens`
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Dipakai sinkronisasi bertahap
+
+    def __str__(self):
+        return f"Revoked {self.jti}"
+
+
+class QueuedEmail(models.Model):
+    """
+    Outbox email. Request cukup menulis baris ini; pengiriman lewat SMTP
+    dilakukan worker terpisah (`manage.py send_queued_emails`).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Menunggu'),
+        (STATUS_SENT, 'Terkirim'),
+        (STATUS_FAILED, 'Gagal'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField()  # Dipisahkan koma
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    delivery_latency_ms = models.PositiveIntegerField(null=True, blank=True)  # Dari antre sampai terkirim
+    # Email berisi rahasia (OTP, link reset): tidak dikirim lagi setelah lewat, dan isinya dihapus setelah selesai
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='queuedemail_due_idx'),
+            models.Index(fields=['status', 'created_at'], name='queuedemail_retention_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.status})"
+
+    def recipient_list(self):
+        return [address for address in self.recipients.split(',') if address]
+
@@ -0,0 +1,83 @@
+"""
+OTP reset password.
+
+Setiap user punya paling banyak satu OTP aktif: meminta OTP baru menimpa
+yang lama. Kode hanya disimpan sebagai HMAC (dengan SECRET_KEY), jadi isi
+tabel tidak bisa dipakai untuk reset password. Setiap percobaan validasi
+mengurangi jatah percobaan secara atomik sebelum kode dibandingkan, sehingga
+request paralel tetap tidak bisa mencoba lebih dari MAX_ATTEMPTS kali.
+
+OTP kedaluwarsa dihapus per batch dengan `python manage.py purge_expired_otps`.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import get_random_string, salted_hmac
+from .models import PasswordResetOTP
+
+OTP_LENGTH = 5
+
+DEFAULTS = {
+    'TTL': 10 * 60,  # Detik
+    'MAX_ATTEMPTS': 5,
+}
+
+VALID = 'valid'
+INCORRECT = 'incorrect'
+EXPIRED = 'expired'  # Tidak ada, kedaluwarsa, atau jatah percobaan habis
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'OTP', {})}
+
+
+def hash_otp(user_id, code):
+    return salted_hmac('authentication.otp', f'{user_id}:{code}', algorithm='sha256').hexdigest()
+
+
+def issue(user):
+    """Membuat OTP baru untuk user (menggantikan yang lama) dan mengembalikan kodenya."""
+    code = get_random_string(OTP_LENGTH, allowed_chars='0123456789')
+    now = timezone.now()
+    PasswordResetOTP.objects.update_or_create(
+        user=user,
+        defaults={
+            'otp_hash': hash_otp(user.pk, code),
+            'attempts': 0,
+            'created_at': now,
+            'expires_at': now + timedelta(seconds=get_config()['TTL']),
+        },
+    )
+    return code
+
+
+def consume(user, code):
+    """
+    Memvalidasi lalu menghapus OTP user. Mengembalikan VALID, INCORRECT, atau EXPIRED.
+    Panggil di dalam transaksi bersama perubahan password.
+    """
+    now = timezone.now()
+    reserved = PasswordResetOTP.objects.filter(
+        user=user, expires_at__gt=now, attempts__lt=get_config()['MAX_ATTEMPTS'],
+    ).update(attempts=F('attempts') + 1)
+    if not reserved:
+        return EXPIRED
+    deleted, _ = PasswordResetOTP.objects.filter(
+        user=user, expires_at__gt=now, otp_hash=hash_otp(user.pk, code),
+    ).delete()
+    return VALID if deleted else INCORRECT
+
+
+def purge_expired(batch_size=1000):
+    """Menghapus OTP kedaluwarsa per batch. Mengembalikan jumlah yang dihapus."""
+    removed = 0
+    while True:
+        ids = list(
+            PasswordResetOTP.objects.filter(expires_at__lte=timezone.now())
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += PasswordResetOTP.objects.filter(pk__in=ids).delete()[0]
@@ -1,13 +1,16 @@
 import re
 from rest_framework import serializers
-from .models import CustomUser
+from .models import CustomUser, LeaderboardEntry
+from api.serializers import ImageVariantsField
 from django.contrib.auth import get_user_model
 import logging
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_pics_variants = ImageVariantsField(source='profile_pics')
+
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'location', 'points', 'profile_pics', 'total_harvest', 'total_waste'] 
+        fields = ['id', 'username', 'email', 'location', 'points', 'profile_pics', 'profile_pics_variants', 'total_harvest', 'total_waste'] 
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True,)
@@ -59,13 +62,10 @@ class RegisterSerializer(serializers.ModelSerializer):
             username=validated_data['username'],
             email=validated_data['email']
         )
-        print(f"Password sebelum hashing: {validated_data['password']}") # Log sebelum hashing
         user.set_password(validated_data['password'])  # Hash password
-        print(f"Password setelah hashing: {user.password}") # Log setelah hashing
         if 'location' in validated_data:
             user.location = validated_data['location']
         user.save()
-        print(f"Password disimpan di database: {user.password}")
         return user
     
     
@@ -77,15 +77,11 @@ class LoginSerializer(serializers.Serializer):
         CustomUser = get_user_model()  # Ambil model user kustom
         try:
             user = CustomUser.objects.get(email=data['email'])  # Cari user berdasarkan email
-            print(f"User ditemukan: {user.email}")  # Log user ditemukan
-            print(f"Password di database: {user.password}")  # Log password hashed di DB
         except CustomUser.DoesNotExist:
             raise serializers.ValidationError("Invalid login credentials")
 
-        # Verifikasi password
+        # Verifikasi password; hash lama otomatis disimpan ulang dengan hasher/parameter terbaru
         if not user.check_password(data['password']):
-            print(f"Password yang dimasukkan: {data['password']}")  # Log password input
-            print("Password tidak valid")  # Log jika password tidak valid
             raise serializers.ValidationError("Invalid login credentials")
 
         # Pastikan akun aktif
@@ -112,7 +108,19 @@ class UpdateUserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Username harus berisi hanya huruf kecil.")
         return value
 
+    def update(self, instance, validated_data):
+        """Hanya kolom yang dikirim yang ditulis, agar poin dan total yang diperbarui bersamaan tidak tertimpa."""
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
 class LeaderboardSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='user_id', read_only=True)
+    rank = serializers.IntegerField(read_only=True)
+    profile_pics = serializers.ImageField(source='user.profile_pics', read_only=True)
+    profile_pics_variants = ImageVariantsField(source='user.profile_pics')
+
     class Meta:
-        model = CustomUser 
-        fields = ['id', 'username', 'points', 'profile_pics', 'total_harvest', 'total_waste']
\ No newline at end of file
+        model = LeaderboardEntry
+        fields = ['rank', 'id', 'username', 'points', 'profile_pics', 'profile_pics_variants', 'total_harvest', 'total_waste']
\ No newline at end of file
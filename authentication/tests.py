@@ -1,3 +1,372 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.core import mail as outbox
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from . import checks, geolocation, leaderboard, mail, otp, tokens, user_cache
+from .authentication import ClaimsJWTAuthentication
+from .hashers import TunedPBKDF2PasswordHasher
+from .models import CustomUser, LeaderboardEntry, PasswordResetOTP, QueuedEmail, RevokedToken
+from .throttling import SlidingWindowLimiter
 
-# Create your tests here.
+
+def create_user(username, **fields):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='Rahasia!123', **fields
+    )
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [create_user(f'petani{index}', points=index * 10) for index in range(3)]
+        self.client.force_authenticate(self.users[0])
+
+    def test_response_shape(self):
+        response = self.client.get('/auth/leaderboard/?limit=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['sort_by'], 'points')
+        self.assertEqual(response.data['next_offset'], 2)
+        self.assertEqual([row['username'] for row in response.data['results']], ['petani2', 'petani1'])
+        self.assertEqual([row['rank'] for row in response.data['results']], [1, 2])
+        self.assertEqual(response.data['me']['username'], 'petani0')
+        self.assertEqual(response.data['me']['rank'], 3)
+
+    def test_rank_beyond_limit_is_null(self):
+        with mock.patch.object(leaderboard, 'RANK_LIMIT', 2):
+            self.assertIsNone(leaderboard.rank_for(self.users[0].pk, 'points').rank)
+            self.assertEqual(leaderboard.rank_for(self.users[1].pk, 'points').rank, 2)
+
+    def test_password_only_save_skips_leaderboard_sync(self):
+        user = self.users[1]
+        user.set_password('Baru!12345')
+        with self.assertNumQueries(1):
+            user.save(update_fields=['password'])
+
+    def test_score_change_syncs_entry(self):
+        user = self.users[1]
+        user.points = 99
+        user.save(update_fields=['points'])
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).points, 99)
+
+
+class GeoResolverTests(SimpleTestCase):
+    def setUp(self):
+        self.resolver = geolocation.GeoResolver(cache_ttl=86400, failure_ttl=60)
+        self.now = 1000.0
+        clock = mock.patch.object(geolocation.time, 'monotonic', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_failure_is_cached_briefly(self):
+        with mock.patch.object(self.resolver, 'lookup_remote', return_value=None) as lookup:
+            self.assertEqual(self.resolver.resolve('1.2.3.4'), geolocation.UNKNOWN_LOCATION)
+            self.assertEqual(self.resolver.resolve('1.2.3.4'), geolocation.UNKNOWN_LOCATION)
+        self.assertEqual(lookup.call_count, 1)
+
+        self.now += 61
+        with mock.patch.object(self.resolver, 'lookup_remote', return_value='Bandung, Jawa Barat, Indonesia'):
+            self.assertEqual(self.resolver.resolve('1.2.3.4'), 'Bandung, Jawa Barat, Indonesia')
+
+    def test_success_is_cached_for_full_ttl(self):
+        with mock.patch.object(self.resolver, 'lookup_remote', return_value='Bandung, Jawa Barat, Indonesia'):
+            self.resolver.resolve('1.2.3.4')
+        self.now += 3600
+        with mock.patch.object(self.resolver, 'lookup_remote') as lookup:
+            self.assertEqual(self.resolver.resolve('1.2.3.9'), 'Bandung, Jawa Barat, Indonesia')
+        lookup.assert_not_called()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def test_secret_email_body_cleared_after_send(self):
+        secret = mail.queue_email("OTP", "Your OTP is 12345.", ['a@example.com'], ttl=600)
+        plain = mail.queue_email("Halo", "Selamat datang.", ['b@example.com'])
+
+        self.assertEqual(mail.deliver_batch(), (2, 0))
+
+        self.assertEqual(len(outbox.outbox), 2)
+        secret.refresh_from_db()
+        plain.refresh_from_db()
+        self.assertEqual((secret.status, secret.body), (QueuedEmail.STATUS_SENT, ''))
+        self.assertEqual(plain.body, "Selamat datang.")
+
+    def test_expired_email_is_not_sent(self):
+        email = mail.queue_email("OTP", "Your OTP is 12345.", ['a@example.com'], ttl=600)
+        QueuedEmail.objects.filter(pk=email.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(mail.deliver_batch(), (0, 0))
+        self.assertEqual(outbox.outbox, [])
+
+    def test_purge_outbox(self):
+        old = timezone.now() - timedelta(days=31)
+        kept_pending = mail.queue_email("Lama", "Masih antre.", ['a@example.com'])
+        recent_sent = mail.queue_email("Baru", "Terkirim.", ['a@example.com'])
+        old_sent = mail.queue_email("Lama", "Terkirim.", ['a@example.com'])
+        expired = mail.queue_email("OTP", "Your OTP is 12345.", ['a@example.com'], ttl=600)
+        QueuedEmail.objects.filter(pk__in=[recent_sent.pk, old_sent.pk]).update(status=QueuedEmail.STATUS_SENT)
+        QueuedEmail.objects.filter(pk__in=[kept_pending.pk, old_sent.pk]).update(created_at=old)
+        QueuedEmail.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(mail.purge_outbox(batch_size=1), 2)
+        self.assertEqual(set(QueuedEmail.objects.values_list('pk', flat=True)), {kept_pending.pk, recent_sent.pk})
+
+
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('keluar')
+        self.refresh = tokens.ClaimsRefreshToken.for_user(self.user)
+        self.access = str(self.refresh.access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_logout_revokes_access_token_even_after_cache_loss(self):
+        response = self.client.post('/auth/logout/', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+
+        cache.clear()
+
+        self.assertEqual(self.client.get('/auth/user/').status_code, 401)
+
+    def test_revocation_from_another_process_is_seen_after_sync(self):
+        jti = 'jti-proses-lain'
+        self.assertFalse(tokens.is_revoked(jti))
+
+        # Proses lain hanya menulis ke DB (cache-nya terpisah)
+        RevokedToken.objects.create(jti=jti, expires_at=timezone.now() + timedelta(minutes=5))
+        self.assertFalse(tokens.is_revoked(jti))
+
+        cache.delete(tokens.WARM_KEY)  # WARM_TTL lewat
+        with self.assertNumQueries(2):  # Sinkronisasi bertahap: RevokedToken dan BlacklistedToken
+            self.assertTrue(tokens.is_revoked(jti))
+
+    def test_logout_rejects_bad_input(self):
+        self.assertEqual(self.client.post('/auth/logout/', {}).status_code, 400)
+        self.assertEqual(self.client.post('/auth/logout/', {'refresh': 'bukan-token'}).status_code, 400)
+
+    def test_purge_revoked(self):
+        RevokedToken.objects.create(jti='lama', expires_at=timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='baru', expires_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(tokens.purge_revoked(batch_size=1), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['baru'])
+
+
+class AuthStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('pengguna', is_staff=True)
+        self.access = tokens.ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        self.assertEqual(self.client.get('/auth/user/').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+
+        self.assertEqual(self.client.get('/auth/user/').status_code, 401)
+
+    def test_demoted_staff_loses_access(self):
+        self.assertEqual(self.client.get('/api/reports/', {'scope': 'platform'}).status_code, 200)
+
+        self.user.is_staff = False
+        self.user.save(update_fields=['is_staff'])
+
+        self.assertEqual(self.client.get('/api/reports/', {'scope': 'platform'}).status_code, 403)
+
+    def test_claims_only_endpoint_does_not_load_user(self):
+        self.assertEqual(self.client.get('/api/notifikasi/unread_count/').status_code, 200)
+        cache.delete(user_cache.user_key(self.user.pk))
+
+        with mock.patch.object(user_cache, 'get_user') as get_user, self.assertNumQueries(1):  # Hanya COUNT notifikasi
+            response = self.client.get('/api/notifikasi/unread_count/')
+
+        self.assertEqual(response.status_code, 200)
+        get_user.assert_not_called()
+
+    def test_lazy_user_compares_by_pk(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        lazy_user = ClaimsJWTAuthentication().authenticate(request)[0]
+
+        self.assertEqual(lazy_user, self.user)
+        self.assertNotEqual(lazy_user, create_user('lain'))
+        self.assertEqual(len({lazy_user, self.user}), 1)
+
+    def test_token_does_not_carry_staff_claim(self):
+        self.assertNotIn('is_staff', tokens.ClaimsRefreshToken.for_user(self.user).access_token)
+
+
+class FreshUserSaveTests(APITestCase):
+    """Perubahan profil dan password tidak boleh menimpa poin yang berubah di tempat lain."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('penyimpan')
+        access = tokens.ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        # Salinan user di cache, lalu poin berubah lewat UPDATE dari proses lain
+        self.assertEqual(self.client.get('/auth/user/').status_code, 200)
+        CustomUser.objects.filter(pk=self.user.pk).update(points=50)
+        self.assertEqual(user_cache.get_user(self.user.pk).points, 0)
+
+    def test_change_password_keeps_points(self):
+        response = self.client.post('/auth/change-password/', {'old_password': 'Rahasia!123', 'new_password': 'Baru!12345'})
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.points, 50)
+        self.assertTrue(self.user.check_password('Baru!12345'))
+
+    def test_update_user_keeps_points(self):
+        response = self.client.put('/auth/update-user/', {'location': 'Bandung'})
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.points, self.user.location), (50, 'Bandung'))
+
+
+class SlidingWindowLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.limiter = SlidingWindowLimiter(LocMemCache('ratelimit-test', {}), limit=3, window=60)
+
+    def test_limit_within_window(self):
+        self.assertEqual([self.limiter.hit('kunci', now=600)[0] for _ in range(4)], [True, True, True, False])
+        self.assertTrue(self.limiter.hit('kunci-lain', now=600)[0])
+
+    def test_previous_window_decays(self):
+        for _ in range(3):
+            self.limiter.hit('kunci', now=600)
+
+        # Awal window berikutnya: window sebelumnya masih berbobot penuh
+        allowed, wait = self.limiter.hit('kunci', now=660)
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+
+        # Di tengah window bobotnya tinggal 1.5, jadi masih ada ruang untuk dua request
+        self.assertEqual([self.limiter.hit('kunci', now=690)[0] for _ in range(3)], [True, True, False])
+
+    def test_rejected_hits_are_not_counted(self):
+        for _ in range(10):
+            self.limiter.hit('kunci', now=600)
+        self.assertTrue(self.limiter.hit('kunci', now=720)[0])
+
+
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'login_ip': '2/min'},
+            'NUM_PROXIES': 0,
+        }
+        override = self.settings(REST_FRAMEWORK=rest_framework)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def login(self, index):
+        return self.client.post(
+            '/auth/login/',
+            {'email': f'tamu{index}@example.com', 'password': 'salah'},
+            HTTP_X_FORWARDED_FOR=f'10.0.0.{index}',
+        )
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.assertNotEqual(self.login(1).status_code, 429)
+        self.assertNotEqual(self.login(2).status_code, 429)
+
+        response = self.login(3)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+class RateLimitCacheCheckTests(SimpleTestCase):
+    def test_local_memory_cache_warns(self):
+        with self.settings(RATE_LIMIT_CACHE='default', CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in checks.check_rate_limit_cache(None)], ['authentication.W001'])
+
+    def test_shared_cache_passes(self):
+        with self.settings(RATE_LIMIT_CACHE='default', CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(checks.check_rate_limit_cache(None), [])
+
+
+class OTPTests(TestCase):
+    def setUp(self):
+        self.user = create_user('lupa')
+        self.code = otp.issue(self.user)
+        self.wrong = '00000' if self.code != '00000' else '11111'
+
+    def test_code_is_stored_hashed(self):
+        self.assertNotEqual(PasswordResetOTP.objects.get(user=self.user).otp_hash, self.code)
+
+    def test_consume(self):
+        self.assertEqual(otp.consume(self.user, self.wrong), otp.INCORRECT)
+        self.assertEqual(otp.consume(self.user, self.code), otp.VALID)
+        # Sekali pakai
+        self.assertEqual(otp.consume(self.user, self.code), otp.EXPIRED)
+
+    def test_expired_code_is_rejected(self):
+        PasswordResetOTP.objects.filter(user=self.user).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(otp.consume(self.user, self.code), otp.EXPIRED)
+
+    @override_settings(OTP={'MAX_ATTEMPTS': 2})
+    def test_attempts_are_capped(self):
+        self.assertEqual(otp.consume(self.user, self.wrong), otp.INCORRECT)
+        self.assertEqual(otp.consume(self.user, self.wrong), otp.INCORRECT)
+        self.assertEqual(otp.consume(self.user, self.code), otp.EXPIRED)
+
+    @override_settings(OTP={'MAX_ATTEMPTS': 2})
+    def test_reissue_resets_attempts(self):
+        otp.consume(self.user, self.wrong)
+        otp.consume(self.user, self.wrong)
+
+        code = otp.issue(self.user)
+
+        self.assertEqual(PasswordResetOTP.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(otp.consume(self.user, code), otp.VALID)
+
+    def test_purge_expired(self):
+        other = create_user('masih')
+        otp.issue(other)
+        PasswordResetOTP.objects.filter(user=self.user).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(otp.purge_expired(batch_size=1), 1)
+        self.assertEqual(list(PasswordResetOTP.objects.values_list('user', flat=True)), [other.pk])
+
+
+@override_settings(
+    PASSWORD_HASHERS=['authentication.hashers.TunedPBKDF2PasswordHasher'],
+    PASSWORD_HASHING={'PBKDF2_ITERATIONS': 2000},
+)
+class PasswordHashingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_new_hash_uses_configured_iterations(self):
+        user = create_user('baru')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_login_upgrades_weaker_hash(self):
+        user = create_user('lama')
+        weak = TunedPBKDF2PasswordHasher(iterations=1000)
+        CustomUser.objects.filter(pk=user.pk).update(password=weak.encode('Rahasia!123', weak.salt()))
+
+        response = self.client.post('/auth/login/', {'email': user.email, 'password': 'Rahasia!123'})
+
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(user.check_password('Rahasia!123'))
+
+    def test_benchmark_defaults_to_configured_hasher(self):
+        stdout = io.StringIO()
+        with self.settings(PASSWORD_HASHER='pbkdf2'):
+            call_command('benchmark_login', '--rounds=1', stdout=stdout)
+        self.assertIn('pbkdf2 iterations=2000', stdout.getvalue())
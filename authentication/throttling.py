@@ -0,0 +1,116 @@
+"""
+Rate limiting untuk endpoint login, OTP, dan reset password.
+
+Limiter memakai sliding window dua bucket: jumlah request di window saat ini
+ditambah jumlah di window sebelumnya yang diberi bobot sesuai sisa waktunya.
+Hasilnya mendekati sliding window yang sebenarnya, tetapi hanya butuh dua
+counter per kunci (satu get_many + satu incr di cache).
+
+Throttle dijalankan DRF sebelum view, jadi request yang ditolak tidak
+menyentuh DB, tidak menghitung hash password, dan tidak mengirim email.
+Cache yang dipakai diatur lewat `RATE_LIMIT_CACHE` (alias di CACHES) dan harus
+dipakai bersama oleh semua proses; cache lokal per proses diperingatkan oleh
+`manage.py check --deploy` (authentication/checks.py).
+"""
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class SlidingWindowLimiter:
+    def __init__(self, cache, limit, window, prefix='ratelimit'):
+        self.cache = cache
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+
+    def bucket_key(self, key, bucket):
+        return f"{self.prefix}:{key}:{bucket}"
+
+    def hit(self, key, now=None):
+        """
+        Mencatat satu request untuk `key`. Mengembalikan (diizinkan, detik
+        tunggu); request yang ditolak tidak ikut dihitung.
+        """
+        now = time.time() if now is None else now
+        bucket, elapsed = divmod(now, self.window)
+        current_key = self.bucket_key(key, int(bucket))
+        previous_key = self.bucket_key(key, int(bucket) - 1)
+        counts = self.cache.get_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+
+        weight = 1 - elapsed / self.window
+        if current + previous * weight >= self.limit:
+            return False, self.retry_after(current, previous, elapsed)
+
+        if not self.cache.add(current_key, 1, int(self.window * 2)):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                # Kunci kedaluwarsa di antara add dan incr
+                self.cache.set(current_key, 1, int(self.window * 2))
+        return True, 0
+
+    def retry_after(self, current, previous, elapsed):
+        """Perkiraan detik sampai bobot window sebelumnya cukup turun."""
+        if current >= self.limit or not previous:
+            return self.window - elapsed
+        # current + previous * (1 - t / window) < limit  =>  t > window * (1 - (limit - current) / previous)
+        target = self.window * (1 - (self.limit - current) / previous)
+        return max(target - elapsed, 1)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Throttle DRF berbasis SlidingWindowLimiter. Rate diambil dari
+    DEFAULT_THROTTLE_RATES dengan nama `<view.throttle_scope>_<key_name>`.
+    """
+    key_name = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def get_rate(self, view):
+        scope = f"{getattr(view, 'throttle_scope', '')}_{self.key_name}"
+        rates = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})
+        return scope, rates.get(scope)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope, rate = self.get_rate(view)
+        key = self.get_key(request)
+        if rate is None or key is None:
+            return True
+        limit, window = SimpleRateThrottle.parse_rate(None, rate)
+        cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+        allowed, self.wait_seconds = SlidingWindowLimiter(cache, limit, window, prefix=f"ratelimit:{scope}").hit(key)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self.wait_seconds) if self.wait_seconds else None
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """
+    Membatasi per alamat IP. X-Forwarded-For hanya dipakai sesuai NUM_PROXIES
+    milik DRF; dengan NUM_PROXIES 0 yang dipakai REMOTE_ADDR.
+    """
+    key_name = 'ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    """Membatasi per email tujuan, sehingga satu akun tidak bisa dibanjiri dari banyak IP."""
+    key_name = 'email'
+
+    def get_key(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not email or not isinstance(email, str):
+            return None
+        return hashlib.sha256(email.strip().lower().encode()).hexdigest()
@@ -0,0 +1,149 @@
+"""
+Siklus hidup token JWT.
+
+- Pencabutan: jti token yang dicabut (logout) dicatat di tabel RevokedToken
+  dan di cache sampai token itu kedaluwarsa, sehingga pengecekan per request
+  cukup satu lookup cache. Setiap WARM_TTL cache disinkronkan dari
+  RevokedToken dan BlacklistedToken: hanya baris baru sejak sinkronisasi
+  terakhir, atau semuanya jika cache baru kosong (restart, eviction) atau
+  sinkronisasi penuh terakhir lebih lama dari FULL_SYNC_TTL. Dengan begitu
+  pencabutan dari proses lain (cache per proses) paling lambat terlihat
+  setelah WARM_TTL.
+- Pembersihan: setiap login menyimpan satu OutstandingToken, jadi token yang
+  sudah kedaluwarsa (termasuk RevokedToken) dihapus berkala per batch
+  (`manage.py purge_tokens`).
+- Statistik pertumbuhan tabel token: `manage.py token_stats`.
+- Klaim tambahan (username) agar request baca tidak perlu memuat user. Hak
+  akses (is_staff) sengaja tidak disimpan di token karena bisa berubah.
+"""
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import RevokedToken
+
+REVOKED_PREFIX = 'jwt:revoked:'
+WARM_KEY = 'jwt:revoked:warm'
+WARM_TTL = 30  # Detik
+SYNCED_KEY = 'jwt:revoked:synced'  # Waktu sinkronisasi terakhir
+FULL_SYNC_TTL = 60 * 60  # Detik; setelah ini sinkronisasi diulang penuh
+SYNC_OVERLAP = timedelta(seconds=60)  # Menangkap baris yang commit terlambat
+
+# Atribut user yang ikut disimpan di token (lihat ClaimsJWTAuthentication)
+USER_CLAIMS = ['username']
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token dengan klaim USER_CLAIMS; access token turunannya ikut membawa klaim itu."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for name in USER_CLAIMS:
+            token[name] = getattr(user, name)
+        return token
+
+
+def revoked_key(jti):
+    return f"{REVOKED_PREFIX}{jti}"
+
+
+def revoke(jti, exp):
+    """Mencatat jti sebagai dicabut sampai waktu kedaluwarsanya (`exp`, timestamp)."""
+    remaining = int(exp - timezone.now().timestamp())
+    if remaining > 0:
+        RevokedToken.objects.get_or_create(
+            jti=jti, defaults={'expires_at': timezone.now() + timedelta(seconds=remaining)}
+        )
+        cache.set(revoked_key(jti), True, remaining)
+
+
+def revoke_token(token):
+    """Blacklist token (jika refresh token) dan catat jti-nya di cache."""
+    if hasattr(token, 'blacklist'):
+        token.blacklist()
+    revoke(token[jwt_settings.JTI_CLAIM], token['exp'])
+
+
+def warm():
+    """
+    Mengisi cache dari RevokedToken dan BlacklistedToken yang belum kedaluwarsa;
+    hanya baris sejak sinkronisasi terakhir jika sinkronisasi penuh masih berlaku.
+    """
+    now = timezone.now()
+    state = cache.get(SYNCED_KEY)  # (sinkronisasi terakhir, sinkronisasi penuh terakhir)
+    revoked = RevokedToken.objects.filter(expires_at__gt=now)
+    blacklisted = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+    if state is not None:
+        since = state[0] - SYNC_OVERLAP
+        revoked = revoked.filter(created_at__gte=since)
+        blacklisted = blacklisted.filter(blacklisted_at__gte=since)
+    timeout = int(jwt_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    cache.set_many({revoked_key(jti): True for jti in revoked.values_list('jti', flat=True).iterator()}, timeout)
+    cache.set_many({revoked_key(jti): True for jti in blacklisted.values_list('token__jti', flat=True).iterator()}, timeout)
+
+    full_sync_at = now if state is None else state[1]
+    remaining = FULL_SYNC_TTL - (now - full_sync_at).total_seconds()
+    cache.set(SYNCED_KEY, (now, full_sync_at), max(int(remaining), 1))
+    cache.set(WARM_KEY, True, WARM_TTL)
+
+
+def is_revoked(jti):
+    key = revoked_key(jti)
+    values = cache.get_many([WARM_KEY, key])
+    if WARM_KEY not in values:
+        warm()
+        return cache.get(key) is not None
+    return key in values
+
+
+def purge_expired(batch_size=1000):
+    """
+    Menghapus OutstandingToken yang sudah kedaluwarsa per batch (BlacklistedToken
+    ikut terhapus lewat cascade). Mengembalikan jumlah token yang dihapus.
+    """
+    removed = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        removed += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+
+
+def purge_revoked(batch_size=1000):
+    """Menghapus RevokedToken yang tokennya sudah kedaluwarsa per batch. Mengembalikan jumlahnya."""
+    removed = 0
+    while True:
+        ids = list(
+            RevokedToken.objects.filter(expires_at__lte=timezone.now())
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += RevokedToken.objects.filter(pk__in=ids).delete()[0]
+
+
+def stats():
+    """Ringkasan ukuran dan pertumbuhan tabel token."""
+    now = timezone.now()
+    outstanding = OutstandingToken.objects.all()
+    per_user = outstanding.exclude(user=None).values('user').annotate(count=Count('pk'))
+    return {
+        'outstanding': outstanding.count(),
+        'outstanding_expired': outstanding.filter(expires_at__lte=now).count(),
+        'blacklisted': BlacklistedToken.objects.count(),
+        'blacklisted_expired': BlacklistedToken.objects.filter(token__expires_at__lte=now).count(),
+        'created_last_24h': outstanding.filter(created_at__gte=now - timedelta(days=1)).count(),
+        'created_last_7d': outstanding.filter(created_at__gte=now - timedelta(days=7)).count(),
+        'users_with_tokens': per_user.count(),
+        'max_tokens_per_user': per_user.aggregate(max=Max('count'))['max'] or 0,
+    }
@@ -0,0 +1,52 @@
+"""
+Cache singkat untuk objek user yang dimuat oleh ClaimsJWTAuthentication, dan
+untuk status otorisasinya (is_active, is_staff, is_superuser) yang dicek di
+setiap request.
+
+Entri dihapus setiap kali CustomUser disimpan (signal di models.py) dan saat
+kolom user diubah lewat UPDATE langsung (api.aggregates, geolokasi), sehingga
+TTL hanya menjadi batas atas untuk perubahan dari luar aplikasi.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+USER_CACHE_TTL = 60  # Detik
+AUTH_STATE_TTL = 30  # Detik
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def auth_state_key(user_id):
+    return f"user:{user_id}:auth"
+
+
+def get_user(user_id):
+    """User dari cache, atau dari DB jika belum ada. None jika user tidak ditemukan."""
+    key = user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, USER_CACHE_TTL)
+    return user
+
+
+def auth_state(user_id):
+    """(is_active, is_staff, is_superuser) dari cache atau satu query kecil. None jika user tidak ditemukan."""
+    key = auth_state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = (
+            get_user_model().objects.filter(pk=user_id)
+            .values_list('is_active', 'is_staff', 'is_superuser').first()
+        )
+        if state is not None:
+            cache.set(key, state, AUTH_STATE_TTL)
+    return state
+
+
+def invalidate(*user_ids):
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    cache.delete_many([user_key(user_id) for user_id in user_ids] + [auth_state_key(user_id) for user_id in user_ids])
@@ -1,29 +1,16 @@
-import requests
+from .geolocation import get_resolver
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
+from .mail import queue_email
 from django.contrib.auth import get_user_model
+from django.conf import settings
 
 def get_location_from_ip(ip):
     """
-    Ambil lokasi berdasarkan IP menggunakan ip-api.com.
+    Ambil lokasi berdasarkan IP (lihat authentication.geolocation).
     """
-    try:
-        if ip == "127.0.0.1":
-            ip = "8.8.8.8"  
-
-        response = requests.get(f"http://ip-api.com/json/{ip}")
-        data = response.json()
-        if response.status_code == 200 and data.get("status") == "success":
-            city = data.get("city", "")
-            region = data.get("regionName", "")
-            country = data.get("country", "")
-            return f"{city}, {region}, {country}"
-        return "Unknown Location"
-    except Exception as e:
-        print(f"Error getting location: {e}")
-        return "Unknown Location"
+    return get_resolver().resolve(ip)
 
 User = get_user_model()
 token_generator = PasswordResetTokenGenerator()
@@ -38,15 +25,11 @@ def send_password_reset_email(user, request):
     # Generate reset link
     reset_link = f"{request.scheme}://{request.get_host()}/auth/reset-password/{uid}/{token}/"
 
-    # Log token, UID, dan reset link
-    print(f"Token: {token}")
-    print(f"UID: {uid}")
-    print(f"Reset Link: {reset_link}")
-
-    # Kirim email
-    send_mail(
+    # Masukkan ke outbox, dikirim oleh worker send_queued_emails
+    queue_email(
         "Reset Your Password",
         f"Click the link below to reset your password:\n\n{reset_link}",
-        "no-reply@example.com",
         [user.email],
+        from_email="no-reply@example.com",
+        ttl=settings.PASSWORD_RESET_TIMEOUT,
     )
\ No newline at end of file
@@ -1,17 +1,24 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import CustomUser, PasswordResetOTP
+from .models import CustomUser
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import RegisterSerializer, LoginSerializer, RequestOTPSerializer, UserSerializer, ValidateOTPSerializer, UpdateUserSerializer, LeaderboardSerializer
 from django.contrib.auth import authenticate, get_user_model
 from .utils import get_location_from_ip, send_password_reset_email
+from .geolocation import fill_user_location
+from backend import tasks
+from django.conf import settings
+from . import leaderboard, otp, tokens
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str 
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail  
+from django.db import transaction
+from .mail import queue_email
+from .throttling import IPThrottle, EmailThrottle
 
 class RegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
@@ -22,34 +29,34 @@ class RegisterView(generics.CreateAPIView):
         Override metode create untuk menyisipkan lokasi berdasarkan IP.
         """
         ip = request.META.get('REMOTE_ADDR', '127.0.0.1')  # Ambil IP pengguna
-        print(f"IP User: {ip}")  # Debugging IP
-        location = get_location_from_ip(ip)  # Ambil lokasi dari utils
-        print(f"User Location: {location}")  # Debugging lokasi
+        fill_later = settings.GEOLOCATION['ASYNC']
 
         # Buat salinan data yang dapat diubah
         mutable_data = request.data.copy()
-        mutable_data['location'] = location  # Tambahkan lokasi ke data
+        if not fill_later:
+            mutable_data['location'] = get_location_from_ip(ip)  # Ambil lokasi dari utils
 
         # Gunakan mutable_data untuk serializer
         serializer = self.get_serializer(data=mutable_data)
         if not serializer.is_valid():
-            print("Serializer Errors: ", serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        print(f"Password setelah save di database: {user.password}")  # Log setelah save
+        if fill_later:
+            # Lokasi diisi di background agar registrasi tidak menunggu layanan geolokasi
+            tasks.submit(fill_user_location, user.pk, ip)
         return Response(self.get_serializer(user).data, status=status.HTTP_201_CREATED)
 
 class LoginView(APIView):
     serializer_class = LoginSerializer
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
-        print(f"Request Data: {request.data}")  # Debug data yang diterima dari request
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data
-            print(f"User valid: {user.username}")  # Debug user yang berhasil login
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens.ClaimsRefreshToken.for_user(user)
             return Response({
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
@@ -59,7 +66,6 @@ class LoginView(APIView):
                     "email": user.email,
                 }
             })
-        print(f"Serializer Errors: {serializer.errors}")  # Debug error pada serializer
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 class LogoutView(APIView):
@@ -69,12 +75,17 @@ class LogoutView(APIView):
         try:
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
-            token.blacklist()  # ✅ Masukkan token ke blacklist
+            tokens.revoke_token(token)  # ✅ Masukkan token ke blacklist
+            if request.auth is not None:
+                tokens.revoke_token(request.auth)  # Access token yang sedang dipakai juga langsung ditolak
             return Response({"message": "Logout berhasil"}, status=200)
-        except Exception as e:
+        except (KeyError, TokenError):
             return Response({"error": "Token tidak valid"}, status=400)
 
 class RequestPasswordResetView(APIView):
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         email = request.data.get("email")
         if not email:
@@ -90,24 +101,17 @@ class RequestPasswordResetView(APIView):
 class ResetPasswordView(APIView):
     def post(self, request, uidb64, token):
         try:
-            # Debug token dan UID
-            print(f"UIDB64 received: {uidb64}")
-            print(f"Token received: {token}")
-
             # Tambahkan padding jika diperlukan
             uidb64 += '=' * (-len(uidb64) % 4)
 
             # Decode UID
             user_id = force_str(urlsafe_base64_decode(uidb64))
-            print(f"Decoded user ID: {user_id}")
 
             # Cari user berdasarkan ID
             user = CustomUser.objects.get(pk=user_id)
-            print(f"User found: {user.email}")
 
             # Verifikasi token
             if not PasswordResetTokenGenerator().check_token(user, token):
-                print("Invalid or expired token.")
                 return Response({"error": "Invalid or expired token."}, status=status.HTTP_400_BAD_REQUEST)
 
             # Ambil password baru
@@ -117,31 +121,51 @@ class ResetPasswordView(APIView):
 
             # Set password baru
             user.set_password(new_password)
-            user.save()
-            print("Password reset successful.")
+            user.save(update_fields=['password'])
             return Response({"message": "Password has been reset successfully."}, status=status.HTTP_200_OK)
-        except (ValidationError, CustomUser.DoesNotExist, ValueError) as e:
-            print(f"Error: {e}")
+        except (ValidationError, CustomUser.DoesNotExist, ValueError):
             return Response({"error": "Invalid token or user does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
 class LeaderboardView(APIView):
+    """
+    GET /auth/leaderboard/?sort_by=points|total_harvest|total_waste&offset=0&limit=20
+
+    Respons berupa object, bukan lagi list semua user:
+    {"sort_by", "offset", "limit", "next_offset", "results": [...], "me": {...}}.
+    `next_offset` null di halaman terakhir; `me.rank` null jika user berada di
+    luar leaderboard.RANK_LIMIT teratas, dan `me` null untuk staff.
+    """
     permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
 
     def get(self, request):
         sort_by = request.query_params.get('sort_by', 'points')  # Default to 'points'
         
         # Validate the sort_by parameter
-        if sort_by not in ['points', 'total_harvest', 'total_waste']:
+        if sort_by not in leaderboard.SORT_FIELDS:
             return Response({"error": "Invalid sort_by parameter"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Order users based on the selected criteria
-        users = CustomUser .objects.filter(is_staff=False, is_superuser=False) .order_by(f'-{sort_by}', 'username')
-        
-        if not users.exists():
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response({"error": "Invalid offset or limit parameter"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ambil satu halaman langsung dari tabel leaderboard yang sudah terurut
+        entries = leaderboard.top(sort_by, offset=offset, limit=limit)
+        if not entries and offset == 0:
             return Response({"message": "Leaderboard is empty"}, status=status.HTTP_200_OK)
 
-        serializer = LeaderboardSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        me = leaderboard.rank_for(request.user.pk, sort_by)
+        return Response({
+            "sort_by": sort_by,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if len(entries) == limit else None,
+            "results": LeaderboardSerializer(entries, many=True).data,
+            "me": LeaderboardSerializer(me).data if me else None,
+        }, status=status.HTTP_200_OK)
     
 class UserDetailView(APIView):
     def get(self, request):
@@ -160,20 +184,23 @@ class ChangePasswordView(APIView):
         if not old_password or not new_password:
             return Response({"error": "Both old and new passwords are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Ambil user yang sedang login
-        user = request.user
+        # Ambil user yang sedang login langsung dari DB (request.user bisa berupa salinan dari cache)
+        user = CustomUser.objects.get(pk=request.user.pk)
 
         # Verifikasi apakah password lama benar
         if not user.check_password(old_password):
             return Response({"error": "Old password is incorrect."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Set password baru
+        # Set password baru; hanya kolom password yang ditulis agar poin/total tidak tertimpa
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
 
         return Response({"message": "Password has been updated successfully."}, status=status.HTTP_200_OK)
 
 class RequestOTPView(APIView):
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'otp'
+
     def post(self, request):
         # Validasi email
         serializer = RequestOTPSerializer(data=request.data)
@@ -182,17 +209,16 @@ class RequestOTPView(APIView):
             try:
                 user = get_user_model().objects.get(email=email)
                 
-                # Generate OTP
-                otp_instance = PasswordResetOTP.objects.create(user=user)
-                otp_instance.generate_otp()
-                otp_instance.save()
+                # Generate OTP (menggantikan OTP lama milik user ini)
+                code = otp.issue(user)
 
-                # Kirim email dengan OTP
-                send_mail(
+                # Masukkan email OTP ke outbox, dikirim oleh worker send_queued_emails
+                queue_email(
                     "Your OTP for Password Reset",
-                    f"Your OTP is {otp_instance.otp}. It is valid for 10 minutes.",
-                    "no-reply@example.com",
+                    f"Your OTP is {code}. It is valid for {otp.get_config()['TTL'] // 60} minutes.",
                     [email],
+                    from_email="no-reply@example.com",
+                    ttl=otp.get_config()['TTL'],
                 )
 
                 return Response({"message": "OTP sent to email."}, status=status.HTTP_200_OK)
@@ -202,6 +228,9 @@ class RequestOTPView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 class ValidateOTPView(APIView):
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'otp_validate'
+
     def post(self, request):
         serializer = ValidateOTPSerializer(data=request.data)
         if serializer.is_valid():
@@ -209,40 +238,34 @@ class ValidateOTPView(APIView):
             otp_input = serializer.validated_data['otp']
             new_password = serializer.validated_data['new_password']
 
-            print(f"Email: {email}, OTP: {otp_input}, New Password: {new_password}") 
-
             try:
                 user = get_user_model().objects.get(email=email)
-                otp_instance = PasswordResetOTP.objects.filter(user=user).order_by('-created_at').first()
-
-                # Verifikasi apakah OTP valid
-                if otp_instance is None or not otp_instance.is_valid():
-                    return Response({"error": "Invalid or expired OTP."}, status=status.HTTP_400_BAD_REQUEST)
-
-                if otp_instance.otp != otp_input:
-                    return Response({"error": "Incorrect OTP."}, status=status.HTTP_400_BAD_REQUEST)
 
-                # Update password
-                user.set_password(new_password)
-                user.save()
+                with transaction.atomic():
+                    # Verifikasi OTP; OTP langsung dihapus jika benar
+                    result = otp.consume(user, otp_input)
+                    if result == otp.EXPIRED:
+                        return Response({"error": "Invalid or expired OTP."}, status=status.HTTP_400_BAD_REQUEST)
+                    if result == otp.INCORRECT:
+                        return Response({"error": "Incorrect OTP."}, status=status.HTTP_400_BAD_REQUEST)
 
-                # Hapus OTP setelah sukses
-                otp_instance.delete()
+                    # Update password
+                    user.set_password(new_password)
+                    user.save(update_fields=['password'])
 
                 return Response({"message": "Password successfully changed."}, status=status.HTTP_200_OK)
 
             except get_user_model().DoesNotExist:
-                print("User  does not exist") 
                 return Response({"error": "User with this email does not exist."}, status=status.HTTP_404_NOT_FOUND)
-        
-        print(serializer.errors)
+
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UpdateUserView(APIView):
     permission_classes = [IsAuthenticated]  # Hanya user yang login yang bisa update
 
     def put(self, request):
-        user = request.user
+        # User segar dari DB, bukan salinan cache di request.user
+        user = CustomUser.objects.get(pk=request.user.pk)
         serializer = UpdateUserSerializer(user, data=request.data, partial=True)
 
         if serializer.is_valid():
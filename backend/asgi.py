@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Besides the regular API, this application serves the notification
+stream at /api/notifikasi/stream/ (Server-Sent Events), which needs an
+ASGI server, e.g. ``uvicorn backend.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
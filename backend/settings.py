@@ -14,6 +14,7 @@ from datetime import timedelta
 from pathlib import Path
 import os
 import environ
+from django.core.exceptions import ImproperlyConfigured
 env = environ.Env()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -62,13 +63,33 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.ClaimsJWTAuthentication',
     ),
         'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.IdCursorPagination',
+    'PAGE_SIZE': 20,
+    # Jumlah reverse proxy tepercaya di depan aplikasi. 0 berarti IP diambil dari REMOTE_ADDR
+    # dan header X-Forwarded-For diabaikan, sehingga rate limit per IP tidak bisa dipalsukan
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+    # Dipakai authentication.throttling: <throttle_scope>_ip dan <throttle_scope>_email
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '5/min',
+        'otp_ip': '10/hour',
+        'otp_email': '3/hour',
+        'otp_validate_ip': '30/hour',
+        'otp_validate_email': '5/hour',
+        'password_reset_ip': '10/hour',
+        'password_reset_email': '3/hour',
+    },
 }
 
+# Cache untuk counter rate limit (alias di CACHES); di produksi harus cache bersama
+# seperti Redis/Memcached, lihat `manage.py check --deploy`
+RATE_LIMIT_CACHE = 'default'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),  # Ganti durasi sesuai kebutuhan
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),  # Durasi refresh token
@@ -86,6 +107,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'api.idempotency.IdempotencyMiddleware',
 ]
 
 # Middleware Keamanan Tambahan 
@@ -144,6 +166,13 @@ else:
     }
 
 
+# Cache
+# Lokal memori secara default; set CACHE_URL=redis://host:6379/1 di production
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -191,6 +220,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'authentication.CustomUser'
 
+# Hasher password (lihat authentication/hashers.py). PASSWORD_HASHER memilih algoritma
+# untuk hash baru; hash lama dengan algoritma/parameter lain di-upgrade saat login.
+PASSWORD_HASHER = env('PASSWORD_HASHER', default='pbkdf2')  # 'argon2' butuh argon2-cffi
+PASSWORD_HASHING = {
+    'ARGON2_TIME_COST': env.int('ARGON2_TIME_COST', default=2),
+    'ARGON2_MEMORY_COST': env.int('ARGON2_MEMORY_COST', default=102400),  # KiB
+    'ARGON2_PARALLELISM': env.int('ARGON2_PARALLELISM', default=8),
+    'PBKDF2_ITERATIONS': env.int('PBKDF2_ITERATIONS', default=870000),
+}
+_TUNED_HASHERS = {
+    'argon2': 'authentication.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'authentication.hashers.TunedPBKDF2PasswordHasher',
+}
+if PASSWORD_HASHER not in _TUNED_HASHERS:
+    raise ImproperlyConfigured(f"PASSWORD_HASHER harus salah satu dari {', '.join(_TUNED_HASHERS)}, bukan '{PASSWORD_HASHER}'.")
+PASSWORD_HASHERS = [
+    _TUNED_HASHERS[PASSWORD_HASHER],
+    *[hasher for name, hasher in _TUNED_HASHERS.items() if name != PASSWORD_HASHER],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 AUTHENTICATION_BACKENDS = [
     'authentication.backends.EmailBackend',  # Backend custom
     'django.contrib.auth.backends.ModelBackend',  # Backend bawaan Djano
@@ -204,3 +256,59 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Outbox email (lihat authentication/mail.py)
+EMAIL_OUTBOX = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BASE_SECONDS': 30,  # Jeda percobaan ulang: 30s, 60s, 120s, ...
+    'LEASE_SECONDS': 300,  # Lama email "dipegang" satu worker sebelum boleh diambil worker lain
+    'RETENTION_DAYS': 30,  # Riwayat terkirim/gagal dihapus dengan `purge_outbox`
+}
+
+# Header Idempotency-Key untuk request POST/PUT/PATCH/DELETE (lihat api/idempotency.py)
+IDEMPOTENCY = {
+    'TTL': 24 * 60 * 60,  # Detik; hapus yang kedaluwarsa dengan `purge_idempotency_keys`
+    'LOCK_TIMEOUT': 300,  # Detik; harus lebih lama dari timeout worker (gunicorn --timeout)
+    'PATH_PREFIXES': ['/api/'],
+}
+
+# OTP reset password (lihat authentication/otp.py)
+OTP = {
+    'TTL': 10 * 60,  # Detik; hapus yang kedaluwarsa dengan `purge_expired_otps`
+    'MAX_ATTEMPTS': 5,
+}
+
+# Background tasks (lihat backend/tasks.py)
+BACKGROUND_TASK_WORKERS = env.int('BACKGROUND_TASK_WORKERS', default=2)
+BACKGROUND_TASKS_EAGER = env.bool('BACKGROUND_TASKS_EAGER', default=False)
+
+# Geolokasi IP saat registrasi (lihat authentication/geolocation.py)
+GEOLOCATION = {
+    'TIMEOUT': env.float('GEOLOCATION_TIMEOUT', default=2.0),  # Detik
+    'CACHE_TTL': 24 * 60 * 60,  # Detik
+    'FAILURE_TTL': 60,  # Detik, masa cache untuk lookup yang gagal
+    'CACHE_SIZE': 10000,
+    'DATABASE_PATH': env('GEOIP_DATABASE', default=None),  # File GeoLite2-City.mmdb, opsional
+    'ASYNC': env.bool('GEOLOCATION_ASYNC', default=True),
+}
+
+# Jumlah artikel dan video terbaru maksimal per feed fase (lihat api/feeds.py)
+CONTENT_FEED_LIMIT = 20
+
+# Push notifikasi lewat SSE (lihat api/push.py), dilayani oleh backend/asgi.py
+NOTIFICATION_BROKER = 'api.push.DatabasePollingBroker'  # 'api.push.InProcessBroker' jika hanya satu proses
+NOTIFICATION_STREAM_HEARTBEAT = 15  # Detik
+NOTIFICATION_POLL_INTERVAL = 2  # Detik, dipakai DatabasePollingBroker
+NOTIFICATION_POLL_OVERLAP = 30  # Detik, jendela mundur untuk notifikasi yang ter-commit terlambat
+
+# Upload foto bertahap (lihat api/uploads.py)
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'tmp_uploads')
+CHUNKED_UPLOAD_MAX_SIZE = 20 * 1024 * 1024  # Ukuran file maksimal (byte)
+CHUNKED_UPLOAD_MAX_CHUNK = 1024 * 1024  # Ukuran satu potongan maksimal (byte)
+
+# Varian gambar yang dibuat untuk setiap foto yang diunggah (lihat api/images.py)
+IMAGE_VARIANTS = {
+    'thumb': {'size': 320, 'format': 'JPEG', 'quality': 75},
+    'medium': {'size': 1280, 'format': 'WEBP', 'quality': 80},
+}
@@ -0,0 +1,56 @@
+"""
+Worker pool sederhana untuk pekerjaan yang tidak perlu ditunggu request
+(memproses gambar, geolokasi, dan sejenisnya).
+
+Pekerjaan dijadwalkan setelah transaksi commit dan dijalankan di thread pool
+milik proses worker. Set `BACKGROUND_TASKS_EAGER = True` untuk menjalankannya
+langsung (berguna saat testing).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                    thread_name_prefix='background-task',
+                )
+    return _executor
+
+
+def run(func, *args, **kwargs):
+    """Menjalankan satu pekerjaan dan mencatat error tanpa menjatuhkan worker."""
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s gagal", getattr(func, '__name__', func))
+
+
+def _run_in_thread(func, args, kwargs):
+    try:
+        run(func, *args, **kwargs)
+    finally:
+        connections.close_all()  # Koneksi DB milik thread ini saja
+
+
+def submit(func, *args, **kwargs):
+    """Menjadwalkan `func(*args, **kwargs)` setelah transaksi yang sedang berjalan commit."""
+    def enqueue():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            run(func, *args, **kwargs)
+        else:
+            get_executor().submit(_run_in_thread, func, args, kwargs)
+
+    transaction.on_commit(enqueue)